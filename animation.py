@@ -1,82 +1,77 @@
+import numpy as np
 import networkx as nx
-import pandas as pd
 import plotly.graph_objects as go
+import temporal
+import level_of_detail as lod_groups
+import layout_cache
+from layout import StableLayout
 
 
-def animation(csv_path):
+def animation(csv_path, lod=None, detail=None, cache=True):
     """
-    Animates simulated graph evolution when removing k edges.
+    Animates simulated graph evolution when removing k edges. Graphs with more than LOD_THRESHOLD nodes plus edges are animated aggregated
+    into grid cells, unless a level of detail is given.
 
     Parameters:
         - csv_path (str): the path of the csv file containing the history of graph changes in format (source, target, timestamp, action)
+        - lod (tuple): the level of detail, ("grid", number of cells per axis or None for GRID_CELLS) or ("communities", None) to aggregate
+          the nodes into groups, or ("full", None) to draw every node and edge (default = None, which aggregates into grid cells above LOD_THRESHOLD)
+        - detail (int): the id of one group to animate in full detail (default = None)
+        - cache (bool): flag to read and write the layout cache of `layout_cache.py` for the union graph's layout (default = True)
     
     Outputs:
         - .html file: the animated graph
-    """
-
-    # Load CSV
-    df = pd.read_csv(csv_path)
-    df = df.sort_values("timestamp")
 
-    G = nx.Graph()
+    Returns:
+        - metrics (dict): the "timestamps" of the frames, with the "num_edges" and "num_components" of the graph after each of them
+    """
 
+    # group the events by timestamp once, then replay them as a stream of snapshots with their changes and metrics
+    events = temporal.read_events(csv_path)
+    labels = events["labels"]
+
+    # lay out the union graph once (or reuse its cached layout), then move only the nodes each frame touches, starting from where they were
+    sources, targets = events["edge_sources"], events["edge_targets"]
+    positions, _ = layout_cache.cached_layout(labels, sources, targets, cache_dir=layout_cache.LAYOUT_CACHE_DIR if cache else None)
+    layout = StableLayout(len(labels), sources, targets, positions=positions)
+
+    # the groups come from the union graph's layout, so every frame aggregates the same groups of nodes
+    if lod is None:
+        lod = ("grid", lod_groups.GRID_CELLS) if len(labels) + len(sources) > lod_groups.LOD_THRESHOLD else ("full", None)
+    groups = None
+    if lod[0] == "grid":
+        groups = lod_groups.grid_groups(layout.positions, lod[1] or lod_groups.GRID_CELLS)
+    elif lod[0] == "communities":
+        groups = lod_groups.community_groups(nx.Graph(zip(sources.tolist(), targets.tolist())), range(len(labels)))
+    shown = np.ones(len(labels), dtype=bool) if groups is None or detail is None else groups == detail
+    if not np.any(shown):
+        print(f"Temporal simulation was terminated because there is no group {detail} to show in detail.\n---")
+        return None
+
+    low, high = layout.positions.min(axis=0), layout.positions.max(axis=0)
     frames = []
-
-    timestamps = sorted(df["timestamp"].unique())
-
-    for t in timestamps:
-
-        # Apply all changes at time t
-        changes = df[df["timestamp"] == t]
-
-        for _, row in changes.iterrows():
-            u = row["source"]
-            v = row["target"]
-            action = row["action"]
-
-            if action == "add":
-                G.add_edge(u, v)
-            elif action == "remove":
-                if G.has_edge(u, v):
-                    G.remove_edge(u, v)
-
-        # Compute layout (spring layout keeps positions stable)
-        all_nodes = set(df["source"]).union(set(df["target"]))
-        G.add_nodes_from(all_nodes)
-        pos = nx.spring_layout(G, seed=42)
-
-        # Build edge trace
-        edge_x, edge_y = [], []
-        for u, v in G.edges():
-            edge_x += [pos[u][0], pos[v][0], None]
-            edge_y += [pos[u][1], pos[v][1], None]
-
-        edge_trace = go.Scatter(
-            x=edge_x,
-            y=edge_y,
-            mode="lines",
-            line=dict(width=1, color="#888"),
-            hoverinfo="none"
-        )
-
-        # Build node trace
-        node_x = [pos[n][0] for n in G.nodes()]
-        node_y = [pos[n][1] for n in G.nodes()]
-
-        node_trace = go.Scatter(
-            x=node_x,
-            y=node_y,
-            mode="markers+text",
-            text=list(G.nodes()),
-            textposition="top center",
-            marker=dict(size=10, color="blue"),
-        )
-
-        # Create frame
+    timestamps = events["timestamps"].tolist()
+    metrics = {"timestamps": timestamps, "num_edges": [], "num_components": []}
+
+    for snapshot in temporal.snapshots(events):
+        added, removed = snapshot["added"], snapshot["removed"]
+        pos = layout.update((sources[added], targets[added]), (sources[removed], targets[removed]))
+        low, high = np.minimum(low, pos.min(axis=0)), np.maximum(high, pos.max(axis=0))
+        metrics["num_edges"].append(snapshot["num_edges"])
+        metrics["num_components"].append(snapshot["num_components"])
+
+        present = np.flatnonzero(snapshot["present"])
+        if groups is not None and detail is None:
+            edge_trace, node_trace = _aggregated_traces(pos, sources[present], targets[present], groups)
+        else:
+            edge_trace, node_trace = _traces(pos, sources[present], targets[present], labels, shown)
+
+        # Create frame, titled with its metrics
         frames.append(
             go.Frame(
                 data=[edge_trace, node_trace],
-                name=str(t)
+                name=str(snapshot["timestamp"]),
+                layout=dict(title=f"Temporal Network Evolution (t = {snapshot['timestamp']}, edges: {snapshot['num_edges']}, components: {snapshot['num_components']})")
             )
         )
 
@@ -86,9 +81,11 @@ def animation(csv_path):
         frames=frames
     )
 
-    # Add animation controls
+    # Add animation controls. The axes keep the same range in every frame, so the nodes that did not change stay in place on screen
     fig.update_layout(
         title="Temporal Network Evolution",
+        xaxis=dict(range=[low[0] - 0.05, high[0] + 0.05]),
+        yaxis=dict(range=[low[1] - 0.05, high[1] + 0.05]),
         updatemenus=[
             {
                 "type": "buttons",
@@ -120,4 +117,89 @@ def animation(csv_path):
         }]
     )
 
-    fig.show()
\ No newline at end of file
+    fig.show()
+    return metrics
+
+def _traces(pos, sources, targets, labels, shown):
+    """
+    Helper function that builds the traces of one frame with every shown node and the edges between them.
+
+    Parameters:
+        - pos (np.ndarray): the position of every node id
+        - sources (np.ndarray): the source node id of every present edge
+        - targets (np.ndarray): the target node id of every present edge
+        - labels (list): the label of every node id
+        - shown (np.ndarray): True for the node ids to draw
+
+    Returns:
+        - traces (tuple): the edge trace and the node trace
+    """
+
+    # Build edge trace
+    inside = shown[sources] & shown[targets]
+    sources, targets = sources[inside], targets[inside]
+    edge_x = np.full(3 * len(sources), np.nan)
+    edge_y = np.full(3 * len(sources), np.nan)
+    edge_x[0::3], edge_x[1::3] = pos[sources, 0], pos[targets, 0]
+    edge_y[0::3], edge_y[1::3] = pos[sources, 1], pos[targets, 1]
+
+    edge_trace = go.Scatter(
+        x=edge_x,
+        y=edge_y,
+        mode="lines",
+        line=dict(width=1, color="#888"),
+        hoverinfo="none"
+    )
+
+    # Build node trace
+    node_trace = go.Scatter(
+        x=pos[shown, 0],
+        y=pos[shown, 1],
+        mode="markers+text",
+        text=[label for label, keep in zip(labels, shown.tolist()) if keep],
+        textposition="top center",
+        marker=dict(size=10, color="blue"),
+    )
+    return edge_trace, node_trace
+
+
+def _aggregated_traces(pos, sources, targets, groups):
+    """
+    Helper function that builds the traces of one frame with every group drawn as a super node at the center of its nodes, sized by its
+    number of nodes, and the edges between each pair of groups as one super edge. Every frame has the same two traces, so they animate.
+
+    Parameters:
+        - pos (np.ndarray): the position of every node id
+        - sources (np.ndarray): the source node id of every present edge
+        - targets (np.ndarray): the target node id of every present edge
+        - groups (np.ndarray): the group id of every node id
+
+    Returns:
+        - traces (tuple): the super edge trace and the super node trace
+    """
+
+    aggregated = lod_groups.aggregate(pos, sources, targets, groups)
+    centers = aggregated["centers"]
+    edge_x = np.full(3 * len(aggregated["sources"]), np.nan)
+    edge_y = np.full(3 * len(aggregated["sources"]), np.nan)
+    edge_x[0::3], edge_x[1::3] = centers[aggregated["sources"], 0], centers[aggregated["targets"], 0]
+    edge_y[0::3], edge_y[1::3] = centers[aggregated["sources"], 1], centers[aggregated["targets"], 1]
+
+    edge_trace = go.Scatter(
+        x=edge_x,
+        y=edge_y,
+        mode="lines",
+        line=dict(width=1, color="#888"),
+        hoverinfo="none"
+    )
+
+    node_trace = go.Scatter(
+        x=centers[:, 0],
+        y=centers[:, 1],
+        mode="markers",
+        hoverinfo="text",
+        text=[f"Group: {group}<br>Nodes: {count}<br>Edges inside: {internal}" for group, count, internal in
+              zip(aggregated["ids"].tolist(), aggregated["counts"].tolist(), aggregated["internal_edges"].tolist())],
+        marker=dict(size=lod_groups.super_node_sizes(aggregated["counts"]), color="blue"),
+    )
+    return edge_trace, node_trace
@@ -1,4 +1,9 @@
 import networkx as nx
+import numpy as np
+from scipy.sparse import coo_array
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+from compact_graph import CompactGraph
+from profiling import phase
 
 
 def create_supernodes(graph, node_list, supernode_list, iterator):
@@ -103,59 +108,202 @@ def create_supernodes_graph(graph, supernode_list):
         return
 
 
-def verify_bal(graph):
-    """Function that determines if a graph is balanced using the BFS algorithm
-    Input: user graph
-    Output: N/A, all print statements"""
+def balance_engine(graph):
+    """Function that determines if a signed graph is balanced in linear time. Supernodes are built with a single union-find over the
+    positive edges, then every connected component of the supernode graph (the negative edges between supernodes) is 2-colored with a BFS.
+    A CompactGraph takes the vectorized path in _balance_compact() instead
+    Input: user graph (or its CompactGraph) with a '+' or '-' sign on every edge
+    Output: dict with the results, formatted as {"balanced": bool, "supernodes": [[supernode1], [supernode2], ...],
+    "witness_edge": negative edge inside a supernode or None, "witness_cycle": odd cycle of supernode indices or None}"""
+
+    if isinstance(graph, CompactGraph):
+        return _balance_compact(graph)
+
+    with phase("supernodes"):
+        # union-find parent pointers, one per node
+        parent = {node: node for node in graph.nodes}
+
+        def find(node):
+            # find the root of the node's set, compressing the path along the way
+            root = node
+            while parent[root] != root:
+                root = parent[root]
+            while parent[node] != root:
+                parent[node], node = root, parent[node]
+            return root
+
+        # merge the two end nodes of every positive edge into the same supernode
+        negative_edges = []
+        for node1, node2, sign in graph.edges(data="sign"):
+            if sign == "+":
+                root1, root2 = find(node1), find(node2)
+                if root1 != root2:
+                    parent[root1] = root2
+            else:
+                negative_edges.append((node1, node2))
+
+        # label each supernode 0, 1, 2, ... in order of first appearance and collect its nodes
+        supernode_index = {}
+        supernodes = []  # to be structured as [[supernode1], [supernode2], ...]
+        for node in graph.nodes:
+            root = find(node)
+            if root not in supernode_index:
+                supernode_index[root] = len(supernodes)
+                supernodes.append([])
+            supernodes[supernode_index[root]].append(node)
+
+    results = {"balanced": True, "supernodes": supernodes, "witness_edge": None, "witness_cycle": None}
+
+    with phase("supernode_graph"):
+        # build the supernode graph from the negative edges. a negative edge inside a supernode makes the graph unbalanced
+        supernode_adj = [[] for _ in supernodes]
+        for node1, node2 in negative_edges:
+            s1 = supernode_index[find(node1)]
+            s2 = supernode_index[find(node2)]
+            if s1 == s2:
+                results["balanced"] = False
+                results["witness_edge"] = (node1, node2)
+                return results
+            supernode_adj[s1].append(s2)
+            supernode_adj[s2].append(s1)
+
+        # 2-color every connected component of the supernode graph with a BFS, tracking parents to recover an odd cycle
+        color = [-1] * len(supernodes)
+        bfs_parent = [-1] * len(supernodes)
+        for start in range(len(supernodes)):
+            if color[start] != -1:
+                continue
+            color[start] = 0
+            queue = [start]
+            for current in queue:
+                for neighbor in supernode_adj[current]:
+                    if color[neighbor] == -1:
+                        color[neighbor] = 1 - color[current]
+                        bfs_parent[neighbor] = current
+                        queue.append(neighbor)
+                    elif color[neighbor] == color[current]:
+                        results["balanced"] = False
+                        results["witness_cycle"] = _odd_cycle(bfs_parent, current, neighbor)
+                        return results
+
+    return results
+
+
+def _balance_compact(compact):
+    """Helper function that runs balance_engine() on the arrays of a CompactGraph. The supernodes are the connected components of the
+    positive edges, and the supernode graph is 2-colorable exactly when no supernode is connected to its own copy in the doubled graph where
+    every negative edge joins opposite copies. The BFS for the witness odd cycle only runs when the graph is unbalanced
+    Input: CompactGraph with a '+' or '-' sign on every edge
+    Output: the same results dict as balance_engine()"""
+
+    num_nodes = compact.number_of_nodes()
+    signs = compact.signs()
+    positive = signs > 0
+    sources, targets = compact.sources, compact.targets
+
+    with phase("supernodes"):
+        # label each supernode 0, 1, 2, ... in order of first appearance and collect its nodes
+        _, labels = connected_components(_undirected(num_nodes, sources[positive], targets[positive]), directed=False)
+        _, first = np.unique(labels, return_index=True)
+        rank = np.empty(len(first), dtype=np.int64)
+        rank[np.argsort(first)] = np.arange(len(first))
+        supernode_of = rank[labels]
+        members = np.split(np.argsort(supernode_of, kind="stable"), np.cumsum(np.bincount(supernode_of))[:-1]) if num_nodes > 0 else []
+        supernodes = [[compact.labels[node] for node in group.tolist()] for group in members]
+
+    results = {"balanced": True, "supernodes": supernodes, "witness_edge": None, "witness_cycle": None}
+
+    with phase("supernode_graph"):
+        # a negative edge inside a supernode makes the graph unbalanced
+        s1 = supernode_of[sources[~positive]]
+        s2 = supernode_of[targets[~positive]]
+        inside = np.flatnonzero(s1 == s2)
+        if len(inside) > 0:
+            edge = np.flatnonzero(~positive)[inside[0]]
+            results["balanced"] = False
+            results["witness_edge"] = (compact.labels[sources[edge]], compact.labels[targets[edge]])
+            return results
+
+        # copy s of every supernode is node s, and its opposite copy is node s + count
+        count = len(supernodes)
+        _, copies = connected_components(_undirected(2 * count, np.concatenate((s1, s1 + count)), np.concatenate((s2 + count, s2))), directed=False)
+        conflicts = np.flatnonzero(copies[:count] == copies[count:])
+        if len(conflicts) == 0:
+            return results
+
+        # BFS the supernode graph component with a conflict from its lowest supernode, then find a negative edge joining two supernodes at the same
+        # depth parity, which closes an odd cycle through the BFS tree
+        supernode_graph = _undirected(count, s1, s2)
+        _, component = connected_components(supernode_graph, directed=False)
+        start = int(np.flatnonzero(component == component[conflicts[0]])[0])
+        order, predecessors = breadth_first_order(supernode_graph, start, directed=False, return_predecessors=True)
+        depth = np.zeros(count, dtype=np.int64)
+        for supernode in order[1:].tolist():
+            depth[supernode] = depth[predecessors[supernode]] + 1
+        conflicting = np.flatnonzero((component[s1] == component[start]) & (depth[s1] % 2 == depth[s2] % 2))[0]
+
+        bfs_parent = np.where(predecessors < 0, -1, predecessors).tolist()
+        results["balanced"] = False
+        results["witness_cycle"] = _odd_cycle(bfs_parent, int(s1[conflicting]), int(s2[conflicting]))
+    return results
+
+
+def _undirected(num_nodes, sources, targets):
+    """Helper function that builds a sparse adjacency matrix from integer edge arrays, for the csgraph routines with directed=False"""
+
+    return coo_array((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(num_nodes, num_nodes)).tocsr()
+
+
+def _odd_cycle(bfs_parent, s1, s2):
+    """Helper function that walks the BFS tree up from two same-colored adjacent supernodes to their common ancestor to build an odd cycle
+    Inputs: the BFS parent list, the two supernodes joined by the conflicting edge
+    Output: list of supernode indices forming the cycle (the last supernode connects back to the first)"""
+
+    # collect the ancestors of s1 (including itself)
+    path1 = [s1]
+    while bfs_parent[path1[-1]] != -1:
+        path1.append(bfs_parent[path1[-1]])
+    ancestors = {s: i for i, s in enumerate(path1)}
+
+    # walk up from s2 until a common ancestor is hit
+    path2 = [s2]
+    while path2[-1] not in ancestors:
+        path2.append(bfs_parent[path2[-1]])
+
+    # s1 -> ... -> ancestor -> ... -> s2, which closes back to s1 through the conflicting edge
+    return path1[:ancestors[path2[-1]] + 1] + path2[-2::-1]
+
+
+def verify_bal(graph, compact=None, quiet=False):
+    """Function that determines if a graph is balanced using the supernode graph and a BFS 2-coloring
+    Inputs: user graph, optional CompactGraph of the user graph to run the vectorized balance check on, bool to skip printing the results
+    Output: the balance results dict from balance_engine() (None if balance could not be calculated), also printed"""
 
     # check if one of the edges doesn't have a sign attribute. if one is missing, terminate the program.
-    for node1, node2, sign in graph.edges(data="sign"):
-        if sign == None or sign not in ["+", "-"]:
-            print("At least one edge in the graph does not contain a 'sign' field or the value is not '-' or '+', so balance cannot be calculated. Calculating balance terminated.\n---")
-            return
+    if compact is not None:
+        signed = bool(np.all(compact.signs() != 0))
+    else:
+        signed = all(sign in ["+", "-"] for node1, node2, sign in graph.edges(data="sign"))
+    if not signed:
+        print("At least one edge in the graph does not contain a 'sign' field or the value is not '-' or '+', so balance cannot be calculated. Calculating balance terminated.\n---")
+        return
 
     try:
-        # create a list of all the nodes, an empty list to keep track of the supernodes, and an iterator to keep track of which supernode is being added to
-        nodes = list(graph.nodes)
-        supernodes = []  # to be structured as [[supernode1], [supernode2], ...]
-        i = 0
-
-        # while there are still nodes to partition into a supernode...
-        while len(nodes) > 0:
-            # add a new supernode into the list
-            supernodes.append([])
-            # partition all of the nodes that match the first node in nodes into the above supernode
-            nodes, supernodes = create_supernodes(graph, nodes, supernodes, i)
-
-            # check if supernodes contain negative edges in them
-            for node1, node2, sign in graph.edges(data="sign"):
-                # if both nodes connected by a negative edge are in the supernode, then return False
-                if node1 in supernodes[i] and node2 in supernodes[i] and sign == "-":
-                    print("The graph is unbalanced.\n---")
-                    return
-
-            # increment the supernode tracker to restart with the new first node if the supernode contains no negative edges
-            i += 1
-
-        # create the supernode graph with the negative edges between them
-        supernode_graph = create_supernodes_graph(graph, supernodes)
-
-        # create a list of the layers of nodes for a BFS search from the first node in the list
-        bfs_list = list(enumerate(nx.bfs_layers(supernode_graph, supernode_graph.nodes[0]["label"])))
-
-        # go through each layer in the BFS traversal
-        for layer, nodes in bfs_list:
-            # check between every node in the layer for an edge
-            for i in range(len(nodes)):
-                if i + 2 <= len(nodes):
-                    if supernode_graph.has_edge(nodes[i], nodes[i+1]) or supernode_graph.has_edge(nodes[i+1], nodes[i]):
-                        # if an edge exists, return False
-                        print("The graph is unbalanced.\n---")
-                        return
-        
-        # if this point is reached, then there are no negative edges within supernodes or edges between nodes in the same level from a BFS search, so the graph is balanced. return True
-        print("The graph is balanced.\n---")
-    
+        results = balance_engine(compact if compact is not None else graph)
+
+        if quiet:
+            return results
+        if results["balanced"]:
+            # there are no negative edges within supernodes and every component of the supernode graph is 2-colorable, so the graph is balanced
+            print("The graph is balanced.\n---")
+        elif results["witness_edge"] is not None:
+            node1, node2 = results["witness_edge"]
+            print(f"The graph is unbalanced: the negative edge ('{node1}', '{node2}') is inside a supernode.\n---")
+        else:
+            cycle = results["witness_cycle"]
+            print(f"The graph is unbalanced: the supernodes form an odd cycle of negative edges of length {len(cycle)}, starting at the supernode containing {results['supernodes'][cycle[0]]}.\n---")
+        return results
+
     except Exception as e:
         print("Something went wrong in trying to determine the if the graph is balanced. Calculation of balance terminated. Error message:", e, "\n---")
         return
@@ -0,0 +1,177 @@
+import io
+import os
+import sys
+import csv
+import glob
+import json
+import time
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import graph_analysis
+import profiling
+
+# flags read by batch.py itself, with whether they take a value. every other argument is passed on to graph_analysis.main() for each file
+BATCH_FLAGS = {"--manifest": True, "--report": True, "--batch_workers": True}
+
+
+def input_files(args):
+    """Function that lists the input files of a batch, from a glob pattern (the first argument) or from a manifest file with one path per
+    line ('#' for comments, relative paths are relative to the manifest)
+    Input: the command line arguments after batch.py
+    Output: sorted list of the input file names, or None if there is no pattern or manifest"""
+
+    if "--manifest" in args:
+        manifest = graph_analysis.option_value(args, "--manifest", None)
+        if manifest is None:
+            return None
+        with open(manifest) as file:
+            lines = [line.strip() for line in file]
+        base = os.path.dirname(manifest)
+        return [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+
+    if not args or args[0].startswith("--"):
+        return None
+    return sorted(glob.glob(args[0]))
+
+
+def analysis_args(args):
+    """Function that picks the analysis flags out of the batch arguments, leaving out the glob pattern and the batch flags
+    Input: the command line arguments after batch.py
+    Output: list of the arguments to pass on to graph_analysis.main() for each file"""
+
+    forwarded = []
+    i = 0 if "--manifest" in args else 1
+    while i < len(args):
+        if args[i] in BATCH_FLAGS:
+            i += 2 if BATCH_FLAGS[args[i]] and i + 1 < len(args) and "--" not in args[i + 1] else 1
+            continue
+        forwarded.append(args[i])
+        i += 1
+    return forwarded
+
+
+def analyze_file(file_name, flags):
+    """Function that runs graph_analysis.main() on one file in a (warm) worker process, with its printed output captured. '{name}' in any
+    flag value (like '--output {name}_out.gml') is replaced with the file's name without its extension
+    Inputs: input file name, analysis flags
+    Output: dict of the file's report row, formatted as {"file": str, "status": "ok" or "error", "seconds": float, "results": the summary
+    from summarize(), "output": the printed output, "error": the error message or None}"""
+
+    name = os.path.splitext(os.path.basename(file_name))[0]
+    args = ["graph_analysis.py", file_name] + [flag.replace("{name}", name) for flag in flags]
+
+    buffer = io.StringIO()
+    start = time.perf_counter()
+    row = {"file": file_name, "status": "ok", "seconds": 0.0, "results": {}, "output": "", "error": None}
+    with redirect_stdout(buffer):
+        try:
+            row["results"] = summarize(graph_analysis.main(args) or {})
+        except Exception as e:
+            row["status"] = "error"
+            row["error"] = " ".join(str(arg) for arg in e.args) if e.args else str(e)
+        finally:
+            # otherwise every later file of this warm worker would be profiled too
+            profiling.stop()
+    row["seconds"] = time.perf_counter() - start
+    row["output"] = buffer.getvalue()
+    return row
+
+
+def summarize(results):
+    """Function that keeps the scalar values of each analysis result for the report: every number, bool, or string in a result dict, the
+    number of items of a list or tuple result (like the partition of --components), or the result itself if it is a scalar
+    Input: dict of each analysis' result by analysis name, from graph_analysis.main()
+    Output: dict of each analysis' summary dict by analysis name"""
+
+    def scalar(value):
+        if isinstance(value, np.generic):
+            value = value.item()
+        return value if isinstance(value, (bool, int, float, str)) else None
+
+    summary = {}
+    for analysis, result in results.items():
+        if isinstance(result, dict):
+            values = {key: scalar(value) for key, value in result.items()}
+            summary[analysis] = {key: value for key, value in values.items() if value is not None}
+        elif isinstance(result, (list, tuple)):
+            summary[analysis] = {"count": len(result)}
+        elif scalar(result) is not None:
+            summary[analysis] = {"value": scalar(result)}
+    return summary
+
+
+def write_report(rows, report_file):
+    """Function that writes the per-file rows of a batch into one report: a .json file with every row (including the printed output), or
+    a .csv file with one line per file and one column per analysis result (named analysis.key)
+    Inputs: list of report rows from analyze_file(), report file name
+    Output: none"""
+
+    if report_file.endswith(".json"):
+        with open(report_file, "w") as file:
+            json.dump(rows, file, indent=2)
+        return
+
+    columns = list(dict.fromkeys(f"{analysis}.{key}" for row in rows for analysis, values in row["results"].items() for key in values))
+    with open(report_file, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["file", "status", "seconds", "error"] + columns)
+        for row in rows:
+            flat = {f"{analysis}.{key}": value for analysis, values in row["results"].items() for key, value in values.items()}
+            writer.writerow([row["file"], row["status"], f"{row['seconds']:.3f}", row["error"] or ""] + [flat.get(column, "") for column in columns])
+
+
+def batch(files, flags, workers=None, report_file="batch_report.json"):
+    """Function that runs the same analyses over many graph files in a pool of worker processes, which stay warm (with every library
+    already imported) across files, and collects the results into a single report
+    Inputs: list of input file names, analysis flags for graph_analysis.main(), number of worker processes (default is the number of
+    CPUs), report file name (.json or .csv)
+    Output: list of the report rows, in the order of the files"""
+
+    if not report_file.endswith(".json") and not report_file.endswith(".csv"):
+        print(f"Report file type is not .json or .csv, so the batch terminated. Provided file: {report_file}\n---")
+        return
+    if not files:
+        print("No input files matched the pattern or manifest, so the batch terminated.\n---")
+        return
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1:
+        rows = [analyze_file(file_name, flags) for file_name in files]
+    else:
+        # a few files per task, so the workers stay busy without handing out every file one at a time
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(analyze_file, files, [flags] * len(files), chunksize=max(1, len(files) // (workers * 4))))
+    seconds = time.perf_counter() - start
+
+    try:
+        write_report(rows, report_file)
+    except Exception as e:
+        print("Saving the batch report terminated due to an error in creating the report file. Provided error:", e, "\n---")
+
+    failed = [row["file"] for row in rows if row["status"] != "ok"]
+    print("BATCH")
+    print(f"files: {len(rows)}, failed: {len(failed)}, seconds: {seconds:.2f}, files per minute: {len(rows) / seconds * 60:.1f}")
+    for file_name in failed:
+        print(f"failed: {file_name}")
+    print("---")
+    return rows
+
+
+def main():
+    args = sys.argv[1:]
+    files = input_files(args)
+    if files is None:
+        raise Exception("Batch was terminated because there is no glob pattern of input files or --manifest file.\n---")
+
+    workers = graph_analysis.option_value(args, "--batch_workers", None)
+    if workers is not None and not str(workers).isdigit():
+        print(f"The number of batch workers '{workers}' is not an integer, so the default was used.\n---")
+        workers = None
+    report_file = graph_analysis.option_value(args, "--report", "batch_report.json")
+    batch(files, analysis_args(args), int(workers) if workers else None, report_file)
+
+
+if __name__ == "__main__":
+    main()
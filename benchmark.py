@@ -0,0 +1,462 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import tracemalloc
+import subprocess
+import numpy as np
+import pandas as pd
+import networkx as nx
+import balanced_graph as bal
+import file_io as fio
+import gml_stream
+import batch
+import cluster
+import robustness_check as rc
+import temporal
+import plot
+import layout_cache
+from layout import StableLayout
+from compact_graph import CompactGraph
+from path_metrics import path_metrics
+
+
+def signed_graph(n, m, balanced=True, seed=42):
+    """Function that generates a random signed graph for benchmarking
+    Inputs: number of nodes, number of edges, whether the graph should be balanced, random seed
+    Output: NetworkX graph with a 'sign' attribute on every edge"""
+
+    rng = random.Random(seed)
+    graph = nx.gnm_random_graph(n, m, seed=seed)
+
+    # split the nodes into two factions. edges inside a faction are positive, edges across are negative (always balanced)
+    faction = {node: rng.random() < 0.5 for node in graph.nodes}
+    for node1, node2 in graph.edges():
+        graph.edges[node1, node2]["sign"] = "+" if faction[node1] == faction[node2] else "-"
+
+    # flip one edge to break the balance
+    if not balanced and m > 0:
+        node1, node2 = next(iter(graph.edges()))
+        graph.edges[node1, node2]["sign"] = "-" if graph.edges[node1, node2]["sign"] == "+" else "+"
+    return graph
+
+
+def legacy_balance(graph):
+    """Function that runs the original supernode list scan used by verify_bal() before balance_engine(), without printing
+    Input: signed user graph
+    Output: bool, True if the original approach finds the graph balanced"""
+
+    nodes = list(graph.nodes)
+    supernodes = []
+    i = 0
+    while len(nodes) > 0:
+        supernodes.append([])
+        nodes, supernodes = bal.create_supernodes(graph, nodes, supernodes, i)
+        for node1, node2, sign in graph.edges(data="sign"):
+            if node1 in supernodes[i] and node2 in supernodes[i] and sign == "-":
+                return False
+        i += 1
+
+    supernode_graph = bal.create_supernodes_graph(graph, supernodes)
+    for layer, layer_nodes in enumerate(nx.bfs_layers(supernode_graph, supernode_graph.nodes[0]["label"])):
+        for j in range(len(layer_nodes) - 1):
+            if supernode_graph.has_edge(layer_nodes[j], layer_nodes[j + 1]):
+                return False
+    return True
+
+
+def timed(function, *args):
+    """Helper function that runs a function once and returns its result and wall time in seconds"""
+
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_balance():
+    """Benchmark of balance_engine() against the legacy supernode scan on generated signed graphs"""
+
+    print("BALANCE: nodes, edges, balanced, legacy seconds, engine seconds")
+    for n, m in [(100, 300), (300, 1000), (1000, 3000), (100000, 1000000)]:
+        for balanced in [True, False]:
+            graph = signed_graph(n, m, balanced)
+            engine, engine_time = timed(bal.balance_engine, graph)
+
+            # the legacy scan is O(V^2 * E), so skip it once it would take minutes
+            if n <= 1000:
+                legacy, legacy_time = timed(legacy_balance, graph)
+                if legacy != engine["balanced"] and balanced:
+                    print(f"  mismatch on ({n}, {m}): legacy {legacy}, engine {engine['balanced']}")
+                legacy_time = f"{legacy_time:.3f}"
+            else:
+                legacy_time = "skipped"
+            print(f"  {n}, {m}, {engine['balanced']}, {legacy_time}, {engine_time:.3f}")
+    print("---")
+
+
+def peak_memory(function, *args):
+    """Helper function that runs a function once and returns its peak Python memory allocation in MB"""
+
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def bench_gml():
+    """Benchmark of the streaming GML reader/writer against nx.read_gml/nx.write_gml on generated signed, colored graphs, and a check that
+    an attribute of mixed types reads back the same as with nx.read_gml
+    Output: True if the check passed, False otherwise"""
+
+    print("GML: edges, nx.read_gml seconds/MB, read_gml_arrays seconds/MB, nx.write_gml seconds, write_gml_arrays seconds")
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "graph.gml")
+        output = os.path.join(directory, "output.gml")
+        for n, m in [(1000, 10000), (10000, 100000), (50000, 500000)]:
+            graph = nx.relabel_nodes(signed_graph(n, m), str)
+            for node in graph.nodes:
+                graph.nodes[node]["color"] = random.choice("rg")
+            nx.write_gml(graph, source)
+
+            nx_graph, nx_read = timed(nx.read_gml, source)
+            arrays, stream_read = timed(gml_stream.read_gml_arrays, source)
+            nx_memory = peak_memory(nx.read_gml, source)
+            stream_memory = peak_memory(gml_stream.read_gml_arrays, source)
+            _, nx_write = timed(nx.write_gml, nx_graph, output)
+            _, stream_write = timed(gml_stream.write_gml_arrays, arrays, output)
+            print(f"  {m}, {nx_read:.2f}/{nx_memory:.0f}, {stream_read:.2f}/{stream_memory:.0f}, {nx_write:.2f}, {stream_write:.2f}")
+
+        # an attribute whose values change type from row to row (int, float, then float lists of different lengths) must read back the same
+        # as with nx.read_gml, both from the .gml file and after the streaming writer wrote it again
+        graph = nx.Graph()
+        for node, value in enumerate([1, 2.5, [1.0, 2.0], [3.0, 4.0], [5.0, 6.0, 7.0], "text"]):
+            graph.add_node(str(node), w=value)
+        nx.write_gml(graph, source)
+        expected = dict(nx.read_gml(source).nodes(data="w"))
+        read_back = dict(fio.graph_from_arrays(gml_stream.read_gml_arrays(source)).nodes(data="w"))
+        gml_stream.write_gml_arrays(gml_stream.read_gml_arrays(source), output)
+        written_back = dict(nx.read_gml(output).nodes(data="w"))
+    passed = read_back == expected and written_back == expected
+    print(f"  mixed type attribute round trip: {'passed' if passed else 'FAILED'}")
+    if not passed:
+        print(f"  expected {expected}, read {read_back}, written and read {written_back}")
+    print("---")
+    return passed
+
+
+def bench_formats():
+    """Benchmark of the load throughput of file_io.parse_graph() for each input format on a generated signed graph"""
+
+    n, m = 50000, 500000
+    graph = nx.relabel_nodes(signed_graph(n, m), str)
+    edges = pd.DataFrame([(u, v, sign) for u, v, sign in graph.edges(data="sign")], columns=["source", "target", "sign"])
+
+    print(f"FORMATS: format, seconds to load {m} edges, edges per second")
+    with tempfile.TemporaryDirectory() as directory:
+        base = os.path.join(directory, "graph")
+        nx.write_gml(graph, base + ".gml")
+        edges.to_csv(base + ".csv", index=False)
+        with open(base + ".edgelist", "w") as file:
+            for u, v, sign in edges.itertuples(index=False):
+                file.write(f"{u} {v} {1 if sign == '+' else -1}\n")
+        try:
+            edges.to_parquet(base + ".parquet")
+            extensions = [".csv", ".parquet", ".edgelist"]
+        except ImportError:
+            extensions = [".csv", ".edgelist"]
+
+        runs = [("gml", base + ".gml", False), ("gml (writing cache)", base + ".gml", True), ("gml (cached)", base + ".gml", True)]
+        runs += [(extension[1:], base + extension, False) for extension in extensions]
+        for name, file_name, use_cache in runs:
+            _, seconds = timed(fio.parse_graph, file_name, use_cache)
+            print(f"  {name}, {seconds:.2f}, {m / seconds:.0f}")
+    print("---")
+
+
+def bench_compact():
+    """Benchmark of the analyses on the NetworkX graph against their fast paths on a CompactGraph built from the same arrays"""
+
+    n, m = 100000, 1000000
+    arrays = fio.graph_to_arrays(nx.relabel_nodes(signed_graph(n, m), str))
+    graph = fio.graph_from_arrays(arrays)
+    compact, build = timed(CompactGraph, arrays)
+
+    analyses = [
+        ("balance_engine", lambda g: bal.balance_engine(g)),
+        ("adjacency_csr", lambda g: cluster.adjacency_csr(g)),
+        ("robustness edge_index", lambda g: rc.edge_index(g)),
+        ("path_metrics approx:20", lambda g: path_metrics(g, 20, seed=1))
+    ]
+    print(f"COMPACT: analysis, NetworkX seconds, CompactGraph seconds ({n} nodes, {m} edges, CompactGraph built in {build:.2f} seconds)")
+    for name, analysis in analyses:
+        _, nx_seconds = timed(analysis, graph)
+        _, compact_seconds = timed(analysis, compact)
+        print(f"  {name}, {nx_seconds:.2f}, {compact_seconds:.2f}")
+    print("---")
+
+
+def bench_jobs():
+    """Benchmark of a full graph_analysis.py report run one analysis at a time against --jobs 4"""
+
+    graph = nx.relabel_nodes(signed_graph(20000, 100000), str)
+    print(f"JOBS: jobs, seconds for a full report ({os.cpu_count()} CPUs)")
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "graph.gml")
+        nx.write_gml(graph, source)
+        command = [sys.executable, "graph_analysis.py", source, "--verify_balanced_graph", "--robustness_check", "100", "--simulations", "200",
+                   "--robustness_sweep", os.path.join(directory, "sweep.npz"), "--simulations", "200", "--components", "2", "--method", "louvain",
+                   "--simulate_failures", "100", "--shortest_paths", "approx:50", "--betweenness", "approx:50"]
+        # parse once so both runs load the cache
+        subprocess.run([sys.executable, "graph_analysis.py", source], capture_output=True)
+        for jobs in [1, 4]:
+            _, seconds = timed(lambda: subprocess.run(command + ["--jobs", str(jobs)], capture_output=True, check=True))
+            print(f"  {jobs}, {seconds:.2f}")
+    print("---")
+
+
+def bench_batch():
+    """Benchmark of the files per minute of one graph_analysis.py process per file against batch.py's warm worker pool"""
+
+    num_files = 40
+    flags = ["--verify_balanced_graph", "--clustering", "all", "--robustness_check", "10", "--simulations", "20"]
+    print(f"BATCH: mode, seconds for {num_files} files, files per minute")
+    with tempfile.TemporaryDirectory() as directory:
+        files = []
+        for i in range(num_files):
+            files.append(os.path.join(directory, f"snapshot_{i}.gml"))
+            nx.write_gml(nx.relabel_nodes(signed_graph(2000, 8000, seed=i), str), files[-1])
+
+        def separate():
+            for file_name in files:
+                subprocess.run([sys.executable, "graph_analysis.py", file_name, "--no_cache"] + flags, capture_output=True, check=True)
+
+        _, seconds = timed(separate)
+        print(f"  one process per file, {seconds:.2f}, {num_files / seconds * 60:.1f}")
+        for workers in sorted({1, os.cpu_count() or 1}):
+            _, seconds = timed(lambda: batch.batch(files, flags + ["--no_cache"], workers, os.path.join(directory, "report.csv")))
+            print(f"  batch.py with {workers} workers, {seconds:.2f}, {num_files / seconds * 60:.1f}")
+    print("---")
+
+
+def event_log(num_nodes, num_timestamps, events_per_timestamp, file_name, seed=42):
+    """Function that writes a random temporal event log (source, target, timestamp, action) for benchmarking, where 1 in 4 events removes
+    an edge that was added before"""
+
+    rng = np.random.default_rng(seed)
+    num_events = num_timestamps * events_per_timestamp
+    sources = rng.integers(0, num_nodes, num_events)
+    targets = rng.integers(0, num_nodes, num_events)
+    actions = np.where(rng.random(num_events) < 0.25, "remove", "add")
+    # removals repeat an earlier event's edge, so they usually hit an edge that is present
+    earlier = (rng.random(num_events) * np.arange(num_events)).astype(np.int64)
+    removes = actions == "remove"
+    sources[removes], targets[removes] = sources[earlier[removes]], targets[earlier[removes]]
+    pd.DataFrame({"source": sources, "target": targets, "timestamp": np.repeat(np.arange(num_timestamps), events_per_timestamp),
+                  "action": actions}).to_csv(file_name, index=False)
+
+
+def legacy_temporal(csv_path):
+    """Function that replays an event log the way animation() did before the temporal engine: filtering the whole frame for every timestamp,
+    walking its rows with iterrows, and recounting the components and degree histogram of every frame, without the layout or plotting"""
+
+    df = pd.read_csv(csv_path).sort_values("timestamp")
+    G = nx.Graph()
+    counts = []
+    for t in sorted(df["timestamp"].unique()):
+        for _, row in df[df["timestamp"] == t].iterrows():
+            if row["action"] == "add":
+                G.add_edge(row["source"], row["target"])
+            elif row["action"] == "remove" and G.has_edge(row["source"], row["target"]):
+                G.remove_edge(row["source"], row["target"])
+        G.add_nodes_from(set(df["source"]).union(set(df["target"])))
+        counts.append((nx.number_connected_components(G), nx.degree_histogram(G)))
+    return counts
+
+
+def bench_temporal():
+    """Benchmark of the temporal engine's snapshots (with component counts and degree histograms) against the legacy per-timestamp replay"""
+
+    print("TEMPORAL: nodes, timestamps, events, legacy seconds, engine seconds, engine snapshots per second")
+    with tempfile.TemporaryDirectory() as directory:
+        for num_nodes, num_timestamps, legacy in [(1000, 500, True), (1000, 2000, True), (10000, 100000, False)]:
+            file_name = os.path.join(directory, "events.csv")
+            event_log(num_nodes, num_timestamps, 5, file_name)
+            _, engine_seconds = timed(lambda: sum(1 for _ in temporal.snapshots(temporal.read_events(file_name))))
+            legacy_seconds = f"{timed(legacy_temporal, file_name)[1]:.2f}" if legacy else "skipped"
+            print(f"  {num_nodes}, {num_timestamps}, {num_timestamps * 5}, {legacy_seconds}, {engine_seconds:.2f}, {num_timestamps / engine_seconds:.0f}")
+    print("---")
+
+
+def bench_layout():
+    """Benchmark of the per-frame layout latency of StableLayout for frames changing a growing number of edges, against laying out every frame
+    with nx.spring_layout the way animation() did before. Each frame removes a random set of edges of the union graph and adds back the
+    edges the previous frame removed"""
+
+    print("LAYOUT: nodes, edges, edges changed per frame, spring_layout seconds per frame, stable mean seconds per frame, stable p95 seconds per frame")
+    rng = np.random.default_rng(42)
+    for num_nodes, num_edges, spring in [(1000, 3000, True), (20000, 60000, False)]:
+        graph = nx.gnm_random_graph(num_nodes, num_edges, seed=42)
+        sources, targets = np.array(graph.edges(), dtype=np.int64).T
+        spring_seconds = f"{timed(nx.spring_layout, graph)[1]:.3f}" if spring else "skipped"
+        layout = StableLayout(num_nodes, sources, targets)
+        layout.update((sources, targets), (sources[:0], targets[:0]), iterations=0)
+
+        for changed in [5, 50, 500]:
+            latencies = []
+            previous = np.array([], dtype=np.int64)
+            for _ in range(20):
+                removed = rng.choice(num_edges, changed // 2, replace=False)
+                start = time.perf_counter()
+                layout.update((sources[previous], targets[previous]), (sources[removed], targets[removed]))
+                latencies.append(time.perf_counter() - start)
+                previous = removed
+            print(f"  {num_nodes}, {num_edges}, {changed}, {spring_seconds}, {np.mean(latencies):.4f}, {np.percentile(latencies, 95):.4f}")
+    print("---")
+
+
+def bench_layout_cache():
+    """Benchmark of plot()'s layout from the layout cache: a first run that lays the graph out, a second run of the same graph that reuses
+    it, and a run of the graph with 1% of its edges and nodes changed that warm-starts from it, against nx.spring_layout every run"""
+
+    print("LAYOUT CACHE: nodes, edges, spring_layout seconds, miss seconds, hit seconds, warm seconds (status), warm mean node shift")
+    for num_nodes, num_edges, spring in [(1000, 3000, True), (10000, 30000, False)]:
+        graph = nx.gnm_random_graph(num_nodes, num_edges, seed=42)
+        spring_seconds = f"{timed(nx.spring_layout, graph)[1]:.2f}" if spring else "skipped"
+
+        # the changed graph drops 1% of the edges, and adds 1% new edges and 1% new nodes
+        changed = graph.copy()
+        rng = random.Random(42)
+        changed.remove_edges_from(rng.sample(list(graph.edges()), num_edges // 100))
+        changed.add_edges_from((num_nodes + i, rng.randrange(num_nodes)) for i in range(num_nodes // 100))
+        changed.add_edges_from((rng.randrange(num_nodes), rng.randrange(num_nodes)) for _ in range(num_edges // 100))
+
+        with tempfile.TemporaryDirectory() as directory:
+            (pos, _), miss_seconds = timed(layout_cache.graph_layout, graph, True, directory)
+            _, hit_seconds = timed(layout_cache.graph_layout, graph, True, directory)
+            (warm_pos, status), warm_seconds = timed(layout_cache.graph_layout, changed, True, directory)
+        shift = np.mean([np.hypot(warm_pos[node][0] - pos[node][0], warm_pos[node][1] - pos[node][1]) for node in graph.nodes()])
+        print(f"  {num_nodes}, {num_edges}, {spring_seconds}, {miss_seconds:.2f}, {hit_seconds:.3f}, {warm_seconds:.2f} ({status}), {shift:.4f}")
+    print("---")
+
+
+def legacy_plot_figure(graph):
+    """Function that builds the figure of plot() in mode P the way it did before the batched traces: one Scatter trace per edge and the
+    node coordinates as Python lists"""
+
+    import plotly.graph_objects as go
+
+    pos = nx.get_node_attributes(graph, "pos")
+    edge_traces = []
+    for u, v in graph.edges():
+        color = {"+": "green", "-": "red"}.get(graph.edges[u, v].get("sign"), "gray")
+        edge_traces.append(go.Scatter(x=[pos[u][0], pos[v][0]], y=[pos[u][1], pos[v][1]], mode="lines", line=dict(width=2, color=color),
+                                      hoverinfo="text", text=f"Sign: {graph.edges[u, v].get('sign', 'unknown')}"))
+    node_trace = go.Scatter(x=[pos[n][0] for n in graph.nodes()], y=[pos[n][1] for n in graph.nodes()], mode="markers",
+                            text=[f"Node: {n}" for n in graph.nodes()], marker=dict(color=[graph.nodes[n].get("color", "blue") for n in graph.nodes()]))
+    return go.Figure(data=edge_traces + [node_trace])
+
+
+def bench_plot():
+    """Benchmark of the time to build plot()'s figure in mode P and write it as HTML, and the size of the HTML without the Plotly library
+    itself, against one trace per edge, and of the aggregated figure of --lod grid"""
+
+    print("PLOT: nodes, edges, legacy seconds, legacy MB, batched seconds, batched MB, batched trace type, lod grid seconds, lod grid MB")
+    for num_nodes, num_edges, legacy in [(500, 1000, True), (2500, 5000, True), (5000, 10000, False), (25000, 50000, False), (100000, 200000, False)]:
+        graph = signed_graph(num_nodes, num_edges)
+        positions = np.random.default_rng(42).random((num_nodes, 2))
+        nx.set_node_attributes(graph, {node: tuple(positions[i]) for i, node in enumerate(graph.nodes())}, "pos")
+
+        fig, seconds = timed(lambda: plot.figure("P", graph))
+        html, html_seconds = timed(lambda: fig.to_html(include_plotlyjs=False))
+        if legacy:
+            legacy_fig, legacy_seconds = timed(legacy_plot_figure, graph)
+            legacy_html, legacy_html_seconds = timed(lambda: legacy_fig.to_html(include_plotlyjs=False))
+            legacy_result = f"{legacy_seconds + legacy_html_seconds:.2f}, {len(legacy_html) / 2 ** 20:.2f}"
+        else:
+            legacy_result = "skipped, skipped"
+        lod_fig, lod_seconds = timed(lambda: plot.figure("P", graph, lod=("grid", None)))
+        lod_html, lod_html_seconds = timed(lambda: lod_fig.to_html(include_plotlyjs=False))
+        print(f"  {num_nodes}, {graph.number_of_edges()}, {legacy_result}, {seconds + html_seconds:.2f}, {len(html) / 2 ** 20:.2f}, {type(fig.data[0]).__name__}, "
+              f"{lod_seconds + lod_html_seconds:.2f}, {len(lod_html) / 2 ** 20:.2f}")
+    print("---")
+
+
+def import_times(args):
+    """Helper function that runs a Python command with -X importtime and reads the cumulative import time of every module it imported
+    Input: the arguments after python -X importtime
+    Output: dict of each imported module's cumulative import time in seconds, and the total import time of the command in seconds"""
+
+    process = subprocess.run([sys.executable, "-X", "importtime"] + args, capture_output=True, text=True)
+    times = {}
+    total = 0.0
+    for line in process.stderr.splitlines():
+        # lines look like "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative) / 1e6
+            # top level imports are indented by a single space, and their cumulative times include everything they import
+            if len(module) - len(module.lstrip()) == 1:
+                total += int(cumulative) / 1e6
+    return times, total
+
+
+# the most graph_analysis.py may take to import, and the slow modules a run must not import unless one of its analyses needs them (run from
+# the repository's directory). tests/test_startup.py enforces both
+STARTUP_BUDGET = 0.5
+STARTUP_RUNS = {
+    "import graph_analysis": (["-c", "import graph_analysis"], ["pandas", "plotly", "scipy", "matplotlib"]),
+    "--verify_balanced_graph": (["graph_analysis.py", "test_files/balanced_graph.gml", "--verify_balanced_graph"], ["pandas", "plotly", "scipy.stats", "matplotlib"]),
+    "--clustering all": (["graph_analysis.py", "test_files/karate.gml", "--clustering", "all"], ["pandas", "plotly", "scipy.stats", "matplotlib"]),
+}
+
+
+def bench_startup():
+    """Benchmark of the import time of graph_analysis.py, checked against STARTUP_BUDGET, and of which slow modules each run imports
+    Output: True if every check passed, False otherwise"""
+
+    passed = True
+    print(f"STARTUP: run, total import seconds, slow modules imported (budget of {STARTUP_BUDGET} s for importing graph_analysis)")
+    for name, (args, forbidden) in STARTUP_RUNS.items():
+        times, seconds = import_times(args)
+        imported = [module for module in forbidden if module in times]
+        print(f"  {name}, {seconds:.3f}, {', '.join(imported) or 'none'}")
+        if name == "import graph_analysis" and seconds > STARTUP_BUDGET:
+            print(f"  FAILED: importing graph_analysis took {seconds:.3f} s, over the budget of {STARTUP_BUDGET} s")
+            passed = False
+        if imported:
+            print(f"  FAILED: {name} imported {', '.join(imported)}")
+            passed = False
+    print("---")
+    return passed
+
+
+BENCHMARKS = {
+    "balance": bench_balance,
+    "gml": bench_gml,
+    "formats": bench_formats,
+    "compact": bench_compact,
+    "jobs": bench_jobs,
+    "batch": bench_batch,
+    "temporal": bench_temporal,
+    "layout": bench_layout,
+    "plot": bench_plot,
+    "layout_cache": bench_layout_cache,
+    "startup": bench_startup,
+}
+
+
+if __name__ == "__main__":
+    # run the benchmarks named on the command line, or all of them
+    # a benchmark that checks a budget returns False when it fails, so the exit status can gate a change
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    failed = False
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available benchmarks: {', '.join(BENCHMARKS)}\n---")
+            continue
+        failed = BENCHMARKS[name]() is False or failed
+    sys.exit(1 if failed else 0)
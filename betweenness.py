@@ -0,0 +1,171 @@
+import math
+import random
+import weakref
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from compact_graph import CompactGraph
+
+# betweenness results of graphs that asked to be cached, dropped automatically when the graph is garbage collected
+_cache = weakref.WeakKeyDictionary()
+
+
+def betweenness(graph, samples=None, epsilon=None, workers=1, seed=None, cache=False):
+    """Function that calculates the normalized betweenness centrality of every node with Brandes' algorithm. The exact mode runs it from every
+    node, split across a process pool that each returns a partial dependency vector. The approximate mode runs it from a random sample of
+    pivot nodes and scales the result up
+    Inputs: user graph or its CompactGraph, optional number of pivots to sample, optional error bound to pick the number of pivots from (each value is then within
+    epsilon with 90% probability), number of worker processes, optional random seed, bool to reuse/store the result for this graph
+    Output: dict of each node's betweenness centrality, matching nx.betweenness_centrality(graph, normalized=True) in the exact mode"""
+
+    nodes = graph.labels if isinstance(graph, CompactGraph) else list(graph.nodes())
+    num_nodes = len(nodes)
+
+    if epsilon is not None:
+        samples = pivot_count(num_nodes, epsilon)
+
+    key = (samples, seed)
+    if cache and graph in _cache and key in _cache[graph]:
+        num_edges, result = _cache[graph][key]
+        # only reuse the result if the graph was not changed since
+        if num_edges == graph.number_of_edges() and len(result) == num_nodes:
+            return result
+
+    adjacency = _adjacency_lists(graph, nodes)
+
+    # pick the pivots (every node in the exact mode)
+    if samples is None or samples >= num_nodes:
+        pivots = list(range(num_nodes))
+    else:
+        pivots = random.Random(seed).sample(range(num_nodes), samples)
+
+    if workers <= 1:
+        totals = _dependencies(adjacency, pivots)
+    else:
+        chunks = [chunk.tolist() for chunk in np.array_split(np.array(pivots, dtype=np.int64), workers) if len(chunk) > 0]
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            totals = sum(pool.map(_dependencies, [adjacency] * len(chunks), chunks))
+
+    # every unordered pair is counted from both ends, which the (n-1)(n-2) ordered pairs normalization accounts for. sampled pivots are scaled up
+    scale = 1 / ((num_nodes - 1) * (num_nodes - 2)) if num_nodes > 2 else 1.0
+    if pivots:
+        scale *= num_nodes / len(pivots)
+    result = dict(zip(nodes, (np.asarray(totals, dtype=float) * scale).tolist()))
+
+    if cache:
+        _cache.setdefault(graph, {})[key] = (graph.number_of_edges(), result)
+    return result
+
+
+def edge_betweenness(graph, samples=None, seed=None):
+    """Function that calculates the unnormalized edge betweenness of every edge with Brandes' algorithm, from every node or from a random
+    sample of pivot nodes (scaled up)
+    Inputs: user graph or its CompactGraph, optional number of pivots to sample, optional random seed or random.Random
+    Output: dict of each edge's betweenness keyed by the frozenset of its end nodes, matching nx.edge_betweenness_centrality(graph, normalized=False)
+    in the exact mode"""
+
+    nodes = graph.labels if isinstance(graph, CompactGraph) else list(graph.nodes())
+    num_nodes = len(nodes)
+    adjacency = _adjacency_lists(graph, nodes)
+
+    # pick the pivots (every node in the exact mode)
+    rng = seed if isinstance(seed, random.Random) else random.Random(seed)
+    if samples is None or samples >= num_nodes:
+        pivots = range(num_nodes)
+    else:
+        pivots = rng.sample(range(num_nodes), samples)
+
+    # every undirected path is counted from both ends, so halve the totals. sampled pivots are scaled up
+    scale = 0.5 * num_nodes / len(pivots) if len(pivots) > 0 else 0.5
+    return {frozenset((nodes[i], nodes[j])): value * scale for (i, j), value in _edge_dependencies(adjacency, pivots).items()}
+
+
+def pivot_count(num_nodes, epsilon):
+    """Function that picks the number of pivots for an error bound with a Hoeffding bound over every node: each pivot's contribution is in
+    [0, 1], so this many pivots keep all errors under epsilon with probability 0.9
+    Inputs: number of nodes in the graph, error bound
+    Output: the number of pivots to sample"""
+
+    return math.ceil(math.log(2 * max(num_nodes, 1) / 0.1) / (2 * epsilon ** 2))
+
+
+def _adjacency_lists(graph, nodes):
+    """Helper function that gives the loop-free adjacency lists of integer node ids (the position of each node in `nodes`)
+    Inputs: user graph or its CompactGraph, list of the graph's nodes
+    Output: list of neighbor id lists"""
+
+    if isinstance(graph, CompactGraph):
+        return graph.adjacency_lists()
+    index = {node: i for i, node in enumerate(nodes)}
+    return [[index[neighbor] for neighbor in graph.neighbors(node) if neighbor != node] for node in nodes]
+
+
+def _shortest_paths(adjacency, source):
+    """Helper function that runs the BFS of Brandes' algorithm from a source, counting the shortest paths to each node
+    Inputs: adjacency lists of integer node ids, source node id
+    Output: (list of the nodes in the order they are reached, list of each node's number of shortest paths, list of each node's
+    predecessors on them)"""
+
+    num_nodes = len(adjacency)
+    sigma = [0] * num_nodes
+    distance = [-1] * num_nodes
+    predecessors = [[] for _ in range(num_nodes)]
+    sigma[source] = 1
+    distance[source] = 0
+    order = [source]
+    for current in order:
+        for neighbor in adjacency[current]:
+            if distance[neighbor] < 0:
+                distance[neighbor] = distance[current] + 1
+                order.append(neighbor)
+            if distance[neighbor] == distance[current] + 1:
+                sigma[neighbor] += sigma[current]
+                predecessors[neighbor].append(current)
+    return order, sigma, predecessors
+
+
+def _dependencies(adjacency, sources):
+    """Helper function that runs the single source stage of Brandes' algorithm from each source and sums the dependencies
+    Inputs: adjacency lists of integer node ids, list of source node ids
+    Output: NumPy array of each node's summed dependency over the sources"""
+
+    num_nodes = len(adjacency)
+    totals = np.zeros(num_nodes)
+
+    for source in sources:
+        order, sigma, predecessors = _shortest_paths(adjacency, source)
+
+        # accumulate the dependencies in reverse BFS order
+        delta = [0.0] * num_nodes
+        for node in reversed(order):
+            for predecessor in predecessors[node]:
+                delta[predecessor] += sigma[predecessor] / sigma[node] * (1 + delta[node])
+            if node != source:
+                totals[node] += delta[node]
+
+    return totals
+
+
+def _edge_dependencies(adjacency, sources):
+    """Helper function that runs the single source stage of Brandes' algorithm from each source and sums the dependencies on each edge
+    Inputs: adjacency lists of integer node ids, list of source node ids
+    Output: dict of each edge's summed dependency over the sources, keyed by its (lower id, higher id) end nodes"""
+
+    num_nodes = len(adjacency)
+    totals = {}
+    for node in range(num_nodes):
+        for neighbor in adjacency[node]:
+            if node < neighbor:
+                totals[(node, neighbor)] = 0.0
+
+    for source in sources:
+        order, sigma, predecessors = _shortest_paths(adjacency, source)
+
+        # accumulate the dependencies in reverse BFS order, crediting each edge on the way
+        delta = [0.0] * num_nodes
+        for node in reversed(order):
+            for predecessor in predecessors[node]:
+                credit = sigma[predecessor] / sigma[node] * (1 + delta[node])
+                totals[(predecessor, node) if predecessor < node else (node, predecessor)] += credit
+                delta[predecessor] += credit
+
+    return totals
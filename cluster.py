@@ -1,7 +1,15 @@
+import networkx as nx
+import numpy as np
+from compact_graph import CompactGraph
+from profiling import phase
 
-def clustering_coefficient(graph, node, plot=False):
+# sum(degree^2) / number of adjacency entries above which the sparse product is replaced by ordered intersections
+_SKEW_RATIO = 64
+
+
+def clustering_coefficient(graph, node, plot=False, quiet=False):
     """Function that calculates the clustering coefficient of the given node in a graph, then saves that value with the node in the graph
-    Inputs: user graph, selected node to perform calculation on, bool to check if using function for plotting
+    Inputs: user graph, selected node to perform calculation on, bool to check if using function for plotting, bool to skip printing the result
     Output: N/A - all print statements"""
 
     # check to ensure the desired node exists in the graph
@@ -45,9 +53,152 @@ def clustering_coefficient(graph, node, plot=False):
         coefficient = actual_edges / possible_edges
         if not plot:
             graph.nodes[node]["clustering_coefficient"] = coefficient
+        if not plot and not quiet:
             print(f"The clustering coefficient of node '{node}' is: {coefficient:.2f}.\n---")
         return coefficient
     
     except Exception as e:
         print("Something went wrong in the calculation of the clustering coefficient. Calculation of clustering coefficient terminated. Error message:", e, "\n---")
         return
+
+
+def clustering_coefficients(graph, nodes=None, plot=False, method="auto", compact=None, triangles=None, quiet=False):
+    """Function that calculates the clustering coefficients of all (or a subset of) the nodes in a graph in one pass, along with the average
+    clustering and the transitivity, then saves each coefficient with its node in the graph. Triangles are counted with the sparse product
+    (A @ A) * A over a CSR adjacency matrix, or with degree-ordered neighbor set intersections on very skewed graphs where A @ A would be dense
+    Inputs: user graph, optional list of nodes (default is every node), bool to check if using function for plotting,
+    method to count triangles ("auto", "sparse", or "ordered"), optional CompactGraph of the user graph to reuse its adjacency matrix,
+    optional array of every node's triangle count from triangle_counts() to reuse instead of counting them again, bool to skip printing the summary
+    Output: dict with the results, formatted as {"coefficients": {node: coefficient}, "average_clustering": float, "transitivity": float}.
+    Nodes with less than two neighbors have a coefficient of 0"""
+
+    if nodes is None:
+        nodes = list(graph.nodes)
+    else:
+        # check to ensure the desired nodes exist in the graph
+        missing = [node for node in nodes if not graph.has_node(node)]
+        if missing:
+            print(f"Graph does not contain node(s) {missing}, so clustering coefficients can't be calculated. Calculation of clustering coefficients terminated.\n---")
+            return
+
+    if len(nodes) == 0:
+        print("Graph has no nodes, so clustering coefficients can't be calculated. Calculation of clustering coefficients terminated.\n---")
+        return
+
+    try:
+        adjacency, index = adjacency_csr(compact if compact is not None else graph)
+        rows = np.array([index[node] for node in nodes], dtype=np.int64)
+        degrees = np.diff(adjacency.indptr)
+
+        if triangles is not None:
+            triangles = np.asarray(triangles)[rows]
+        elif method not in ("auto", "sparse", "ordered"):
+            print(f"Triangle counting method '{method}' is not 'auto', 'sparse', or 'ordered'. Calculation of clustering coefficients terminated.\n---")
+            return
+        else:
+            with phase("triangles"):
+                triangles = triangle_counts(adjacency, rows, method)
+
+        # coefficient = actual edges among neighbors / possible edges among neighbors
+        possible_edges = degrees[rows] * (degrees[rows] - 1) / 2
+        coefficient_array = np.divide(triangles, possible_edges, out=np.zeros(len(rows)), where=possible_edges > 0)
+        coefficients = dict(zip(nodes, coefficient_array.tolist()))
+
+        results = {
+            "coefficients": coefficients,
+            "average_clustering": float(coefficient_array.mean()),
+            "transitivity": float(triangles.sum() / possible_edges.sum()) if possible_edges.sum() > 0 else 0.0
+        }
+
+        # save the coefficients into the nodes in the graph in bulk, and print the summary
+        if not plot:
+            save_coefficients(graph, results, quiet)
+        return results
+
+    except Exception as e:
+        print("Something went wrong in the calculation of the clustering coefficients. Calculation of clustering coefficients terminated. Error message:", e, "\n---")
+        return
+
+
+def save_coefficients(graph, results, quiet=False):
+    """Function that saves the clustering coefficients from clustering_coefficients() with their nodes in the graph, then prints the summary,
+    so coefficients that were already calculated (like the planner's shared ones) are reported the same way as new ones
+    Inputs: user graph, dict of results from clustering_coefficients(), bool to skip printing the summary
+    Output: the same dict of results"""
+
+    nx.set_node_attributes(graph, results["coefficients"], "clustering_coefficient")
+    if not quiet:
+        print(f"Calculated the clustering coefficients of {len(results['coefficients'])} nodes. The average clustering coefficient is: {results['average_clustering']:.2f}, and the transitivity is: {results['transitivity']:.2f}.\n---")
+    return results
+
+
+def triangle_counts(adjacency, rows=None, method="auto"):
+    """Function that counts the triangles through each node of a CSR adjacency matrix. The A @ A product costs sum(degree^2) operations, so
+    the "auto" method falls back to degree-ordered set intersections when a few hubs make that explode
+    Inputs: CSR adjacency matrix from adjacency_csr(), optional array of row indices (default is every row), method to count triangles
+    ("auto", "sparse", or "ordered")
+    Output: array of triangle counts aligned with rows"""
+
+    if rows is None:
+        rows = np.arange(adjacency.shape[0])
+    if method == "auto":
+        degrees = np.diff(adjacency.indptr)
+        method = "ordered" if int(np.dot(degrees, degrees)) > _SKEW_RATIO * max(adjacency.nnz, 1) else "sparse"
+    if method == "sparse":
+        return _triangles_sparse(adjacency, rows)
+    return _triangles_ordered(adjacency)[rows]
+
+
+def adjacency_csr(graph):
+    """Helper function that builds an unweighted, loop-free, symmetric CSR adjacency matrix of the graph
+    Input: user graph, or its CompactGraph (which builds the matrix from its CSR arrays once and reuses it)
+    Output: the CSR matrix and a dict mapping each node to its row index"""
+
+    if isinstance(graph, CompactGraph):
+        return graph.adjacency(), graph.index
+
+    index = {node: i for i, node in enumerate(graph.nodes)}
+    adjacency = nx.to_scipy_sparse_array(graph, nodelist=list(index), weight=None, format="csr")
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    # multigraphs store parallel edges as counts, so flatten them to 1
+    adjacency.data[:] = 1
+    adjacency.sort_indices()
+    return adjacency, index
+
+
+def _triangles_sparse(adjacency, rows):
+    """Helper function that counts the triangles through each selected row with the sparse product (A[rows] @ A) * A[rows]
+    Inputs: CSR adjacency matrix, array of row indices
+    Output: array of triangle counts aligned with rows"""
+
+    selected = adjacency[rows]
+    paths = (selected @ adjacency).multiply(selected)
+    # every triangle through a node is counted once from each of its two other corners
+    return np.asarray(paths.sum(axis=1)).ravel() / 2
+
+
+def _triangles_ordered(adjacency):
+    """Helper function that counts the triangles through every node by orienting each edge from the lower to the higher degree end and
+    intersecting the oriented neighbor sets of its two ends, so each triangle is found exactly once
+    Input: CSR adjacency matrix
+    Output: array of triangle counts for every node"""
+
+    degrees = np.diff(adjacency.indptr)
+    rank = np.empty(len(degrees), dtype=np.int64)
+    rank[np.lexsort((np.arange(len(degrees)), degrees))] = np.arange(len(degrees))
+
+    # keep only the neighbors ranked higher than each node
+    higher = []
+    for node in range(len(degrees)):
+        neighbors = adjacency.indices[adjacency.indptr[node]:adjacency.indptr[node + 1]]
+        higher.append(set(neighbors[rank[neighbors] > rank[node]].tolist()))
+
+    triangles = np.zeros(len(degrees))
+    for node in range(len(degrees)):
+        for neighbor in higher[node]:
+            for third in higher[node] & higher[neighbor]:
+                triangles[node] += 1
+                triangles[neighbor] += 1
+                triangles[third] += 1
+    return triangles
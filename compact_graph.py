@@ -0,0 +1,139 @@
+import numpy as np
+import file_io as fio
+from gml_stream import csr_arrays, read_column
+
+
+class CompactGraph:
+    """Array-backed graph shared by the analyses of a run: integer node ids with a label map, integer edge arrays, CSR adjacency arrays, and
+    the typed node/edge attribute columns of the file_io/gml_stream array layout ('sign' as an int8 array of +1/-1, strings like 'color' as
+    categorical codes). Node ids follow the order of graph.nodes in the NetworkX graph built from the same arrays. Parallel edges of graphs
+    that are not multigraphs are merged, keeping the last one, the same as NetworkX does"""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        meta = arrays["meta"]
+        self.directed = meta["directed"]
+        self.multigraph = meta["multigraph"]
+        self.labels = read_column(arrays, "labels", meta["labels"])
+        self.index = {label: i for i, label in enumerate(self.labels)}
+
+        sources = np.asarray(arrays["sources"], dtype=np.int64)
+        targets = np.asarray(arrays["targets"], dtype=np.int64)
+        # edge_rows maps each edge id to its row in the attribute columns
+        self.edge_rows = np.arange(len(sources))
+        if not self.multigraph and len(sources) > 0:
+            low, high = (sources, targets) if self.directed else (np.minimum(sources, targets), np.maximum(sources, targets))
+            keys = low * len(self.labels) + high
+            # keep the last row of each repeated edge, in row order
+            _, last = np.unique(keys[::-1], return_index=True)
+            if len(last) < len(keys):
+                self.edge_rows = np.sort(len(keys) - 1 - last)
+
+        if len(self.edge_rows) == len(sources):
+            self.sources, self.targets = sources, targets
+            self.indptr, self.indices = np.asarray(arrays["indptr"]), np.asarray(arrays["indices"])
+        else:
+            self.sources, self.targets = sources[self.edge_rows], targets[self.edge_rows]
+            self.indptr, self.indices = csr_arrays(len(self.labels), self.sources, self.targets, self.directed)
+        self._adjacency = None
+
+    @classmethod
+    def from_networkx(cls, graph):
+        """Converts a NetworkX graph into a CompactGraph"""
+
+        return cls(fio.graph_to_arrays(graph))
+
+    def to_networkx(self):
+        """Converts the CompactGraph back into the NetworkX graph it was built from"""
+
+        return fio.graph_from_arrays(self.arrays)
+
+    def number_of_nodes(self):
+        return len(self.labels)
+
+    def number_of_edges(self):
+        return len(self.sources)
+
+    def degrees(self):
+        """Gives the degree of every node id as an int64 array, the same as NetworkX: a self loop counts twice, and every parallel edge of a
+        multigraph counts (for directed graphs, the in-degree plus the out-degree)"""
+
+        num_nodes = len(self.labels)
+        return np.bincount(self.sources, minlength=num_nodes) + np.bincount(self.targets, minlength=num_nodes)
+
+    def restricted(self, surviving):
+        """Gives a CompactGraph with the same nodes that only keeps the edges where the boolean array `surviving` (over the edge ids) is True.
+        The attribute columns are shared, not copied"""
+
+        view = object.__new__(CompactGraph)
+        view.__dict__.update(self.__dict__)
+        view.edge_rows = self.edge_rows[surviving]
+        view.sources, view.targets = self.sources[surviving], self.targets[surviving]
+        view.indptr, view.indices = csr_arrays(len(self.labels), view.sources, view.targets, self.directed)
+        view._adjacency = None
+        return view
+
+    def adjacency(self):
+        """Gives the unweighted, loop-free, sorted CSR adjacency matrix of the graph (both directions for undirected graphs), the same as
+        cluster.adjacency_csr() builds from the NetworkX graph. Built once and reused"""
+
+        if self._adjacency is None:
+            # scipy.sparse is only imported once an analysis needs the matrix
+            from scipy.sparse import csr_array
+
+            num_nodes = len(self.labels)
+            # copy the CSR arrays, which are read-only when they are memory-mapped from the cache
+            adjacency = csr_array((np.ones(len(self.indices), dtype=np.int64), np.array(self.indices), np.array(self.indptr)), shape=(num_nodes, num_nodes))
+            adjacency.sum_duplicates()
+            adjacency.setdiag(0)
+            adjacency.eliminate_zeros()
+            adjacency.data[:] = 1
+            adjacency.sort_indices()
+            self._adjacency = adjacency
+        return self._adjacency
+
+    def adjacency_lists(self):
+        """Gives the loop-free adjacency lists of integer node ids used by the pure Python BFS in betweenness.py"""
+
+        adjacency = self.adjacency()
+        indptr, indices = adjacency.indptr.tolist(), adjacency.indices.tolist()
+        return [indices[indptr[i]:indptr[i + 1]] for i in range(len(self.labels))]
+
+    def has_column(self, name, node=True):
+        return name in self.arrays["meta"]["node_columns" if node else "edge_columns"]
+
+    def column(self, name, node=True):
+        """Gives a node (or edge) attribute as a list of Python values aligned with the node (or edge) ids, with None where it is missing"""
+
+        kind = self.arrays["meta"]["node_columns" if node else "edge_columns"][name]
+        values = read_column(self.arrays, f"{'node' if node else 'edge'}_{name}", kind)
+        return values if node else [values[row] for row in self.edge_rows.tolist()]
+
+    def codes(self, name, node=True):
+        """Gives a string attribute as integer codes aligned with the node (or edge) ids and the list of the strings they stand for. Missing
+        values have the code -1
+        Inputs: attribute name, bool for a node (or edge) attribute
+        Output: (NumPy array of codes, list of categories)"""
+
+        prefix = f"{'node' if node else 'edge'}_{name}"
+        if self.arrays["meta"]["node_columns" if node else "edge_columns"].get(name) == "categorical":
+            codes = np.asarray(self.arrays[prefix]).astype(np.int32)
+            categories = self.arrays[f"{prefix}_categories"].tolist()
+            if f"{prefix}_mask" in self.arrays:
+                codes[~np.asarray(self.arrays[f"{prefix}_mask"])] = -1
+        else:
+            # other kinds of columns are factorized from their Python values
+            values = read_column(self.arrays, prefix, self.arrays["meta"]["node_columns" if node else "edge_columns"][name])
+            categories = list(dict.fromkeys(value for value in values if value is not None))
+            lookup = {category: i for i, category in enumerate(categories)}
+            codes = np.array([lookup[value] if value is not None else -1 for value in values], dtype=np.int32)
+        return (codes if node else codes[self.edge_rows]), categories
+
+    def signs(self):
+        """Gives the edge signs as an int8 array aligned with the edge ids: 1 for '+', -1 for '-', and 0 for a missing or invalid sign"""
+
+        if not self.has_column("sign", node=False):
+            return np.zeros(len(self.sources), dtype=np.int8)
+        codes, categories = self.codes("sign", node=False)
+        lookup = np.array([1 if category == "+" else -1 if category == "-" else 0 for category in categories] + [0], dtype=np.int8)
+        return lookup[codes]
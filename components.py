@@ -1,21 +1,31 @@
+import os
 import networkx as nx
-import itertools
+import numpy as np
+import random
+from concurrent.futures import ThreadPoolExecutor
+from betweenness import edge_betweenness
+from gml_stream import write_gml_arrays
+from file_io import graph_to_arrays
+from profiling import phase
 
-def components(n, graph, output_components=False):
+def components(n, graph, output_components=False, method="gn", samples=None, seed=None, index=False, quiet=False):
     """
-    Partitions the graph into `n` components using the Girvan-Newman method.   
+    Partitions the graph into `n` components using the Girvan-Newman method, or into its natural communities using Louvain or label propagation.
   
     Parameters: 
         - n (int): number of components
         - graph (NetworkX graph): the graph to be partitioned
-        - output_components (bool): flag that controls the exporting of components   
+        - output_components (bool | str): directory to export the components to (`True` for the current directory), or `False` to not export
+        - method (str): the partitioning method, "gn" (Girvan-Newman), "louvain", or "lpa" (label propagation) (default = "gn")
+        - samples (int): number of sampled sources to approximate the edge betweenness with in Girvan-Newman (default = None, which is exact)
+        - seed (int): seed for the sampled sources and the Louvain method (default = None)
+        - index (bool): flag that exports one indexed file instead of one .gml file per component (default = False)
+        - quiet (bool): flag that skips printing the partition, which prints every node of every component (default = False)
 
     Returns:
-        - partition (Incomplete): the partition with `n` components
+        - partition (tuple[set]): the partition with `n` components (less than `n` if n exceeds maximum number of components for the graph),
+          or the communities found by Louvain or label propagation
     """
-    
-    # girvan_newman() returns an interator that yields a sequence of communities at each level
-    communities_iterator = nx.community.girvan_newman(graph)
 
     # ensure n (number of components) is an integer
     try:
@@ -24,24 +34,164 @@ def components(n, graph, output_components=False):
         print(f"{n} is not able to be converted into an integer, so removal of k edges is not possible. Simulating failures terminated.\n---")
         return
 
-    # stop the iteration when number of communities exceeds n (yields tuples of sets)
-    n_iterations = itertools.takewhile(lambda c: len(c) <= n, communities_iterator)
-
-    # take the last result (the partition with n components, less than n if n exceeds maximum number of components for the graph)
-    partition = None
-    for communities in n_iterations:
-        partition = communities
+    with phase("partition"):
+        if method == "gn":
+            partition = girvan_newman(graph, n, samples, seed)
+        elif method == "louvain":
+            partition = tuple(nx.community.louvain_communities(graph, seed=seed))
+        elif method == "lpa":
+            partition = tuple(nx.community.label_propagation_communities(graph))
+        else:
+            print(f"Partitioning method '{method}' is not gn, louvain, or lpa. Calculating components terminated.\n---")
+            return
 
     if partition is None:
         print(f"Could not find a partition with <= {n} components.\n---")
         return
-    
-    print(f"Graph partitioned into {len(partition)} components:")
-    for i, comm in enumerate(partition):
-        print(f"  Component {i+1}: {comm}")
-
-        if output_components:
-            subgraph = graph.subgraph(comm).copy()
-            nx.write_gml(subgraph, f"component_{i+1}.gml")      # Export component to .gml
-    print("---")
-    return partition
\ No newline at end of file
+
+    if not quiet:
+        # Louvain and label propagation find their own number of communities
+        if method != "gn" and len(partition) != n:
+            print(f"The {method} method found {len(partition)} communities instead of the requested {n}.")
+
+        print(f"Graph partitioned into {len(partition)} components:")
+        for i, comm in enumerate(partition):
+            print(f"  Component {i+1}: {comm}")
+        print("---")
+
+    if output_components:
+        # True exports to the current directory, for compatibility with the original flag
+        output_dir = "." if output_components is True else output_components
+        with phase("export"):
+            export_components(graph, partition, output_dir, index=index, quiet=quiet)
+    return partition
+
+
+def export_components(graph, partition, output_dir, workers=4, index=False, quiet=False):
+    """
+    Exports each component of a partition to `component_{i}.gml` in the output directory, or all of them to one indexed `partition_index.npz`.
+    Each component is streamed to disk from a view of the graph, without copying it into a subgraph, and the files are written in a thread pool.
+
+    Parameters:
+        - graph (NetworkX graph): the partitioned graph
+        - partition (tuple[set]): the components of the partition
+        - output_dir (str): the directory to export to, created if it does not exist
+        - workers (int): the number of threads writing files (default = 4)
+        - index (bool): flag that exports one indexed file instead of one .gml file per component (default = False)
+        - quiet (bool): flag that skips printing where the components were exported (default = False)
+
+    Returns:
+        - None
+    """
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+
+        if index:
+            # one column with the component of each node, grouped by component, plus the offset where each component starts
+            nodes = [node for comm in partition for node in comm]
+            sizes = [len(comm) for comm in partition]
+            np.savez(
+                os.path.join(output_dir, "partition_index.npz"),
+                nodes=np.array([str(node) for node in nodes]),
+                component=np.repeat(np.arange(len(partition)), sizes),
+                offsets=np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+            )
+        else:
+            paths = [os.path.join(output_dir, f"component_{i+1}.gml") for i in range(len(partition))]
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # list() re-raises any error from the writes
+                list(pool.map(_write_component, [graph] * len(partition), partition, paths))
+
+        if not quiet:
+            print(f"Exported {len(partition)} components to {os.path.abspath(output_dir)}.\n---")
+
+    except Exception as e:
+        print("Exporting components terminated due to an error in creating the files or writing the components. Provided error:", e, "\n---")
+        return
+
+
+def _write_component(graph, comm, path):
+    """
+    Helper function that streams one component to a .gml file, a chunk of rows at a time, from the arrays of a view of the graph.
+
+    Parameters:
+        - graph (NetworkX graph): the partitioned graph
+        - comm (set): the nodes of the component
+        - path (str): the .gml file to write
+
+    Returns:
+        - None
+    """
+
+    write_gml_arrays(graph_to_arrays(graph.subgraph(comm)), path)
+
+
+def girvan_newman(graph, n, samples=None, seed=None):
+    """
+    Removes the edge with the highest edge betweenness until the graph splits into `n` components. After each removal, the edge betweenness
+    is only recomputed within the component(s) that contained the removed edge, since paths never cross components.
+
+    Parameters:
+        - graph (NetworkX graph): the graph to be partitioned
+        - n (int): number of components
+        - samples (int): number of sampled sources to approximate the edge betweenness of each component with (default = None, which is exact)
+        - seed (int): seed for the sampled sources (default = None)
+
+    Returns:
+        - partition (tuple[set]): the partition with `n` components (less than `n` if the graph runs out of edges first),
+          or None if the graph already has more than `n` components
+    """
+
+    rng = random.Random(seed)
+
+    # work on a copy of the structure only, so the user graph and its attributes are untouched
+    working = nx.Graph()
+    working.add_nodes_from(graph)
+    working.add_edges_from((u, v) for u, v in graph.edges() if u != v)
+
+    num_components = nx.number_connected_components(working)
+    if num_components > n:
+        return None
+
+    # unnormalized edge betweenness of every edge, which stays comparable across components
+    edge_scores = {}
+    for component in nx.connected_components(working):
+        edge_scores.update(_component_betweenness(working, component, samples, rng))
+
+    while num_components < n and edge_scores:
+        # remove the most valuable edge
+        edge = max(edge_scores, key=edge_scores.get)
+        u, v = tuple(edge)
+        working.remove_edge(u, v)
+        del edge_scores[edge]
+
+        # only the component(s) that contained the removed edge change, so only recompute those
+        component_u = nx.node_connected_component(working, u)
+        affected = [component_u]
+        if v not in component_u:
+            affected.append(nx.node_connected_component(working, v))
+            num_components += 1
+        for component in affected:
+            edge_scores.update(_component_betweenness(working, component, samples, rng))
+
+    return tuple(nx.connected_components(working))
+
+
+def _component_betweenness(graph, component, samples, rng):
+    """
+    Helper function that computes the unnormalized edge betweenness within one connected component.
+
+    Parameters:
+        - graph (NetworkX graph): the graph being partitioned
+        - component (set): the nodes of the component
+        - samples (int): number of sampled sources, or None for exact
+        - rng (random.Random): random generator for the sampled sources
+
+    Returns:
+        - dict: edge betweenness of each edge in the component, keyed by the frozenset of its end nodes
+    """
+
+    # only sample when the component has more nodes than the number of samples
+    k = samples if samples is not None and samples < len(component) else None
+    return edge_betweenness(graph.subgraph(component), k, rng)
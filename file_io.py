@@ -1,22 +1,74 @@
 ## NOTE: this file reuses a lot of code from Project 1
 
+import os
+import json
+import hashlib
+import numpy as np
 import networkx as nx
+from gml_stream import Column, csr_arrays, read_column, read_gml_arrays, write_gml_arrays
+from profiling import phase
 
-def parse_graph(file_name):
+# bump when the cache layout changes, so old caches are rebuilt
+CACHE_VERSION = 4
+
+
+def parse_graph(file_name, use_cache=True):
     """Takes the input file and parses it into a NetworkX graph that can be analyzed
-    Input: .gml file name of the submitted graph
+    Inputs: file name of the submitted graph, bool to read/write the binary cache of .gml files
     Output: NetworkX graph of the submitted graph from the file"""
+
+    arrays = parse_arrays(file_name, use_cache)
+    try:
+        return graph_from_arrays(arrays)
+    except Exception as e:
+        raise Exception("Program quit due to an error in building the graph from the provided file. Provided error:", e)
+
+
+def parse_arrays(file_name, use_cache=True):
+    """Takes the input file and parses it into array-backed storage, which graph_from_arrays() turns into a NetworkX graph and
+    compact_graph.CompactGraph wraps for the analyses. Edge tables (.csv, .parquet, .edgelist, .txt) are read with the matching reader in
+    TABLE_READERS. For .gml files, the first parse writes a binary cache next to the file, and later parses load the cache instead as long
+    as the file has not changed
+    Inputs: file name of the submitted graph, bool to read/write the binary cache of .gml files
+    Output: dict of arrays in the same layout as load_cache()"""
     
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension in TABLE_READERS:
+        try:
+            # reads the edge table (and its node table, if there is one)
+            with phase("read_table"):
+                return TABLE_READERS[extension](file_name)
+        except Exception as e:
+            raise Exception(f"Program quit due to an error in reading and parsing the graph from the provided {extension} file. Provided error:", e)
+
     if ".gml" not in file_name:
-        raise Exception("Input file type is not .gml, so program terminated. Provided file:", file_name)
+        raise Exception(f"Input file type is not one of .gml, {', '.join(TABLE_READERS)}, so program terminated. Provided file:", file_name)
+
+    # a broken or stale cache is never fatal, the .gml file is parsed instead
+    if use_cache:
+        try:
+            with phase("load_cache"):
+                arrays = load_cache(file_name)
+            if arrays is not None:
+                return arrays
+        except Exception as e:
+            print("Loading the cached graph failed, so the .gml file will be parsed instead. Provided error:", e, "\n---")
 
     try:
-        # reads .gml file and parses it into the graph
-        submitted_graph = nx.read_gml(file_name)
-        return submitted_graph
+        # streams the .gml file into arrays
+        with phase("read_gml"):
+            arrays = read_gml_arrays(file_name)
     
     except Exception as e:
         raise Exception("Program quit due to an error in reading and parsing the graph from the provided .gml file. Provided error:", e)
+
+    if use_cache:
+        try:
+            with phase("write_cache"):
+                write_cache(arrays, file_name)
+        except Exception as e:
+            print("Writing the graph cache failed, so the next run will parse the .gml file again. Provided error:", e, "\n---")
+    return arrays
     
 
 def save_graph(graph, file_name):
@@ -29,9 +81,401 @@ def save_graph(graph, file_name):
         return
 
     try:
-        # creates output file and writes graph to it
-        nx.write_gml(graph, file_name)
+        # creates output file and streams the graph to it in chunks of rows, from the graph's arrays
+        with phase("write_gml"):
+            write_gml_arrays(graph_to_arrays(graph), file_name)
 
     except Exception as e:
         print("Saving file terminated due to an error in creating the save file or saving the graph. Provided error:", e)
-        return
\ No newline at end of file
+        return
+
+def save_results(report, file_name):
+    """Takes a name for an output file and saves the results of every analysis of a run into it as JSON. Uses orjson if it is installed,
+    which serializes NumPy arrays natively, otherwise the standard json module
+    Inputs: dict of the run's report (the graph's size, timings, and each analysis' result by analysis name), .json file name
+    Output: none"""
+
+    if not file_name.endswith(".json"):
+        print("Results file type is not .json. Saving results terminated. Provided file:", file_name, "\n---")
+        return
+
+    try:
+        try:
+            import orjson
+        except ImportError:
+            with open(file_name, "w") as file:
+                json.dump(report, file, default=_json_value)
+            return
+        with open(file_name, "wb") as file:
+            file.write(orjson.dumps(report, default=_json_value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS))
+
+    except Exception as e:
+        print("Saving results terminated due to an error in creating the results file or serializing the results. Provided error:", e, "\n---")
+        return
+
+
+def _json_value(value):
+    """Helper function that converts the values JSON has no type for: NumPy arrays and scalars into lists and numbers, and sets (like the
+    communities of a partition) into lists sorted by label"""
+
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def cache_path(file_name):
+    """Function that gives the directory the binary cache of a .gml file is stored in, next to the file
+    Input: .gml file name
+    Output: cache directory name"""
+
+    return file_name + ".cache"
+
+
+def write_cache(arrays, file_name):
+    """Takes the array-backed storage of a graph and writes it as memory-mappable NumPy arrays next to its .gml file, tagged with the .gml
+    file's size, modification time, and hash
+    Inputs: dict of arrays from graph_to_arrays() or gml_stream.read_gml_arrays(), .gml file name
+    Output: none"""
+
+    stat = os.stat(file_name)
+    meta = dict(arrays["meta"])
+    meta.update({
+        "version": CACHE_VERSION,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "source_sha1": _file_hash(file_name)
+    })
+    write_arrays(dict(arrays, meta=meta), cache_path(file_name))
+
+
+def write_arrays(arrays, directory):
+    """Takes the array-backed storage of a graph and writes every array to a .npy file in a directory, with the metadata (and the names of
+    the arrays) in meta.json. Whatever an earlier write left in the directory is deleted first
+    Inputs: dict of arrays, directory name (created if it does not exist)
+    Output: none"""
+
+    os.makedirs(directory, exist_ok=True)
+    # delete the old metadata first, so the directory is never a valid cache while it is rewritten, then the old arrays, so an array of an
+    # attribute the graph no longer has (like a missing value mask) is not left behind. unlinking also keeps processes that memory-mapped
+    # the old arrays reading them instead of the new ones
+    for name in ["meta.json"] + [name for name in os.listdir(directory) if name.endswith(".npy")]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+    names = [name for name in arrays if name != "meta"]
+    for name in names:
+        np.save(os.path.join(directory, f"{name}.npy"), arrays[name])
+
+    # write the metadata last, so an interrupted write is never mistaken for a valid cache
+    with open(os.path.join(directory, "meta.json"), "w") as file:
+        json.dump(dict(arrays["meta"], arrays=names), file)
+
+
+def load_arrays(directory, meta=None):
+    """Takes a directory written by write_arrays() and memory-maps every array listed in its meta.json, read-only
+    Inputs: directory name, optional metadata that was already read from its meta.json
+    Output: dict with the metadata under "meta" and each memory-mapped array by name"""
+
+    if meta is None:
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+
+    arrays = {"meta": meta}
+    for name in meta["arrays"]:
+        arrays[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+    return arrays
+
+
+def load_cache(file_name):
+    """Takes a .gml file name and memory-maps its binary cache, if the cache exists and the .gml file has not changed since it was written
+    Input: .gml file name
+    Output: dict with the cache metadata under "meta" and each memory-mapped array by name, or None if there is no valid cache"""
+
+    directory = cache_path(file_name)
+    try:
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    stat = os.stat(file_name)
+    if meta.get("version") != CACHE_VERSION or meta["source_size"] != stat.st_size:
+        return None
+    # a different modification time with the same size could just be a touched file, so fall back to comparing hashes
+    if meta["source_mtime_ns"] != stat.st_mtime_ns:
+        if meta["source_sha1"] != _file_hash(file_name):
+            return None
+        # record the new modification time, so the next run does not hash the file again
+        meta["source_mtime_ns"] = stat.st_mtime_ns
+        try:
+            with open(os.path.join(directory, "meta.json.tmp"), "w") as file:
+                json.dump(meta, file)
+            os.replace(os.path.join(directory, "meta.json.tmp"), os.path.join(directory, "meta.json"))
+        except OSError:
+            pass
+    return load_arrays(directory, meta)
+
+
+def graph_to_arrays(graph):
+    """Takes a NetworkX graph and converts it into array-backed storage: a node label table, integer edge arrays, CSR adjacency arrays, and
+    one typed column per node/edge attribute (multigraph edge keys are stored in a "key" column)
+    Input: NetworkX graph
+    Output: dict of arrays, with the metadata under the "meta" key"""
+
+    nodes = list(graph.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    arrays = {}
+    meta = {"directed": graph.is_directed(), "multigraph": graph.is_multigraph(), "graph": graph.graph, "node_columns": {}, "edge_columns": {}}
+
+    labels = Column(categorical=False)
+    node_columns = {}
+    for row, (node, data) in enumerate(graph.nodes(data=True)):
+        labels.append(row, node)
+        for name, value in data.items():
+            node_columns.setdefault(name, Column()).append(row, value)
+
+    edges = graph.edges(keys=True, data=True) if graph.is_multigraph() else graph.edges(data=True)
+    sources = []
+    targets = []
+    edge_columns = {}
+    for row, edge in enumerate(edges):
+        sources.append(index[edge[0]])
+        targets.append(index[edge[1]])
+        if graph.is_multigraph():
+            edge_columns.setdefault("key", Column()).append(row, edge[2])
+        for name, value in edge[-1].items():
+            edge_columns.setdefault(name, Column()).append(row, value)
+
+    meta["labels"] = labels.finish("labels", len(nodes), arrays)
+    for name, column in node_columns.items():
+        meta["node_columns"][name] = column.finish(f"node_{name}", len(nodes), arrays)
+    for name, column in edge_columns.items():
+        meta["edge_columns"][name] = column.finish(f"edge_{name}", len(sources), arrays)
+
+    arrays["meta"] = meta
+    arrays["sources"] = np.array(sources, dtype=np.int64)
+    arrays["targets"] = np.array(targets, dtype=np.int64)
+    arrays["indptr"], arrays["indices"] = csr_arrays(len(nodes), arrays["sources"], arrays["targets"], meta["directed"])
+    return arrays
+
+
+def graph_from_arrays(arrays):
+    """Takes the array-backed storage of a graph and rebuilds the NetworkX graph it describes
+    Input: dict of arrays from load_cache(), graph_to_arrays(), or gml_stream.read_gml_arrays()
+    Output: NetworkX graph"""
+
+    meta = arrays["meta"]
+    if meta["multigraph"]:
+        graph = nx.MultiDiGraph() if meta["directed"] else nx.MultiGraph()
+    else:
+        graph = nx.DiGraph() if meta["directed"] else nx.Graph()
+    graph.graph.update(meta["graph"])
+
+    nodes = read_column(arrays, "labels", meta["labels"])
+    node_columns = {name: read_column(arrays, f"node_{name}", kind) for name, kind in meta["node_columns"].items()}
+    graph.add_nodes_from(
+        (node, {name: column[i] for name, column in node_columns.items() if column[i] is not None}) for i, node in enumerate(nodes)
+    )
+
+    sources = arrays["sources"].tolist()
+    targets = arrays["targets"].tolist()
+    edge_columns = {name: read_column(arrays, f"edge_{name}", kind) for name, kind in meta["edge_columns"].items()}
+    # multigraph edges keep their keys
+    keys = edge_columns.pop("key") if meta["multigraph"] and "key" in edge_columns else None
+    for i, (u, v) in enumerate(zip(sources, targets)):
+        data = {name: column[i] for name, column in edge_columns.items() if column[i] is not None}
+        if meta["multigraph"]:
+            graph.add_edge(nodes[u], nodes[v], keys[i] if keys is not None else None, **data)
+        else:
+            graph.add_edge(nodes[u], nodes[v], **data)
+    return graph
+
+
+def _file_hash(file_name):
+    """Helper function that hashes a file in chunks
+    Input: file name
+    Output: SHA-1 hex digest of the file"""
+
+    digest = hashlib.sha1()
+    with open(file_name, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_csv_arrays(file_name, chunk_size=1_000_000):
+    """Reads an edge table from a .csv file into array-backed storage, a chunk of rows at a time. The file needs 'source' and 'target' columns,
+    and every other column (like 'sign') becomes an edge attribute. Node attributes (like 'color') are read from an optional node table next to
+    it, named like graph.nodes.csv for graph.csv, with a 'label' column
+    Inputs: .csv file name, number of rows per chunk
+    Output: dict of arrays in the same layout as load_cache()"""
+
+    # pandas is slow to import, so it is only imported when an edge table is read
+    import pandas as pd
+
+    # node labels are read as strings, the same as in .gml files
+    chunks = pd.read_csv(file_name, chunksize=chunk_size, dtype={"source": str, "target": str})
+    node_file = _node_table_name(file_name)
+    node_table = pd.read_csv(node_file, dtype={"label": str}) if os.path.exists(node_file) else None
+    return _table_arrays(chunks, node_table)
+
+
+def read_parquet_arrays(file_name, chunk_size=1_000_000):
+    """Reads an edge table from a .parquet file into array-backed storage, a batch of rows at a time, the same way as read_csv_arrays()
+    (with an optional graph.nodes.parquet node table). Requires pyarrow
+    Inputs: .parquet file name, number of rows per batch
+    Output: dict of arrays in the same layout as load_cache()"""
+
+    import pandas as pd
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception("Reading .parquet files requires pyarrow. To install, run: pip install pyarrow")
+
+    chunks = (batch.to_pandas().astype({"source": str, "target": str}) for batch in pq.ParquetFile(file_name).iter_batches(batch_size=chunk_size))
+    node_file = _node_table_name(file_name)
+    node_table = pd.read_parquet(node_file).astype({"label": str}) if os.path.exists(node_file) else None
+    return _table_arrays(chunks, node_table)
+
+
+def read_edgelist_arrays(file_name, chunk_size=1_000_000):
+    """Reads a whitespace separated edge list ('source target' or 'source target sign' per line, '#' for comments) into array-backed storage,
+    a chunk of lines at a time
+    Inputs: edge list file name, number of lines per chunk
+    Output: dict of arrays in the same layout as load_cache()"""
+
+    import pandas as pd
+
+    chunks = pd.read_csv(file_name, sep=r"\s+", comment="#", header=None, chunksize=chunk_size, dtype={0: str, 1: str})
+
+    def named(chunk):
+        chunk = chunk.rename(columns={0: "source", 1: "target", 2: "sign"})
+        return chunk[[column for column in ("source", "target", "sign") if column in chunk]]
+
+    return _table_arrays((named(chunk) for chunk in chunks), None)
+
+
+# readers for edge table input files, by extension
+TABLE_READERS = {
+    ".csv": read_csv_arrays,
+    ".parquet": read_parquet_arrays,
+    ".edgelist": read_edgelist_arrays,
+    ".txt": read_edgelist_arrays
+}
+
+
+def _node_table_name(file_name):
+    """Helper function that gives the name of the optional node table of an edge table, e.g. graph.nodes.csv for graph.csv"""
+
+    base, extension = os.path.splitext(file_name)
+    return f"{base}.nodes{extension}"
+
+
+def _table_arrays(chunks, node_table):
+    """Helper function that converts chunks of an edge table (and an optional node table) into array-backed storage. Node labels are mapped to
+    integer ids with vectorized lookups, in order of first appearance (node table first), and attribute columns are typed per column. Numeric
+    signs like 1/-1 are converted into '+'/'-', the same as the signs of .gml files
+    Inputs: iterable of pandas DataFrames with 'source' and 'target' columns, optional pandas DataFrame with a 'label' column
+    Output: dict of arrays in the same layout as load_cache()"""
+
+    import pandas as pd
+
+    index = {}
+    sources = []
+    targets = []
+    edge_parts = {}
+
+    def add_labels(values):
+        # give the labels that were not seen yet the next ids
+        new = pd.unique(values[~values.isin(index.keys())]) if index else pd.unique(values)
+        index.update(zip(new, range(len(index), len(index) + len(new))))
+
+    if node_table is not None:
+        if node_table["label"].duplicated().any():
+            raise ValueError("the node table has duplicated labels")
+        add_labels(node_table["label"])
+
+    for chunk in chunks:
+        if "source" not in chunk or "target" not in chunk:
+            raise ValueError("the edge table needs 'source' and 'target' columns")
+        if "sign" in chunk:
+            chunk = chunk.assign(sign=_signs(chunk["sign"]))
+        add_labels(pd.concat((chunk["source"], chunk["target"]), ignore_index=True))
+        sources.append(chunk["source"].map(index).to_numpy(dtype=np.int64))
+        targets.append(chunk["target"].map(index).to_numpy(dtype=np.int64))
+        for name in chunk.columns:
+            if name not in ("source", "target"):
+                edge_parts.setdefault(name, []).append(chunk[name])
+
+    arrays = {}
+    meta = {"directed": False, "multigraph": False, "graph": {}, "node_columns": {}, "edge_columns": {}}
+    labels = np.array(list(index), dtype=str)
+    arrays["labels"] = labels
+    meta["labels"] = "str"
+
+    arrays["sources"] = np.concatenate(sources) if sources else np.zeros(0, dtype=np.int64)
+    arrays["targets"] = np.concatenate(targets) if targets else np.zeros(0, dtype=np.int64)
+
+    for name, parts in edge_parts.items():
+        meta["edge_columns"][name] = _typed_column(pd.concat(parts, ignore_index=True), f"edge_{name}", arrays)
+
+    if node_table is not None:
+        # line the node attributes up with the node ids (nodes only found in the edge table have them missing)
+        node_table = node_table.set_index("label").reindex(labels)
+        for name in node_table.columns:
+            meta["node_columns"][name] = _typed_column(node_table[name].reset_index(drop=True), f"node_{name}", arrays)
+
+    arrays["meta"] = meta
+    arrays["indptr"], arrays["indices"] = csr_arrays(len(labels), arrays["sources"], arrays["targets"], False)
+    return arrays
+
+
+def _signs(values):
+    """Helper function that converts a numeric sign column (like 1/-1) into '+'/'-' strings, keeping missing signs missing. Other columns are
+    returned as they are
+    Input: pandas Series of edge signs
+    Output: pandas Series of edge signs"""
+
+    import pandas as pd
+
+    if not pd.api.types.is_numeric_dtype(values):
+        return values
+    present = values.notna()
+    if (values[present] == 0).any():
+        raise ValueError("an edge has a sign of 0, which is neither positive nor negative")
+    return pd.Series(np.where(values > 0, "+", "-"), index=values.index, dtype=object).where(present)
+
+
+def _typed_column(values, name, arrays):
+    """Helper function that stores a pandas column in `arrays` as a typed column: booleans, integers, floats, or categorical codes for anything
+    else (as strings). Missing values are tracked with a mask
+    Inputs: pandas Series, column name, dict of arrays to store it in
+    Output: the kind of column that was stored"""
+
+    import pandas as pd
+
+    present = values.notna().to_numpy()
+    if pd.api.types.is_bool_dtype(values):
+        arrays[name] = values.fillna(False).to_numpy(dtype=bool)
+        kind = "bool"
+    elif pd.api.types.is_integer_dtype(values):
+        arrays[name] = values.fillna(0).to_numpy(dtype=np.int64)
+        kind = "int"
+    elif pd.api.types.is_float_dtype(values):
+        # integer columns with missing values are read as floats too, and stay floats (with the mask)
+        arrays[name] = values.fillna(0).to_numpy(dtype=np.float64)
+        kind = "float"
+    else:
+        codes, categories = pd.factorize(values.astype("string"))
+        arrays[f"{name}_categories"] = np.array(categories, dtype=str) if len(categories) else np.array([""])
+        arrays[name] = np.where(codes < 0, 0, codes).astype(np.int8 if len(categories) <= 127 else np.int32)
+        kind = "categorical"
+
+    if not present.all():
+        arrays[f"{name}_mask"] = present
+    return kind
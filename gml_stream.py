@@ -0,0 +1,446 @@
+import re
+import json
+import html
+from array import array
+import numpy as np
+
+# same token patterns as nx.read_gml, so both parse files the same way
+_PATTERNS = [
+    r"[A-Za-z][0-9A-Za-z_]*\b",  # keys
+    r"[+-]?(?:[0-9]*\.[0-9]+|[0-9]+\.[0-9]*|INF)(?:[Ee][+-]?[0-9]+)?",  # reals
+    r"[+-]?[0-9]+",  # ints
+    r'".*?"',  # strings
+    r"\[",  # dict start
+    r"\]",  # dict end
+    r"#.*$|\s+",  # comments and whitespace
+]
+_TOKENS = re.compile("|".join(f"({pattern})" for pattern in _PATTERNS))
+_KEY, _REAL, _INT, _STRING, _START, _END, _SKIP = range(7)
+
+# marks a list with one item, as written by nx.write_gml
+LIST_START_VALUE = "_networkx_list_start"
+
+# rows written per chunk by the streaming writer
+_CHUNK_ROWS = 1 << 16
+
+
+def read_gml_arrays(file_name):
+    """Function that streams a .gml file into array-backed storage: nodes get integer ids in file order with their labels in a table, edges
+    become integer source/target arrays, and every attribute becomes a typed column. Only one node or edge record is held as Python objects
+    at a time, so memory stays bounded by the arrays themselves. Like nx.read_gml, an edge repeated in a graph that is not a multigraph is an
+    error
+    Input: .gml file name
+    Output: dict of arrays in the same layout as file_io.load_cache(), with the metadata under the "meta" key"""
+
+    graph_attrs = {}
+    labels = Column(categorical=False)
+    id_index = {}
+    label_index = set()
+    node_columns = {}
+    edge_columns = {}
+    sources = array("q")
+    targets = array("q")
+
+    for kind, record in _records(_tokenize(file_name)):
+        if kind == "graph":
+            graph_attrs = record
+        elif kind == "node":
+            row = len(id_index)
+            if "id" not in record or "label" not in record:
+                raise ValueError(f"node #{row} has no 'id' or 'label' attribute")
+            node_id = record.pop("id")
+            label = record.pop("label")
+            if node_id in id_index:
+                raise ValueError(f"node id {node_id!r} is duplicated")
+            if label in label_index:
+                raise ValueError(f"node label {label!r} is duplicated")
+            id_index[node_id] = row
+            label_index.add(label)
+            labels.append(row, label)
+            for name, value in record.items():
+                node_columns.setdefault(name, Column()).append(row, value)
+        else:
+            row = len(sources)
+            try:
+                sources.append(id_index[record.pop("source")])
+                targets.append(id_index[record.pop("target")])
+            except KeyError as e:
+                raise ValueError(f"edge #{row} has an undefined or missing source/target {e}")
+            for name, value in record.items():
+                edge_columns.setdefault(name, Column()).append(row, value)
+
+    # the set of labels is only needed for the duplicate check
+    label_index = None
+
+    meta = {
+        "directed": bool(graph_attrs.pop("directed", False)),
+        "multigraph": bool(graph_attrs.pop("multigraph", False)),
+        "graph": graph_attrs,
+        "node_columns": {},
+        "edge_columns": {}
+    }
+    arrays = {"meta": meta}
+    meta["labels"] = labels.finish("labels", len(id_index), arrays)
+    for name, column in node_columns.items():
+        meta["node_columns"][name] = column.finish(f"node_{name}", len(id_index), arrays)
+    for name, column in edge_columns.items():
+        meta["edge_columns"][name] = column.finish(f"edge_{name}", len(sources), arrays)
+
+    arrays["sources"] = np.frombuffer(sources, dtype=np.int64) if len(sources) else np.zeros(0, dtype=np.int64)
+    arrays["targets"] = np.frombuffer(targets, dtype=np.int64) if len(targets) else np.zeros(0, dtype=np.int64)
+    if not meta["multigraph"]:
+        _check_duplicates(arrays["sources"], arrays["targets"], list(id_index), meta["directed"])
+    arrays["indptr"], arrays["indices"] = csr_arrays(len(id_index), arrays["sources"], arrays["targets"], meta["directed"])
+    return arrays
+
+
+def _check_duplicates(sources, targets, node_ids, directed):
+    """Helper function that raises the same error as nx.read_gml for the first edge that repeats an earlier edge, once every edge is read.
+    Edges are compared by their (lower, higher) node pair, or by (source, target) in a directed graph
+    Inputs: source array, target array, the .gml id of every node in row order, bool for directed graphs"""
+
+    if directed:
+        keys = sources * max(len(node_ids), 1) + targets
+    else:
+        keys = np.minimum(sources, targets) * max(len(node_ids), 1) + np.maximum(sources, targets)
+    order = np.argsort(keys, kind="stable")
+    # with a stable sort, an edge that repeats one before it comes right after an edge with the same key
+    repeated = order[1:][keys[order][1:] == keys[order][:-1]]
+    if len(repeated):
+        edge = int(repeated.min())
+        arrow = "->" if directed else "--"
+        raise ValueError(f"edge #{edge} ({node_ids[sources[edge]]!r}{arrow}{node_ids[targets[edge]]!r}) is duplicated")
+
+
+def write_gml_arrays(arrays, file_name):
+    """Function that streams array-backed storage to a .gml file in the same format as nx.write_gml, a chunk of rows at a time, without
+    building a NetworkX graph
+    Inputs: dict of arrays in the layout returned by read_gml_arrays() or file_io.load_cache(), .gml file name
+    Output: none"""
+
+    meta = arrays["meta"]
+    with open(file_name, "w", encoding="ascii") as file:
+        file.write("graph [\n")
+        if meta["directed"]:
+            file.write("  directed 1\n")
+        if meta["multigraph"]:
+            file.write("  multigraph 1\n")
+        for name, value in meta["graph"].items():
+            if name not in ("directed", "multigraph", "node", "edge"):
+                _write_lines(file, _gml_lines(name, value, "  "))
+
+        num_nodes = len(arrays["labels"])
+        for start in range(0, num_nodes, _CHUNK_ROWS):
+            rows = slice(start, min(start + _CHUNK_ROWS, num_nodes))
+            labels = read_column(arrays, "labels", meta["labels"], rows)
+            columns = [(name, read_column(arrays, f"node_{name}", kind, rows)) for name, kind in meta["node_columns"].items() if name not in ("id", "label")]
+            for i, label in enumerate(labels):
+                lines = ["  node [", f"    id {start + i}"]
+                lines += _gml_lines("label", label, "    ")
+                for name, column in columns:
+                    if column[i] is not None:
+                        lines += _gml_lines(name, column[i], "    ")
+                lines.append("  ]")
+                _write_lines(file, lines)
+
+        num_edges = len(arrays["sources"])
+        for start in range(0, num_edges, _CHUNK_ROWS):
+            rows = slice(start, min(start + _CHUNK_ROWS, num_edges))
+            sources = arrays["sources"][rows].tolist()
+            targets = arrays["targets"][rows].tolist()
+            columns = [(name, read_column(arrays, f"edge_{name}", kind, rows)) for name, kind in meta["edge_columns"].items() if name not in ("source", "target")]
+            for i in range(len(sources)):
+                lines = ["  edge [", f"    source {sources[i]}", f"    target {targets[i]}"]
+                for name, column in columns:
+                    if column[i] is not None:
+                        lines += _gml_lines(name, column[i], "    ")
+                lines.append("  ]")
+                _write_lines(file, lines)
+
+        file.write("]\n")
+
+
+def csr_arrays(num_nodes, sources, targets, directed):
+    """Function that builds CSR adjacency arrays from integer edge arrays (both directions for undirected graphs)
+    Inputs: number of nodes, source array, target array, bool for directed graphs
+    Output: the indptr and indices arrays"""
+
+    if directed:
+        rows, columns = sources, targets
+    else:
+        rows, columns = np.concatenate((sources, targets)), np.concatenate((targets, sources))
+    order = np.argsort(rows, kind="stable")
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=num_nodes)))).astype(np.int64)
+    return indptr, np.asarray(columns[order], dtype=np.int64)
+
+
+def read_column(arrays, name, kind, rows=slice(None)):
+    """Function that converts (a slice of) a typed column back into Python values, with None where the value is missing
+    Inputs: dict of arrays, column name, kind of column, optional slice of rows
+    Output: list of values"""
+
+    if kind == "categorical":
+        values = arrays[f"{name}_categories"][np.asarray(arrays[name][rows])].tolist()
+    elif kind == "json":
+        values = [json.loads(value) for value in arrays[name][rows].tolist()]
+    else:
+        values = arrays[name][rows].tolist()
+
+    if f"{name}_mask" in arrays:
+        values = [value if present else None for value, present in zip(values, arrays[f"{name}_mask"][rows].tolist())]
+    return values
+
+
+class Column:
+    """Builds one typed attribute column a value at a time, with the most compact type that holds every value so far exactly: integers,
+    floats, fixed length float vectors (like pos), categorical codes for strings, or JSON text for anything else. Missing rows are tracked
+    with a mask"""
+
+    def __init__(self, categorical=True):
+        self.categorical = categorical
+        self.kind = None
+        self.values = None
+        self.categories = {}
+        self.width = 0
+        self.present = array("b")
+
+    def append(self, row, value):
+        """Adds the value of a row. Rows must be added in increasing order, skipping the rows where the value is missing"""
+
+        kind = _value_kind(value, self.categorical)
+        # values that don't fit the column's type (including ints among floats, which would come back as floats, and vectors of another
+        # length) turn it into JSON text, once
+        if self.kind is None:
+            self._start(kind, value)
+        elif self.kind != "json" and (kind != self.kind or (self.kind == "vector" and len(value) != self.width)):
+            self._to_json()
+
+        # fill the rows where the value is missing
+        while len(self.present) < row:
+            self.present.append(0)
+            self._store(None)
+        self.present.append(1)
+        self._store(value)
+
+    def finish(self, name, num_rows, arrays):
+        """Converts the column into NumPy arrays stored in `arrays` under `name` and returns the kind of column"""
+
+        while len(self.present) < num_rows:
+            self.present.append(0)
+            self._store(None)
+
+        if self.kind == "int":
+            arrays[name] = np.array(self.values, dtype=np.int64)
+        elif self.kind == "float":
+            arrays[name] = np.array(self.values, dtype=np.float64)
+        elif self.kind == "vector":
+            arrays[name] = np.array(self.values, dtype=np.float64).reshape(num_rows, self.width)
+        elif self.kind == "categorical":
+            arrays[f"{name}_categories"] = np.array(list(self.categories)) if self.categories else np.array([""])
+            arrays[name] = np.array(self.values, dtype=np.int8 if len(self.categories) <= 127 else np.int32)
+        else:
+            self.kind = self.kind or "json"
+            arrays[name] = np.array(self.values or [json.dumps(None)] * num_rows, dtype=str)
+
+        if not all(self.present):
+            arrays[f"{name}_mask"] = np.array(self.present, dtype=bool)
+        return self.kind
+
+    def _start(self, kind, value):
+        self.kind = kind
+        if kind == "int":
+            self.values = array("q")
+        elif kind in ("float", "vector"):
+            self.values = array("d")
+            self.width = len(value) if kind == "vector" else 0
+        elif kind == "categorical":
+            self.values = array("i")
+        else:
+            self.values = []
+
+    def _store(self, value):
+        if self.kind is None:
+            return
+        if self.kind in ("int", "float"):
+            self.values.append(0 if value is None else value)
+        elif self.kind == "vector":
+            self.values.extend([0.0] * self.width if value is None else value)
+        elif self.kind == "categorical":
+            value = "" if value is None else value
+            self.values.append(self.categories.setdefault(value, len(self.categories)))
+        elif self.kind == "str":
+            self.values.append("" if value is None else value)
+        else:
+            self.values.append(json.dumps(value))
+
+    def _to_json(self):
+        # rebuild the stored values as JSON text, which holds any value
+        if self.kind == "vector":
+            old = [list(self.values[i:i + self.width]) for i in range(0, len(self.values), self.width)] if self.width else [[] for _ in self.present]
+        elif self.kind == "categorical":
+            names = list(self.categories)
+            old = [names[code] for code in self.values]
+        else:
+            old = list(self.values)
+        self.kind = "json"
+        self.values = [json.dumps(value if present else None) for value, present in zip(old, self.present)]
+
+
+def _value_kind(value, categorical):
+    """Helper function that picks the kind of column a single value fits in"""
+
+    if type(value) is int:
+        return "int"
+    if type(value) is float:
+        return "float"
+    if isinstance(value, str):
+        return "categorical" if categorical else "str"
+    if isinstance(value, list) and value and all(type(item) is float for item in value):
+        return "vector"
+    return "json"
+
+
+def _tokenize(file_name):
+    """Helper function that lazily splits a .gml file into (token type, value) pairs, a line at a time, the same way nx.read_gml does"""
+
+    with open(file_name, encoding="ascii", errors="replace") as file:
+        multilines = []
+        for line in file:
+            line = line.rstrip("\n")
+
+            # strings spread across multiple lines are joined by spaces
+            if multilines:
+                multilines.append(line.strip())
+                if line.endswith('"'):
+                    line = " ".join(multilines)
+                    multilines = []
+                else:
+                    continue
+            elif line.count('"') == 1 and line.strip()[0] != '"' and line.strip()[-1] != '"':
+                multilines = [line.rstrip()]
+                continue
+
+            position = 0
+            while position < len(line):
+                match = _TOKENS.match(line, position)
+                if match is None:
+                    raise ValueError(f"cannot tokenize {line[position:]!r}")
+                kind = match.lastindex - 1
+                text = match.group(match.lastindex)
+                position = match.end()
+                if kind == _KEY:
+                    yield kind, text
+                elif kind == _REAL:
+                    yield kind, float(text)
+                elif kind == _INT:
+                    yield kind, int(text)
+                elif kind != _SKIP:
+                    yield kind, text
+
+
+def _records(tokens):
+    """Helper function that turns the tokens of a .gml file into ("node", dict) and ("edge", dict) records as soon as each one is complete,
+    followed by one ("graph", dict) record with the graph attributes"""
+
+    tokens = iter(tokens)
+    kind, value = next(tokens, (None, None))
+    if kind != _KEY or value != "graph" or next(tokens, (None, None))[0] != _START:
+        raise ValueError("input contains no graph")
+
+    graph_attrs = {}
+    for kind, key in tokens:
+        if kind == _END:
+            break
+        if kind != _KEY:
+            raise ValueError(f"expected a key, found {key!r}")
+        value = _value(tokens, key)
+        if key in ("node", "edge") and isinstance(value, dict):
+            yield key, value
+        else:
+            graph_attrs.setdefault(key, []).append(value)
+    else:
+        raise ValueError("expected ']', found EOF")
+
+    yield "graph", {key: _clean(values) for key, values in graph_attrs.items()}
+
+
+def _value(tokens, key):
+    """Helper function that reads the value after a key, parsing nested [ ... ] blocks into dicts"""
+
+    kind, value = next(tokens, (None, None))
+    if kind in (_INT, _REAL):
+        return value
+    if kind == _STRING:
+        value = html.unescape(value[1:-1])
+        return () if value == "()" else [] if value == "[]" else value
+    if kind == _START:
+        record = {}
+        for kind, name in tokens:
+            if kind == _END:
+                return {name: _clean(values) for name, values in record.items()}
+            if kind != _KEY:
+                raise ValueError(f"expected a key, found {name!r}")
+            record.setdefault(name, []).append(_value(tokens, name))
+        raise ValueError("expected ']', found EOF")
+    if kind == _KEY and value in ("NAN", "INF"):
+        return float(value)
+    if kind == _KEY and key in ("id", "label", "source", "target"):
+        return value
+    raise ValueError(f"expected a value for {key!r}, found {value!r}")
+
+
+def _clean(values):
+    """Helper function that collapses the values of a repeated key the way nx.read_gml does"""
+
+    if len(values) == 1:
+        return values[0]
+    if values[0] == LIST_START_VALUE:
+        return values[1:]
+    return values
+
+
+def _gml_lines(key, value, indent, in_list=False):
+    """Helper function that formats one attribute as .gml lines, the same way nx.write_gml does"""
+
+    if isinstance(value, (bool, int)):
+        if key == "label":
+            return [f'{indent}{key} "{value}"']
+        if isinstance(value, bool):
+            return [f"{indent}{key} {int(value)}"]
+        # GML only supports signed 32-bit integers
+        if value < -(2 ** 31) or value >= 2 ** 31:
+            return [f'{indent}{key} "{value}"']
+        return [f"{indent}{key} {value}"]
+    if isinstance(value, float):
+        text = repr(value).upper()
+        if text == "INF":
+            text = "+INF"
+        elif "E" in text and "." not in text[:text.rfind("E")]:
+            text = text[:text.rfind("E")] + "." + text[text.rfind("E"):]
+        return [f'{indent}{key} "{text}"'] if key == "label" else [f"{indent}{key} {text}"]
+    if isinstance(value, dict):
+        lines = [f"{indent}{key} ["]
+        for name, item in value.items():
+            lines += _gml_lines(name, item, indent + "  ")
+        return lines + [f"{indent}]"]
+    if isinstance(value, (list, tuple)) and key != "label" and not in_list:
+        lines = []
+        if len(value) == 0:
+            lines.append(f'{indent}{key} "{value!r}"')
+        if len(value) == 1:
+            lines.append(f'{indent}{key} "{LIST_START_VALUE}"')
+        for item in value:
+            lines += _gml_lines(key, item, indent, True)
+        return lines
+    return [f'{indent}{key} "{_escape(str(value))}"']
+
+
+def _escape(text):
+    """Helper function that replaces unprintable or non-ASCII characters, double quotes, and ampersands with character references"""
+
+    return re.sub('[^ -~]|[&"]', lambda match: f"&#{ord(match.group(0))};", text)
+
+
+def _write_lines(file, lines):
+    file.write("\n".join(lines))
+    file.write("\n")
@@ -2,20 +2,66 @@
 
 import sys
 import file_io as fio
-import homophily as hom
-import balanced_graph as bal
-import cluster
-import neighborhood as nh
-import simulate_fails as sf
-import components as comp
-import robustness_check as rc
-import plot
-import animation as anim
-
-
-def main():
+from compact_graph import CompactGraph
+import planner
+import profiling
+
+# the analysis modules (and their slow imports like scipy.stats, pandas, and plotly) are imported in the block of their flag in main(), so a
+# run only imports what it asks for
+
+
+def option_value(args, flag, default):
+    """Function that reads the value that follows an optional flag in the command line arguments
+    Inputs: the command line arguments, the flag, the value to use if the flag is missing
+    Output: the value following the flag, or the default if the flag or its value is missing"""
+
+    if flag not in args:
+        return default
+    position = args.index(flag) + 1
+    if position >= len(args) or "--" in args[position]:
+        print(f"{flag} was missing its value, so the default of {default} was used.\n---")
+        return default
+    return args[position]
+
+
+def approximation_value(mode):
+    """Function that reads an "exact" or "approx:N" analysis mode from the command line arguments
+    Input: the mode argument
+    Output: None for "exact", N as an int (or a float if it has a decimal point), or -1 if the mode is not valid"""
+
+    if mode == "exact":
+        return None
+    if not mode.startswith("approx:"):
+        return -1
+    value = mode[len("approx:"):]
+    try:
+        return float(value) if "." in value else int(value)
+    except ValueError:
+        return -1
+
+
+def lod_value(mode):
+    """Function that reads a "full", "grid", "grid:N", or "communities" level of detail from the command line arguments
+    Input: the level of detail argument, or None if it is missing
+    Output: None if it is missing, ("full", None), ("grid", N) with N cells per axis (None for "grid", which uses the default), ("communities", None), or -1
+    if the level of detail is not valid"""
+
+    if mode is None:
+        return None
+    if mode in ("full", "grid", "communities"):
+        return (mode, None)
+    if mode.startswith("grid:") and mode[len("grid:"):].isdigit() and int(mode[len("grid:"):]) > 0:
+        return ("grid", int(mode[len("grid:"):]))
+    return -1
+
+
+def main(args=None):
+    """Function that runs every analysis requested in the command line arguments on the input graph
+    Input: optional list of arguments in the same format as sys.argv (default is sys.argv), so batch.py can run it once per file
+    Output: dict of each analysis' result by analysis name"""
+
     # get arguments from command line and initialize BFS node list, the end of the argument list, and bools for which analyses were called
-    args = sys.argv
+    args = sys.argv if args is None else args
     end = len(args)
     cluster_coeff = None
     neighborhood_over = None
@@ -24,96 +70,238 @@ def main():
     if end < 2:
         raise Exception(f"Program was terminated because there is no file to upload a graph with.\n---")
     
-    # parse in graph from given .gml file
-    user_graph = fio.parse_graph(args[1])
-
-    # call the components function
-    if "--components" in args:
-        # check if the number of components is missing. if so, terminate program.
-        if (args.index("--components") + 1 >= end) or ("--" in args[args.index("--components") + 1]):
-            print("Calculating components was terminated because it was missing the number of components for partitioning.\n---")
+    # with --profile, record the wall time, CPU time, and peak memory of every stage of the run, from parsing to the last analysis
+    profiler = None
+    if "--profile" in args:
+        profiler = profiling.Profiler(option_value(args, "--cprofile_dir", None))
+        profiler.start()
+
+    # parse in graph from given .gml file into arrays once, then share them between the CompactGraph the analyses run on and the NetworkX
+    # graph, which is only built (by the Artifacts store) if an analysis, the plot, or --output needs it
+    with profiling.phase("parse"):
+        arrays = fio.parse_arrays(args[1], "--no_cache" not in args)
+    compact = CompactGraph(arrays)
+
+    # read the shared analysis options once
+    # "exact" runs Brandes from every node, "approx:N" samples N pivots, and "approx:E" with a decimal E picks the pivots for an error bound of E
+    betweenness_mode = option_value(args, "--betweenness", "exact")
+    betweenness_samples = approximation_value(betweenness_mode)
+    workers = option_value(args, "--workers", 1)
+    jobs = option_value(args, "--jobs", 1)
+    if not str(jobs).isdigit() or int(jobs) < 1:
+        print(f"The number of jobs '{jobs}' is not a positive integer, so the analyses will run one at a time.\n---")
+        jobs = 1
+    # the profiler can only record the analyses that run in this process
+    if profiler is not None and int(jobs) > 1:
+        print("--profile runs the analyses one at a time, so --jobs was ignored.\n---")
+        jobs = 1
+    options = {"betweenness": None, "jobs": int(jobs)}
+    # --quiet skips printing the analyses' reports (errors are still printed), for runs that only read the results from --results_json
+    quiet = "--quiet" in args
+    if betweenness_samples != -1 and str(workers).isdigit():
+        if isinstance(betweenness_samples, float):
+            options["betweenness"] = (None, betweenness_samples, int(workers))
         else:
-            n = args[args.index("--components") + 1]
-            # check if each component should be exported to a separate .gml file
-            if "--split_output_dir" in args:
-                comp.components(n, user_graph, True)
+            options["betweenness"] = (betweenness_samples, None, int(workers))
+
+    # plan every requested analysis up front, then build each intermediate artifact they share once
+    artifacts = planner.Artifacts(arrays, compact, options)
+    artifacts.compute(planner.plan(args, options))
+
+    # with --jobs N, the analyses that only read the graph run N at a time in worker processes that memory-map the graph's arrays (straight
+    # from the .gml cache if the graph was loaded from it). everything is still printed in the order below, and leaving the block waits for
+    # the analyses running in worker processes and prints the rest of their output, even if an analysis raised
+    from_cache = "version" in arrays["meta"]
+    with planner.Runner(artifacts, arrays, options["jobs"], fio.cache_path(args[1]) if from_cache else None) as runner:
+        # call the components function
+        if "--components" in args:
+            import components as comp
+            # check if the number of components is missing. if so, terminate program.
+            if (args.index("--components") + 1 >= end) or ("--" in args[args.index("--components") + 1]):
+                print("Calculating components was terminated because it was missing the number of components for partitioning.\n---")
             else:
-                comp.components(n, user_graph)
+                n = args[args.index("--components") + 1]
+                method = option_value(args, "--method", "gn")
+                # Girvan-Newman can approximate the edge betweenness from "approx:N" sampled sources. the other methods don't use it
+                samples = betweenness_samples if method == "gn" else None
+                if samples == -1 or isinstance(samples, float):
+                    print("Calculating components was terminated because the betweenness argument was not 'exact' or 'approx:N' with an integer N.\n---")
+                # check if each component should be exported to a separate .gml file (or one indexed file), in the given directory or the current one
+                elif "--split_output_dir" in args:
+                    position = args.index("--split_output_dir") + 1
+                    output_dir = args[position] if position < end and "--" not in args[position] else True
+                    runner.run("components", comp.components, n, planner.GRAPH, output_dir, method, samples, index="--split_index" in args, quiet=quiet, parallel=True)
+                else:
+                    runner.run("components", comp.components, n, planner.GRAPH, method=method, samples=samples, quiet=quiet, parallel=True)
             
-    # call the robustness check
-    if "--robustness_check" in args:
-        # check if k is missing. if so, terminate program.
-        if (args.index("--robustness_check") + 1 >= end) or ("--" in args[args.index("--robustness_check") + 1]):
-            print("Robustness check was terminated because it was missing the number of components for partitioning.\n---")
-        else:
-            k = args[args.index("--robustness_check") + 1]
-            rc.robustness_check(user_graph, k)
-
-    # call the homophily function
-    if "--verify_homophily" in args:
-        hom.verify_hom(user_graph)
-
-    # call the balanced graph function
-    if "--verify_balanced_graph" in args:
-        bal.verify_bal(user_graph)
-
-    # call the simulate failures function
-    if "--simulate_failures" in args:
-        # check if k is missing. if so, terminate program.
-        if (args.index("--simulate_failures") + 1 >= end) or ("--" in args[args.index("--simulate_failures") + 1]):
-            print("Simulating failures was terminated because it was missing the number of removal edges argument.\n---")
-        else:
-            k = args[args.index("--simulate_failures") + 1]
-            sf.failures(user_graph, k)
-
-    # call the clustering coefficient function
-    if "--clustering" in args:
-        # check if the selected node is missing. if so, terminate program.
-        if (args.index("--clustering") + 1 >= end) or ("--" in args[args.index("--clustering") + 1]):
-            print("Clustering coefficient calculation was terminated because it was missing the clustering coefficient node argument.\n---")
-        else:
-            selected_node = args[args.index("--clustering") + 1]
-            cluster_coeff = cluster.clustering_coefficient(user_graph, selected_node)
+        # call the robustness check
+        if "--robustness_check" in args:
+            import robustness_check as rc
+            # check if k is missing. if so, terminate program.
+            if (args.index("--robustness_check") + 1 >= end) or ("--" in args[args.index("--robustness_check") + 1]):
+                print("Robustness check was terminated because it was missing the number of components for partitioning.\n---")
+            else:
+                k = args[args.index("--robustness_check") + 1]
+                simulations = option_value(args, "--simulations", 100)
+                runner.run("robustness_check", rc.robustness_check, planner.COMPACT, k, simulations, workers, components=artifacts.value("components"), quiet=quiet, parallel=True)
+
+        # call the robustness sweep over every number of edge failures
+        if "--robustness_sweep" in args:
+            import robustness_check as rc
+            # check if the output file is missing. if so, terminate program.
+            if (args.index("--robustness_sweep") + 1 >= end) or ("--" in args[args.index("--robustness_sweep") + 1]):
+                print("Robustness sweep was terminated because it was missing the output file argument.\n---")
+            else:
+                sweep_file = args[args.index("--robustness_sweep") + 1]
+                simulations = option_value(args, "--simulations", 100)
+                runner.run("robustness_sweep", rc.robustness_sweep, planner.COMPACT, simulations, workers, output_file=sweep_file, components=artifacts.value("components"), quiet=quiet, parallel=True)
+
+        # call the homophily function
+        if "--verify_homophily" in args:
+            import homophily as hom
+            runner.run("verify_homophily", hom.verify_hom, planner.GRAPH, quiet=quiet, parallel=True)
+
+        # call the balanced graph function
+        if "--verify_balanced_graph" in args:
+            import balanced_graph as bal
+            runner.run("verify_balanced_graph", bal.verify_bal, planner.GRAPH, planner.COMPACT, quiet=quiet, parallel=True)
+
+        # call the simulate failures function
+        if "--simulate_failures" in args:
+            import simulate_fails as sf
+            # check if k is missing. if so, terminate program.
+            if (args.index("--simulate_failures") + 1 >= end) or ("--" in args[args.index("--simulate_failures") + 1]):
+                print("Simulating failures was terminated because it was missing the number of removal edges argument.\n---")
+            else:
+                k = args[args.index("--simulate_failures") + 1]
+                # "exact" runs BFS from every node, "approx:N" samples N BFS sources
+                shortest_paths = option_value(args, "--shortest_paths", "exact")
+                path_samples = approximation_value(shortest_paths)
+                # the original graph's component count comes from the shared artifact
+                components = artifacts.value("components")
+                num_components = components[0] if components is not None else None
+
+                if path_samples == -1:
+                    print(f"Simulating failures was terminated because the shortest paths argument '{shortest_paths}' was not 'exact' or 'approx:N'.\n---")
+                elif betweenness_samples == -1:
+                    print(f"Simulating failures was terminated because the betweenness argument '{betweenness_mode}' was not 'exact' or 'approx:N'.\n---")
+                elif not str(workers).isdigit():
+                    print(f"Simulating failures was terminated because the number of workers '{workers}' is not an integer.\n---")
+                else:
+                    # the original graph's betweenness was cached by the shared artifact, so only the reduced graph is calculated here
+                    runner.run("simulate_failures", sf.failures, planner.COMPACT, k, path_samples, *options["betweenness"], components=num_components, quiet=quiet, parallel=True)
+
+        # call the clustering coefficient function
+        if "--clustering" in args:
+            import cluster
+            # check if the selected node is missing. if so, terminate program.
+            if (args.index("--clustering") + 1 >= end) or ("--" in args[args.index("--clustering") + 1]):
+                print("Clustering coefficient calculation was terminated because it was missing the clustering coefficient node argument.\n---")
+            else:
+                selected_node = args[args.index("--clustering") + 1]
+                # "all" saves the shared coefficients of every node (or calculates them in one pass if the shared ones failed)
+                # runs in this process, since it saves the coefficients into the graph for --output and --plot
+                if selected_node == "all" and artifacts.value("clustering") is not None:
+                    runner.run("clustering", cluster.save_coefficients, planner.GRAPH, artifacts.value("clustering"), quiet=quiet)
+                elif selected_node == "all":
+                    runner.run("clustering", cluster.clustering_coefficients, planner.GRAPH, compact=compact, triangles=artifacts.value("triangles"), quiet=quiet)
+                else:
+                    runner.run("clustering", cluster.clustering_coefficient, planner.GRAPH, selected_node, quiet=quiet)
+                cluster_coeff = runner.results["clustering"]
     
-    # call the neighborhood overlap function
-    if "--neighborhood" in args:
-        # check if the selected nodes are missing. if so, terminate program.
-        if (args.index("--neighborhood") + 2 >= end) or ("--" in args[args.index("--neighborhood") + 1]) or ("--" in args[args.index("--neighborhood") + 2]):
-            print("Neighborhood overlap calculation was terminated because it was missing the neighborhood overlap nodes arguments.\n---")
-        else:
-            selected_node_1 = args[args.index("--neighborhood") + 1]
-            selected_node_2 = args[args.index("--neighborhood") + 2]
+        # call the neighborhood overlap function
+        if "--neighborhood" in args:
+            import neighborhood as nh
+            # check if the selected nodes are missing. if so, terminate program.
+            if (args.index("--neighborhood") + 2 >= end) or ("--" in args[args.index("--neighborhood") + 1]) or ("--" in args[args.index("--neighborhood") + 2]):
+                print("Neighborhood overlap calculation was terminated because it was missing the neighborhood overlap nodes arguments.\n---")
+            else:
+                selected_node_1 = args[args.index("--neighborhood") + 1]
+                selected_node_2 = args[args.index("--neighborhood") + 2]
 
-            neighborhood_over = nh.neighborhood_overlap(user_graph, selected_node_1, selected_node_2)
+                runner.run("neighborhood", nh.neighborhood_overlap, planner.GRAPH, selected_node_1, selected_node_2, quiet=quiet)
+                neighborhood_over = runner.results["neighborhood"]
 
-    # call the output function
-    if "--output" in args:
-        # check if the output file name is missing. if so, terminate program.
-        if (args.index("--output") + 1 >= end) or ("--" in args[args.index("--output") + 1]):
-            print("Outputting the file was terminated because it was missing the output file name argument.\n---")
-        else:
-            output_file = args[args.index("--output") + 1]
-            fio.save_graph(user_graph, output_file)
-
-    # call the visualization function
-    if "--plot" in args:
-        # check if vis output control is missing. if so, terminate program.
-        if (args.index("--plot") + 1 >= end) or ("--" in args[args.index("--plot") + 1]):
-            print("Plotting was terminated because it was missing the plot control argument.\n---")
-        else:
-            control = args[args.index("--plot") + 1]
-            if control not in ["C", "N", "P"]:
-                print("Plotting was terminated because the plot control argument was not C, N, or P.\n---")
+        # with --save_layout, the graph's layout (from the layout cache, like --plot) is written into the pos attribute of every node, so --output
+        # saves it and --plot draws it
+        if "--save_layout" in args:
+            import layout_cache
+            runner.run("save_layout", layout_cache.save_positions, planner.GRAPH, "--no_cache" not in args, quiet=quiet)
+
+        # call the output function
+        if "--output" in args:
+            # check if the output file name is missing. if so, terminate program.
+            if (args.index("--output") + 1 >= end) or ("--" in args[args.index("--output") + 1]):
+                print("Outputting the file was terminated because it was missing the output file name argument.\n---")
+            else:
+                output_file = args[args.index("--output") + 1]
+                runner.run("output", fio.save_graph, planner.GRAPH, output_file)
+
+        # --lod aggregates plots and animations into groups of nodes (drawn as super nodes), and --detail draws one group in full. without --lod,
+        # graphs above LOD_THRESHOLD nodes plus edges are aggregated into grid cells
+        lod = lod_value(option_value(args, "--lod", None))
+        detail = option_value(args, "--detail", None)
+        if lod == -1:
+            print(f"The level of detail '{args[args.index('--lod') + 1]}' is not full, grid, grid:N, or communities, so the default was used.\n---")
+            lod = None
+        if detail is not None and not detail.isdigit():
+            print(f"The detail group '{detail}' is not a group id, so every group is shown.\n---")
+            detail = None
+        detail = int(detail) if detail is not None else None
+
+        # call the visualization function
+        if "--plot" in args:
+            import plot
+            # check if vis output control is missing. if so, terminate program.
+            if (args.index("--plot") + 1 >= end) or ("--" in args[args.index("--plot") + 1]):
+                print("Plotting was terminated because it was missing the plot control argument.\n---")
             else:
-                plot.plot(control, user_graph, cluster_coeff, neighborhood_over)
+                control = args[args.index("--plot") + 1]
+                if control not in ["C", "N", "P"]:
+                    print("Plotting was terminated because the plot control argument was not C, N, or P.\n---")
+                else:
+                    # mode C reuses the shared clustering coefficients when --clustering only calculated one node's
+                    if control == "C" and not isinstance(cluster_coeff, dict) and artifacts.value("clustering") is not None:
+                        cluster_coeff = artifacts.value("clustering")
+                    runner.run("plot", plot.plot, control, planner.GRAPH, cluster_coeff, neighborhood_over, artifacts.value("overlaps"), lod, detail, "--no_cache" not in args, degrees=artifacts.value("degrees"))
     
-    # call the temporal simulation function
-    if "--temporal_simulation" in args:
-         # check if the simulation file is missing. if so, terminate program.
-        if (args.index("--temporal_simulation") + 1 >= end) or ("--" in args[args.index("--temporal_simulation") + 1]):
-            print("Temporal simulation was terminated because it was missing the simulation file argument.\n---")
+        # call the temporal simulation function
+        if "--temporal_simulation" in args:
+            import animation as anim
+             # check if the simulation file is missing. if so, terminate program.
+            if (args.index("--temporal_simulation") + 1 >= end) or ("--" in args[args.index("--temporal_simulation") + 1]):
+                print("Temporal simulation was terminated because it was missing the simulation file argument.\n---")
+            else:
+                sim_file = args[args.index("--temporal_simulation") + 1]
+                runner.run("temporal_simulation", anim.animation, sim_file, lod, detail, "--no_cache" not in args)
+
+    # print the time each shared artifact and analysis took
+    if "--timings" in args:
+        artifacts.print_timings()
+
+    # save every analysis' result, along with the graph's size and the timings, into one .json file
+    if "--results_json" in args:
+        # check if the results file name is missing. if so, terminate program.
+        if (args.index("--results_json") + 1 >= end) or ("--" in args[args.index("--results_json") + 1]):
+            print("Saving results was terminated because it was missing the results file name argument.\n---")
         else:
-            sim_file = args[args.index("--temporal_simulation") + 1]
-            anim.animation(sim_file)
+            report = {
+                "file": args[1],
+                "graph": {"nodes": compact.number_of_nodes(), "edges": compact.number_of_edges(), "directed": compact.directed, "multigraph": compact.multigraph},
+                "timings": {"artifacts": artifacts.artifact_timings, "analyses": artifacts.analysis_timings},
+                "results": runner.results
+            }
+            fio.save_results(report, args[args.index("--results_json") + 1])
+
+    # print the profile of the run and save it into a .json file (profile.json if the file name is missing) that can be diffed across runs
+    if profiler is not None:
+        profiler.stop()
+        if not quiet:
+            profiler.print_report()
+        position = args.index("--profile") + 1
+        profile_file = args[position] if position < end and "--" not in args[position] else "profile.json"
+        fio.save_results({"file": args[1], **profiler.report()}, profile_file)
+    return runner.results
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,11 @@ import networkx as nx
 import scipy.stats as ss
 
 
-def verify_hom(graph):
+def verify_hom(graph, quiet=False):
     """Function that determines whether color-coded homophily exists in the graph using a statistical t-test
-    Input: user graph
-    Output: N/A - all print statements"""
+    Inputs: user graph, bool to skip printing the results
+    Output: dict with the results (None if homophily could not be calculated), formatted as {"homophily": bool, "cross_edge_fraction": float,
+    "expected_cross_edge_fraction": float, "test_value": float, "table_value": float}, also printed"""
 
     # check if one of the nodes doesn't have a color attribute. if one is missing, terminate the program.
     for node, color in graph.nodes(data="color"):
@@ -43,8 +44,19 @@ def verify_hom(graph):
         return
 
     # determine if the difference is statistically significant or not
-    if test_value > table_value:
+    results = {
+        "homophily": bool(test_value > table_value),
+        "cross_edge_fraction": mu,
+        "expected_cross_edge_fraction": mu0,
+        "test_value": float(test_value),
+        "table_value": float(table_value)
+    }
+    if quiet:
+        return results
+
+    if results["homophily"]:
         print(f"The graph has evidence of homophily, with {mu:.2f} [the fraction of cross-edges] being significantly less than {mu0:.2f} [2p(1-p)].\n---")
     
     else:
         print(f"The graph does not have evidence of homophily, with {mu:.2f} [the fraction of cross-edges] not being significantly less than {mu0:.2f} [2p(1-p)].\n---")
+    return results
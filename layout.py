@@ -0,0 +1,250 @@
+import numpy as np
+
+# node count up to which the repulsion between nodes is calculated exactly. above it, far away nodes are approximated by the center of mass
+# of their cell in a multi level grid (Barnes-Hut)
+EXACT_LIMIT = 1000
+
+# most node pairs compared at once in the exact repulsion, to bound memory
+_CHUNK = 2 ** 20
+
+# finer grid levels that may be added for clustered layouts, and the number of exact pairs per node in a cell above which they are added
+_EXTRA_LEVELS = 3
+_PAIRS_PER_NODE = 8
+
+# the (x, y) offsets from a cell to the children of the 3x3 cells around its parent that are not next to the cell itself, by the cell's parity
+_PARITIES = [(0, 0), (0, 1), (1, 0), (1, 1)]
+_FAR_OFFSETS = {
+    (parity_x, parity_y): tuple(np.array(offsets) for offsets in zip(*[(a - parity_x, b - parity_y) for a in range(-2, 4) for b in range(-2, 4)
+                                                                       if max(abs(a - parity_x), abs(b - parity_y)) > 1]))
+    for parity_x, parity_y in _PARITIES
+}
+
+
+def fruchterman_reingold(num_nodes, sources, targets, pos=None, rows=None, iterations=50, temperature=0.1, seed=42):
+    """
+    Force directed (Fruchterman-Reingold) layout on integer edge arrays, vectorized with NumPy. Uses the same forces as nx.spring_layout:
+    every pair of nodes repels with k^2 / distance and every edge attracts with distance^2 / k, where k = 1 / sqrt(number of nodes), and each
+    iteration moves a node by at most the temperature, which cools down linearly to 0. Only the nodes in `rows` move, so a layout can be
+    warm-started from earlier positions and only updated where the graph changed.
+
+    Parameters:
+        - num_nodes (int): the number of nodes
+        - sources (np.ndarray): the source node id of every edge
+        - targets (np.ndarray): the target node id of every edge
+        - pos (np.ndarray): the starting positions, one (x, y) row per node id (default = None, which starts from random positions in the unit square)
+        - rows (np.ndarray): the node ids that move (default = None, which moves every node)
+        - iterations (int): the number of iterations (default = 50)
+        - temperature (float): the most a node can move in the first iteration (default = 0.1)
+        - seed (int): seed for the random starting positions (default = 42)
+
+    Returns:
+        - pos (np.ndarray): the new positions, one (x, y) row per node id
+    """
+
+    pos = np.random.default_rng(seed).random((num_nodes, 2)) if pos is None else np.array(pos, dtype=np.float64)
+    if num_nodes == 0:
+        return pos
+    rows = np.arange(num_nodes) if rows is None else np.asarray(rows, dtype=np.int64)
+    k = 1 / np.sqrt(num_nodes)
+
+    # the edges of the moving nodes, in both directions, as (position in rows, neighbor) pairs
+    sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+    local = np.full(num_nodes, -1, dtype=np.int64)
+    local[rows] = np.arange(len(rows))
+    edge_rows = np.concatenate((local[sources], local[targets]))
+    edge_cols = np.concatenate((targets, sources))
+    keep = (edge_rows >= 0) & (edge_cols != np.concatenate((sources, targets)))
+    edge_rows, edge_cols = edge_rows[keep], edge_cols[keep]
+
+    for step in np.linspace(temperature, 0, iterations + 1)[:-1]:
+        displacement = _repulsion(pos, rows, k)
+
+        delta = pos[rows[edge_rows]] - pos[edge_cols]
+        distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 0.01)
+        np.add.at(displacement, edge_rows, -delta * (distance / k)[:, None])
+
+        # move every node along its displacement by at most the temperature
+        length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), 0.01)
+        pos[rows] += displacement * (np.minimum(length, step) / length)[:, None]
+    return pos
+
+
+def _repulsion(pos, rows, k):
+    """
+    Helper function that sums the repulsion of every node on each of the moving nodes, exactly up to EXACT_LIMIT nodes and with a multi level
+    grid approximation (Barnes-Hut with fixed interaction lists) above it. The grid is a quadtree over the bounding box: at every level, a
+    moving node is repelled by the center of mass of each cell that is a child of a cell next to its parent cell but is not next to its own
+    cell, and at the finest level by every node in the 3x3 block of cells around its own cell exactly. Every other node is counted exactly once,
+    and the cost is O(number of moving nodes * log(number of nodes)).
+
+    Parameters:
+        - pos (np.ndarray): the positions of every node
+        - rows (np.ndarray): the node ids that move
+        - k (float): the ideal edge length
+
+    Returns:
+        - displacement (np.ndarray): one (x, y) row of repulsion per moving node
+    """
+
+    if len(pos) <= EXACT_LIMIT:
+        return _pair_repulsion(pos[rows], pos, k)
+
+    points = pos[rows]
+    displacement = np.zeros((len(rows), 2))
+    low = pos.min(axis=0)
+    extent = np.maximum(pos.max(axis=0) - low, 1e-9) * (1 + 1e-9)
+
+    # about 2 nodes per cell at the finest level when the nodes are spread evenly. when they are clustered (a dense core with a few far away
+    # nodes), finer levels are added until the exact pairs of the finest level stop dominating, up to _EXTRA_LEVELS more. a coarser level's
+    # cell is the finest cell shifted right by the difference in levels
+    levels = max(2, int(np.ceil(np.log2(np.sqrt(len(pos) / 2)))))
+    for _ in range(_EXTRA_LEVELS + 1):
+        finest = np.minimum(((pos - low) / extent * 2 ** levels).astype(np.int64), 2 ** levels - 1)
+        occupancy = np.unique(finest[:, 0] * 2 ** levels + finest[:, 1], return_counts=True)[1]
+        if np.dot(occupancy, occupancy) <= _PAIRS_PER_NODE * len(pos):
+            break
+        levels += 1
+    else:
+        levels -= 1
+    for level in range(2, levels + 1):
+        side = 2 ** level
+        cell_xy = finest >> (levels - level)
+        cells = cell_xy[:, 0] * side + cell_xy[:, 1]
+        mass = np.bincount(cells, minlength=side * side)
+        centers = np.column_stack((np.bincount(cells, pos[:, 0], side * side), np.bincount(cells, pos[:, 1], side * side))) / np.maximum(mass, 1)[:, None]
+
+        # the children of the 3x3 cells around the parent cell, leaving out the 3x3 cells around the node's own cell. relative to the own
+        # cell, they are the same 27 offsets for every node with the same (x, y) parity
+        own = cell_xy[rows]
+        for parity_x, parity_y in _PARITIES:
+            group = np.flatnonzero((own[:, 0] & 1 == parity_x) & (own[:, 1] & 1 == parity_y))
+            dx, dy = _FAR_OFFSETS[(parity_x, parity_y)]
+            far_x = own[group, 0][:, None] + dx
+            far_y = own[group, 1][:, None] + dy
+            valid = (far_x >= 0) & (far_x < side) & (far_y >= 0) & (far_y < side)
+            far_cells = np.where(valid, far_x * side + far_y, 0)
+            valid &= mass[far_cells] > 0
+            node_index = np.broadcast_to(group[:, None], valid.shape)[valid]
+            far_cells = far_cells[valid]
+            _add_repulsion(displacement, node_index, points[node_index] - centers[far_cells], k, mass[far_cells])
+
+    # nodes in the 3x3 block of cells around the node's own cell at the finest level repel exactly
+    by_cell = np.argsort(cells, kind="stable")
+    starts = np.concatenate(([0], np.cumsum(mass)))
+    for offset in [(a, b) for a in range(-1, 2) for b in range(-1, 2)]:
+        near = own + np.array(offset)
+        inside = np.flatnonzero(np.all((near >= 0) & (near < side), axis=1))
+        near_cells = near[inside, 0] * side + near[inside, 1]
+        counts = mass[near_cells]
+        node_index = np.repeat(inside, counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        others = by_cell[np.repeat(starts[near_cells], counts) + within]
+        _add_repulsion(displacement, node_index, points[node_index] - pos[others], k)
+    return displacement
+
+
+def _add_repulsion(displacement, node_index, delta, k, weights=None):
+    """
+    Helper function that adds the repulsion k^2 / distance along each (node, delta) pair to the node's displacement. A zero delta (a node and
+    itself) adds nothing.
+
+    Parameters:
+        - displacement (np.ndarray): one (x, y) row per moving node, updated in place
+        - node_index (np.ndarray): the position in the moving nodes of each pair
+        - delta (np.ndarray): the difference between the node's position and the position repelling it, one (x, y) row per pair
+        - k (float): the ideal edge length
+        - weights (np.ndarray): optional weight of each pair, for cells standing in for their nodes (default = None, which is 1 each)
+    """
+
+    force = k * k / np.maximum(np.einsum("ij,ij->i", delta, delta), 1e-4)
+    if weights is not None:
+        force *= weights
+    displacement[:, 0] += np.bincount(node_index, delta[:, 0] * force, len(displacement))
+    displacement[:, 1] += np.bincount(node_index, delta[:, 1] * force, len(displacement))
+
+
+def _pair_repulsion(points, others, k):
+    """
+    Helper function that sums the repulsion k^2 / distance of every one of `others` on each point, a chunk of points at a time. A point does
+    not repel itself, since their difference is 0.
+
+    Parameters:
+        - points (np.ndarray): the positions the repulsion acts on
+        - others (np.ndarray): the positions that repel them
+        - k (float): the ideal edge length
+
+    Returns:
+        - displacement (np.ndarray): one (x, y) row of repulsion per point
+    """
+
+    displacement = np.zeros((len(points), 2))
+    chunk = max(1, _CHUNK // max(len(others), 1))
+    for start in range(0, len(points), chunk):
+        delta = points[start:start + chunk, None, :] - others[None, :, :]
+        distance2 = np.maximum(np.einsum("ijk,ijk->ij", delta, delta), 1e-4)
+        force = k * k / distance2
+        displacement[start:start + chunk] = np.einsum("ijk,ij->ik", delta, force)
+    return displacement
+
+
+class StableLayout:
+    """
+    Layout of a graph that changes over time, which stays stable between frames. The layout of the union graph (every edge that is ever
+    present) is calculated once, and each frame then starts from the positions of the previous frame and only moves the nodes whose edges
+    changed, for a small number of iterations at a low temperature. Each frame's layout costs time in proportion to the number of nodes it
+    touches instead of the size of the graph, and nodes that did not change stay where they were.
+    """
+
+    def __init__(self, num_nodes, sources, targets, iterations=50, seed=42, positions=None):
+        """
+        Parameters:
+            - num_nodes (int): the number of nodes
+            - sources (np.ndarray): the source node id of every edge of the union graph
+            - targets (np.ndarray): the target node id of every edge of the union graph
+            - iterations (int): the number of iterations of the union graph's layout (default = 50)
+            - seed (int): seed for the random starting positions (default = 42)
+            - positions (np.ndarray): the union graph's layout, if it was already calculated (default = None)
+        """
+
+        self.num_nodes = num_nodes
+        if positions is None:
+            positions = fruchterman_reingold(num_nodes, sources, targets, iterations=iterations, seed=seed)
+        self.positions = np.array(positions, dtype=np.float64)
+        # the neighbors of every node in the current frame
+        self.neighbors = [set() for _ in range(num_nodes)]
+
+    def update(self, added, removed, iterations=5, temperature=None):
+        """
+        Applies a frame's changes and moves the nodes they touch, warm-started from the current positions.
+
+        Parameters:
+            - added (tuple[np.ndarray]): the (source, target) node id arrays of the edges added in the frame
+            - removed (tuple[np.ndarray]): the (source, target) node id arrays of the edges removed in the frame
+            - iterations (int): the number of iterations (default = 5)
+            - temperature (float): the most a node can move in the first iteration (default = None, which is the ideal edge length)
+
+        Returns:
+            - positions (np.ndarray): the positions of every node id after the frame, updated in place
+        """
+
+        for (node_sources, node_targets), present in [(removed, False), (added, True)]:
+            for u, v in zip(node_sources.tolist(), node_targets.tolist()):
+                if present:
+                    self.neighbors[u].add(v)
+                    self.neighbors[v].add(u)
+                else:
+                    self.neighbors[u].discard(v)
+                    self.neighbors[v].discard(u)
+
+        moving = np.unique(np.concatenate(added + removed)).astype(np.int64)
+        if len(moving) == 0 or iterations == 0:
+            return self.positions
+
+        # only the moving nodes' edges pull on them. an edge between two moving nodes is listed once, from its lower node
+        is_moving = np.zeros(self.num_nodes, dtype=bool)
+        is_moving[moving] = True
+        pairs = [(node, neighbor) for node in moving.tolist() for neighbor in self.neighbors[node] if not is_moving[neighbor] or node < neighbor]
+        sources, targets = np.array(pairs, dtype=np.int64).reshape(-1, 2).T
+        temperature = 1 / np.sqrt(max(self.num_nodes, 1)) if temperature is None else temperature
+        self.positions = fruchterman_reingold(self.num_nodes, sources, targets, self.positions, moving, iterations, temperature)
+        return self.positions
@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from layout import fruchterman_reingold
+from profiling import phase
+
+# where the layouts are cached, shared by every graph file, and the most megabytes the cache may take before the least recently used
+# layouts are evicted
+LAYOUT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "graph_analysis", "layouts")
+LAYOUT_CACHE_MB = 256
+
+# bump when the layout algorithm changes, so old layouts are not reused
+LAYOUT_VERSION = 1
+
+# number of label hashes kept per cached layout to estimate how many nodes two graphs share (a bottom-k sketch), and the least estimated
+# share of nodes for a cached layout to warm-start a changed graph
+SIGNATURE_SIZE = 64
+WARM_START_SIMILARITY = 0.5
+
+# iterations of the full layout, and of a layout warm-started from a similar graph's cached positions
+ITERATIONS = 50
+WARM_ITERATIONS = 15
+
+
+def structure_key(labels, sources, targets, directed=False, iterations=ITERATIONS, seed=42):
+    """
+    Hash of a graph's node set, edge set, and layout parameters, which does not depend on the order of the nodes or edges.
+
+    Parameters:
+        - labels (list): the label of every node id
+        - sources (np.ndarray): the source node id of every edge
+        - targets (np.ndarray): the target node id of every edge
+        - directed (bool): flag for a directed graph, whose edges keep their direction (default = False)
+        - iterations (int): the number of iterations of the layout (default = ITERATIONS)
+        - seed (int): seed of the layout (default = 42)
+
+    Returns:
+        - key (str): the hex digest of the hash
+        - order (np.ndarray): the node ids sorted by label, which is the order the positions are cached in
+    """
+
+    names = np.array([str(label) for label in labels], dtype=str)
+    order = np.argsort(names, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    # every edge as one integer of its two ranks, sorted, so the edge list's order does not matter
+    sources, targets = rank[np.asarray(sources, dtype=np.int64)], rank[np.asarray(targets, dtype=np.int64)]
+    if not directed:
+        sources, targets = np.minimum(sources, targets), np.maximum(sources, targets)
+    edges = np.sort(sources * max(len(order), 1) + targets)
+
+    digest = hashlib.sha1(json.dumps({"version": LAYOUT_VERSION, "directed": directed, "iterations": iterations, "seed": seed}).encode())
+    digest.update("\n".join(names[order].tolist()).encode())
+    digest.update(edges.tobytes())
+    return digest.hexdigest(), order
+
+
+def cached_layout(labels, sources, targets, directed=False, iterations=ITERATIONS, seed=42, cache_dir=LAYOUT_CACHE_DIR, max_mb=LAYOUT_CACHE_MB):
+    """
+    Gives the Fruchterman-Reingold layout of a graph (`layout.fruchterman_reingold()`) from a persistent cache keyed by `structure_key()`.
+    A graph that was laid out before reuses its positions as they are. Otherwise, the cached layout that shares the most nodes with it (at
+    least WARM_START_SIMILARITY of them) warm-starts it: the shared nodes start where they were, the new nodes start at the center of their
+    placed neighbors, and the layout runs WARM_ITERATIONS at a low temperature instead of ITERATIONS from random positions. The new layout
+    is then cached, and the least recently used layouts are evicted while the cache is over `max_mb`.
+
+    Parameters:
+        - labels (list): the label of every node id
+        - sources (np.ndarray): the source node id of every edge
+        - targets (np.ndarray): the target node id of every edge
+        - directed (bool): flag for a directed graph (default = False)
+        - iterations (int): the number of iterations of a full layout (default = ITERATIONS)
+        - seed (int): seed of the random starting positions (default = 42)
+        - cache_dir (str): the cache directory, or None to lay out the graph without the cache (default = LAYOUT_CACHE_DIR)
+        - max_mb (float): the most megabytes the cache may take (default = LAYOUT_CACHE_MB)
+
+    Returns:
+        - positions (np.ndarray): one (x, y) row per node id
+        - status (str): "hit" if the layout was cached, "warm" if it was warm-started from a similar graph's layout, "miss" otherwise
+    """
+
+    sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+    if cache_dir is None:
+        return fruchterman_reingold(len(labels), sources, targets, iterations=iterations, seed=seed), "miss"
+
+    with phase("structure_key"):
+        key, order = structure_key(labels, sources, targets, directed, iterations, seed)
+        names = np.array([str(label) for label in labels], dtype=str)[order]
+    index = _read_index(cache_dir)
+
+    # a hit reorders the cached positions, which are sorted by label, back into node id order
+    if key in index:
+        try:
+            with np.load(os.path.join(cache_dir, f"{key}.npz")) as cached:
+                positions = np.empty((len(labels), 2))
+                positions[order] = cached["positions"]
+            index[key]["last_used"] = time.time()
+            _write_index(cache_dir, index)
+            return positions, "hit"
+        except (OSError, ValueError, KeyError):
+            del index[key]
+
+    signature = _signature(names)
+    start, status = _warm_start(index, cache_dir, signature, names, order, sources, targets)
+    with phase("fruchterman_reingold"):
+        if start is None:
+            positions = fruchterman_reingold(len(labels), sources, targets, iterations=iterations, seed=seed)
+        else:
+            positions = fruchterman_reingold(len(labels), sources, targets, start, iterations=WARM_ITERATIONS, temperature=1 / np.sqrt(max(len(labels), 1)))
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f"{key}.npz")
+        np.savez(path, positions=positions[order], labels=names)
+        index[key] = {"bytes": os.path.getsize(path), "last_used": time.time(), "nodes": len(labels), "signature": signature.tolist()}
+        _evict(index, cache_dir, max_mb)
+        _write_index(cache_dir, index)
+    except OSError as e:
+        print("Caching the layout failed, so it will be calculated again next time. Provided error:", e, "\n---")
+    return positions, status
+
+
+def graph_layout(graph, cache=True, cache_dir=LAYOUT_CACHE_DIR):
+    """
+    Gives the layout of a NetworkX graph from `cached_layout()`, as the position of every node.
+
+    Parameters:
+        - graph (NetworkX graph): the graph
+        - cache (bool): flag to read and write the layout cache (default = True)
+        - cache_dir (str): the cache directory (default = LAYOUT_CACHE_DIR)
+
+    Returns:
+        - pos (dict): (x, y) tuple of every node
+        - status (str): "hit", "warm", or "miss", the same as `cached_layout()`
+    """
+
+    nodes = list(graph.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = [(index[u], index[v]) for u, v in graph.edges()]
+    sources, targets = np.array(edges, dtype=np.int64).reshape(-1, 2).T
+    positions, status = cached_layout(nodes, sources, targets, graph.is_directed(), cache_dir=cache_dir if cache else None)
+    return {node: (x, y) for node, (x, y) in zip(nodes, positions.tolist())}, status
+
+
+def save_positions(graph, cache=True, quiet=False):
+    """
+    Writes the layout of `graph_layout()` into the `pos` attribute of every node, so it is saved with the graph by --output and reused by
+    --plot. A graph whose nodes all have positions already keeps them.
+
+    Parameters:
+        - graph (NetworkX graph): the graph, updated in place
+        - cache (bool): flag to read and write the layout cache (default = True)
+        - quiet (bool): flag to skip printing the report (default = False)
+
+    Returns:
+        - result (dict): {"nodes": the number of nodes placed, "status": "hit", "warm", or "miss" from the cache, or "kept" if the graph
+          already had positions}
+    """
+
+    if all("pos" in data for _, data in graph.nodes(data=True)):
+        return {"nodes": graph.number_of_nodes(), "status": "kept"}
+    pos, status = graph_layout(graph, cache)
+    for node, (x, y) in pos.items():
+        graph.nodes[node]["pos"] = [x, y]
+    if not quiet:
+        print(f"The layout of {len(pos)} nodes was saved into their 'pos' attributes ({'cached' if status == 'hit' else 'warm-started from a cached layout' if status == 'warm' else 'calculated'}).\n---")
+    return {"nodes": len(pos), "status": status}
+
+
+def _signature(names):
+    """
+    Helper function that sketches a node set as the SIGNATURE_SIZE smallest hashes of its labels. The share of the smallest hashes of two
+    sketches' union that are in both estimates the share of nodes the two sets have in common (their Jaccard similarity).
+
+    Parameters:
+        - names (np.ndarray): the node labels as strings
+
+    Returns:
+        - signature (np.ndarray): the smallest label hashes, sorted
+    """
+
+    # hashing every label with pandas is vectorized, and it is only imported when a layout is not cached
+    import pandas as pd
+
+    return np.sort(pd.util.hash_array(names.astype(object)))[:SIGNATURE_SIZE]
+
+
+def _warm_start(index, cache_dir, signature, names, order, sources, targets):
+    """
+    Helper function that finds the cached layout sharing the most nodes with a graph and places the graph's nodes from it.
+
+    Parameters:
+        - index (dict): the cache index
+        - cache_dir (str): the cache directory
+        - signature (np.ndarray): the graph's signature from `_signature()`
+        - names (np.ndarray): the graph's node labels as strings, sorted
+        - order (np.ndarray): the node ids in the order of `names`
+        - sources (np.ndarray): the source node id of every edge
+        - targets (np.ndarray): the target node id of every edge
+
+    Returns:
+        - start (np.ndarray): the starting positions, one (x, y) row per node id, or None if no cached layout is similar enough
+        - status (str): "warm" if the graph is warm-started, "miss" otherwise
+    """
+
+    best, best_similarity = None, WARM_START_SIMILARITY
+    for key, entry in index.items():
+        other = np.array(entry["signature"], dtype=np.uint64)
+        union = np.union1d(signature, other)[:SIGNATURE_SIZE]
+        similarity = len(np.intersect1d(np.intersect1d(signature, other), union)) / max(len(union), 1)
+        if similarity >= best_similarity:
+            best, best_similarity = key, similarity
+    if best is None:
+        return None, "miss"
+
+    try:
+        with np.load(os.path.join(cache_dir, f"{best}.npz")) as cached:
+            cached_names, cached_positions = cached["labels"], cached["positions"]
+    except (OSError, ValueError, KeyError):
+        return None, "miss"
+
+    # both label lists are sorted, so the shared nodes are found with a binary search
+    found = np.minimum(np.searchsorted(cached_names, names), max(len(cached_names) - 1, 0))
+    shared = (found < len(cached_names)) & (cached_names[found] == names) if len(cached_names) else np.zeros(len(names), dtype=bool)
+    start = np.full((len(names), 2), np.nan)
+    start[order[shared]] = cached_positions[found[shared]]
+
+    # every new node starts at the center of its placed neighbors, or at the center of the layout if it has none, with a little noise so
+    # new nodes with the same neighbors do not start on top of each other
+    placed = ~np.isnan(start[:, 0])
+    if not np.any(placed):
+        return None, "miss"
+    center = start[placed].mean(axis=0)
+    total = np.zeros((len(names), 2))
+    counts = np.zeros(len(names))
+    for node, neighbor in [(sources, targets), (targets, sources)]:
+        useful = ~placed[node] & placed[neighbor]
+        np.add.at(total, node[useful], start[neighbor[useful]])
+        np.add.at(counts, node[useful], 1)
+    new = ~placed
+    start[new] = np.where(counts[new, None] > 0, total[new] / np.maximum(counts[new], 1)[:, None], center)
+    start[new] += np.random.default_rng(0).normal(scale=0.01, size=(int(new.sum()), 2))
+    return start, "warm"
+
+
+def _read_index(cache_dir):
+    """
+    Helper function that reads the cache index, which holds the size, last use, and signature of every cached layout by key.
+
+    Parameters:
+        - cache_dir (str): the cache directory
+
+    Returns:
+        - index (dict): the cache index, empty if there is none or it cannot be read
+    """
+
+    try:
+        with open(os.path.join(cache_dir, "index.json")) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(cache_dir, index):
+    """
+    Helper function that writes the cache index, through a temporary file so an interrupted write leaves the old index.
+
+    Parameters:
+        - cache_dir (str): the cache directory
+        - index (dict): the cache index
+    """
+
+    temporary = os.path.join(cache_dir, f"index.json.{os.getpid()}")
+    with open(temporary, "w") as file:
+        json.dump(index, file)
+    os.replace(temporary, os.path.join(cache_dir, "index.json"))
+
+
+def _evict(index, cache_dir, max_mb):
+    """
+    Helper function that removes the least recently used layouts until the cache takes at most `max_mb` megabytes. The newest layout is
+    always kept.
+
+    Parameters:
+        - index (dict): the cache index, updated in place
+        - cache_dir (str): the cache directory
+        - max_mb (float): the most megabytes the cache may take
+    """
+
+    total = sum(entry["bytes"] for entry in index.values())
+    for key in sorted(index, key=lambda key: index[key]["last_used"])[:-1]:
+        if total <= max_mb * 2 ** 20:
+            break
+        total -= index[key]["bytes"]
+        del index[key]
+        try:
+            os.remove(os.path.join(cache_dir, f"{key}.npz"))
+        except OSError:
+            pass
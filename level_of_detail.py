@@ -0,0 +1,125 @@
+import numpy as np
+import networkx as nx
+
+# number of nodes plus edges above which plots and animations are drawn aggregated into groups unless a --lod is given, since drawing every
+# element of a bigger graph only makes the file bigger and the browser slower without showing more
+LOD_THRESHOLD = 100000
+
+# number of grid cells along each axis when the nodes are grouped into cells of the layout
+GRID_CELLS = 32
+
+# most super edges drawn in an aggregated view, keeping the ones with the most edges, so its size is bounded even when the edges of the
+# graph connect almost every pair of groups
+MAX_SUPER_EDGES = 5000
+
+
+def grid_groups(xy, cells=GRID_CELLS):
+    """
+    Groups the nodes into the cells of a cells x cells grid over the bounding box of their positions.
+
+    Parameters:
+        - xy (np.ndarray): the (x, y) position of every node index
+        - cells (int): the number of cells along each axis (default = GRID_CELLS)
+
+    Returns:
+        - groups (np.ndarray): the group id of every node index, which is row * cells + column of its cell
+    """
+
+    if len(xy) == 0:
+        return np.zeros(0, dtype=np.int64)
+    low = xy.min(axis=0)
+    extent = np.maximum(xy.max(axis=0) - low, 1e-9)
+    cell = np.minimum(((xy - low) / extent * cells).astype(np.int64), cells - 1)
+    return cell[:, 0] * cells + cell[:, 1]
+
+
+def community_groups(graph, nodes):
+    """
+    Groups the nodes into communities found with label propagation, which takes near linear time on big graphs.
+
+    Parameters:
+        - graph (NetworkX graph): the graph
+        - nodes (list): the nodes in node index order
+
+    Returns:
+        - groups (np.ndarray): the group id of every node index, with the communities numbered from the biggest to the smallest
+    """
+
+    index = {node: i for i, node in enumerate(nodes)}
+    groups = np.zeros(len(nodes), dtype=np.int64)
+    communities = sorted(nx.community.label_propagation_communities(nx.Graph(graph) if graph.is_directed() else graph), key=len, reverse=True)
+    for group, community in enumerate(communities):
+        groups[[index[node] for node in community]] = group
+    return groups
+
+
+def aggregate(xy, sources, targets, groups, node_values=None, edge_values=None, max_edges=MAX_SUPER_EDGES):
+    """
+    Aggregates a graph into one super node per group, placed at the center of its nodes, and one super edge per pair of groups with edges
+    between them, all with NumPy. Every value of the nodes and edges is averaged over each super node and super edge, and only the
+    `max_edges` super edges with the most edges are kept.
+
+    Parameters:
+        - xy (np.ndarray): the (x, y) position of every node index
+        - sources (np.ndarray): the source node index of every edge
+        - targets (np.ndarray): the target node index of every edge
+        - groups (np.ndarray): the group id of every node index
+        - node_values (dict): optional arrays of a value per node index to average, by name (default = None)
+        - edge_values (dict): optional arrays of a value per edge to average, by name (default = None)
+        - max_edges (int): the most super edges to keep (default = MAX_SUPER_EDGES)
+
+    Returns:
+        - aggregated (dict): {"ids": the group id of each super node, "counts": its number of nodes, "centers": its (x, y) position,
+          "internal_edges": its number of edges inside the group, "node_means": the mean of each node value per super node, "sources"/"targets":
+          the super node indexes of each super edge, "edge_counts": its number of edges, "edge_means": the mean of each edge value per super
+          edge, "hidden_edges": the number of edges between groups in the super edges that were left out}
+    """
+
+    node_values = node_values or {}
+    edge_values = edge_values or {}
+    ids, index = np.unique(groups, return_inverse=True)
+    index = index.ravel()
+    counts = np.bincount(index, minlength=len(ids))
+    centers = np.column_stack((np.bincount(index, xy[:, 0], len(ids)), np.bincount(index, xy[:, 1], len(ids)))) / np.maximum(counts, 1)[:, None]
+
+    # edges inside a group are only counted, and the rest are merged by their (lower, higher) pair of groups
+    group_sources, group_targets = index[sources], index[targets]
+    internal = group_sources == group_targets
+    keys, pairs = np.unique(np.minimum(group_sources, group_targets)[~internal] * len(ids) + np.maximum(group_sources, group_targets)[~internal],
+                            return_inverse=True)
+    pairs = pairs.ravel()
+    edge_counts = np.bincount(pairs, minlength=len(keys))
+    edge_means = {name: np.bincount(pairs, np.asarray(values, dtype=np.float64)[~internal], len(keys)) / np.maximum(edge_counts, 1)
+                  for name, values in edge_values.items()}
+
+    # keep the heaviest super edges, in their original order
+    kept = np.sort(np.argsort(-edge_counts, kind="stable")[:max_edges])
+    hidden_edges = int(edge_counts.sum() - edge_counts[kept].sum())
+
+    return {
+        "ids": ids,
+        "counts": counts,
+        "centers": centers,
+        "internal_edges": np.bincount(group_sources[internal], minlength=len(ids)),
+        "node_means": {name: np.bincount(index, np.asarray(values, dtype=np.float64), len(ids)) / np.maximum(counts, 1)
+                       for name, values in node_values.items()},
+        "sources": keys[kept] // max(len(ids), 1),
+        "targets": keys[kept] % max(len(ids), 1),
+        "edge_counts": edge_counts[kept],
+        "edge_means": {name: means[kept] for name, means in edge_means.items()},
+        "hidden_edges": hidden_edges
+    }
+
+
+def super_node_sizes(counts):
+    """
+    Marker sizes of super nodes, growing with the square root of their number of nodes so their area follows it.
+
+    Parameters:
+        - counts (np.ndarray): the number of nodes of every super node
+
+    Returns:
+        - sizes (np.ndarray): the marker size of every super node, from 8 to 40
+    """
+
+    return 8 + 32 * np.sqrt(counts / max(counts.max(initial=1), 1))
@@ -1,9 +1,11 @@
 import networkx as nx
+import numpy as np
+from cluster import adjacency_csr
 
 
-def neighborhood_overlap(graph, node1, node2, plot=False):
+def neighborhood_overlap(graph, node1, node2, plot=False, quiet=False):
     """Function that calculates the neighborhood overlap between node1 and node2, then saves that information with the nodes in the graph
-    Inputs: user graph, two nodes to perform the calculation on, boolean to check if being used for plotting
+    Inputs: user graph, two nodes to perform the calculation on, boolean to check if being used for plotting, boolean to skip printing the result
     Output: N/A - all print statements"""
 
     # check to ensure the desired nodes exist in the graph
@@ -39,9 +41,67 @@ def neighborhood_overlap(graph, node1, node2, plot=False):
         if not plot:
             graph.nodes[node1]["neighborhood_overlap"] = f"{node2}, {overlap}"
             graph.nodes[node2]["neighborhood_overlap"] = f"{node1}, {overlap}"
+        if not plot and not quiet:
             print(f"The neighborhood overlap of nodes '{node1}' and '{node2}' is: {overlap:.2f}.\n---")
         return overlap
         
     except Exception as e:
         print("Something went wrong in the calculation of neighborhood overlap. Calculation of neighborhood overlap terminated. Error message:", e, "\n---")
         return
+
+
+def neighborhood_overlaps(graph, pairs=None, plot=False, compact=None):
+    """Function that calculates the neighborhood overlap of every edge in the graph (or of every given pair of nodes) in one pass. For each
+    pair, the shared neighbors are counted by multiplying the two rows of a sparse CSR adjacency matrix, so the cost is linear in their degrees
+    Inputs: user graph, optional list or array of node pairs (default is every edge, in the order of graph.edges(), or of the edge ids if a CompactGraph is given), boolean to check if being
+    used for plotting, optional CompactGraph of the user graph to reuse its adjacency matrix and edge arrays
+    Output: NumPy array of the overlaps aligned with the pairs. Pairs where neither node has any other neighbor have an overlap of 0"""
+
+    edge_pairs = pairs is None
+
+    try:
+        adjacency, index = adjacency_csr(compact if compact is not None else graph)
+
+        if edge_pairs and compact is not None:
+            # the edge arrays already hold the row indices of every edge
+            rows_1, rows_2 = compact.sources, compact.targets
+            pairs = list(zip([compact.labels[i] for i in rows_1.tolist()], [compact.labels[i] for i in rows_2.tolist()]))
+        else:
+            if edge_pairs:
+                pairs = list(graph.edges())
+
+            # convert the pairs into row indices of the adjacency matrix
+            try:
+                rows_1 = np.array([index[node1] for node1, node2 in pairs], dtype=np.int64)
+                rows_2 = np.array([index[node2] for node1, node2 in pairs], dtype=np.int64)
+            except KeyError as e:
+                print(f"Graph does not contain node '{e.args[0]}', so neighborhood overlaps can't be calculated. Neighborhood overlap calculation terminated.\n---")
+                return
+
+        # the AND nodes are the shared neighbors. the nodes themselves are never counted since the matrix has no self-loops
+        and_nodes = np.asarray(adjacency[rows_1].multiply(adjacency[rows_2]).sum(axis=1)).ravel()
+
+        # the OR nodes are the neighbors of either node, excluding each other
+        degrees = np.diff(adjacency.indptr)
+        # indexing with no pairs gives an empty sparse array instead of a dense one
+        connected = np.asarray(adjacency[rows_1, rows_2]).ravel() if len(rows_1) > 0 else np.zeros(0)
+        or_nodes = (degrees[rows_1] - connected) + (degrees[rows_2] - connected) - and_nodes
+
+        overlaps = np.divide(and_nodes, or_nodes, out=np.zeros(len(rows_1)), where=or_nodes > 0)
+
+        # save the overlaps into the edges in the graph in bulk, and print the summary
+        if not plot:
+            if edge_pairs and graph.is_multigraph():
+                # multigraph edges are keyed by (u, v, key), and every parallel edge between two nodes has the same overlap
+                by_pair = dict(zip(pairs, overlaps.tolist()))
+                nx.set_edge_attributes(graph, {(u, v, key): by_pair[(u, v)] if (u, v) in by_pair else by_pair[(v, u)]
+                                               for u, v, key in graph.edges(keys=True)}, "neighborhood_overlap")
+            elif edge_pairs:
+                nx.set_edge_attributes(graph, dict(zip(pairs, overlaps.tolist())), "neighborhood_overlap")
+            if len(overlaps) > 0:
+                print(f"Calculated the neighborhood overlap of {len(overlaps)} node pairs. The average neighborhood overlap is: {overlaps.mean():.2f}.\n---")
+        return overlaps
+
+    except Exception as e:
+        print("Something went wrong in the calculation of neighborhood overlaps. Calculation of neighborhood overlaps terminated. Error message:", e, "\n---")
+        return
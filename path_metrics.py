@@ -0,0 +1,71 @@
+import numpy as np
+from scipy.sparse.csgraph import shortest_path
+from cluster import adjacency_csr
+
+
+def path_metrics(graph, samples=None, seed=None):
+    """Function that calculates the shortest path metrics of a graph by running BFS from every node (or from a random sample of nodes) over a
+    CSR adjacency matrix, a chunk of sources at a time. Pairs of nodes in different components are unreachable: they are left out of the
+    average shortest path and the diameter, and count as 0 towards the efficiency
+    Inputs: user graph or its CompactGraph, optional number of BFS sources to sample for an approximation (default is every node, which is exact), optional random seed
+    Output: dict with the results, formatted as {"exact": bool, "sources": number of BFS sources, "average_shortest_path": float,
+    "average_shortest_path_interval": 95% confidence interval or None if exact, "efficiency": float, "efficiency_interval": 95% confidence
+    interval or None if exact, "diameter": int (a lower bound if not exact), "eccentricities": array of each source's eccentricity within its
+    component, "unreachable_pairs": number of ordered source/target pairs with no path}"""
+
+    adjacency, _ = adjacency_csr(graph)
+    num_nodes = adjacency.shape[0]
+
+    # pick the BFS sources
+    if samples is None or int(samples) >= num_nodes:
+        sources = np.arange(num_nodes)
+        exact = True
+    else:
+        sources = np.sort(np.random.default_rng(seed).choice(num_nodes, size=int(samples), replace=False))
+        exact = False
+
+    # per-source sums, so the exact and sampled modes share one pass
+    distance_sums = np.zeros(len(sources))
+    reachable_counts = np.zeros(len(sources))
+    inverse_sums = np.zeros(len(sources))
+    eccentricities = np.zeros(len(sources), dtype=np.int64)
+
+    # keep each chunk's dense distance matrix around 64MB
+    chunk_size = max(1, 2 ** 23 // max(num_nodes, 1))
+    for start in range(0, len(sources), chunk_size):
+        chunk = sources[start:start + chunk_size]
+        distances = shortest_path(adjacency, method="D", unweighted=True, indices=chunk)
+
+        # only count reachable targets other than the source itself
+        reachable = np.isfinite(distances) & (distances > 0)
+        finite = np.where(reachable, distances, 0)
+        rows = slice(start, start + len(chunk))
+        distance_sums[rows] = finite.sum(axis=1)
+        reachable_counts[rows] = reachable.sum(axis=1)
+        inverse_sums[rows] = np.divide(1, distances, out=np.zeros_like(distances), where=reachable).sum(axis=1)
+        eccentricities[rows] = finite.max(axis=1)
+
+    results = {
+        "exact": exact,
+        "sources": len(sources),
+        "average_shortest_path": float(distance_sums.sum() / reachable_counts.sum()) if reachable_counts.sum() > 0 else 0.0,
+        "average_shortest_path_interval": None,
+        "efficiency": float(inverse_sums.sum() / (len(sources) * (num_nodes - 1))) if num_nodes > 1 and len(sources) > 0 else 0.0,
+        "efficiency_interval": None,
+        "diameter": int(eccentricities.max()) if len(sources) > 0 else 0,
+        "eccentricities": eccentricities,
+        "unreachable_pairs": int(len(sources) * (num_nodes - 1) - reachable_counts.sum())
+    }
+
+    # the average shortest path is a ratio estimator over the sampled sources, and the efficiency a plain mean, both with a finite population correction
+    if not exact and len(sources) > 1:
+        correction = (1 - len(sources) / num_nodes) / len(sources)
+        ratio = results["average_shortest_path"]
+        if reachable_counts.mean() > 0:
+            spread = np.sqrt(np.var(distance_sums - ratio * reachable_counts, ddof=1) * correction) / reachable_counts.mean()
+            results["average_shortest_path_interval"] = (float(ratio - 1.96 * spread), float(ratio + 1.96 * spread))
+        per_source = inverse_sums / (num_nodes - 1)
+        spread = np.sqrt(np.var(per_source, ddof=1) * correction)
+        results["efficiency_interval"] = (float(results["efficiency"] - 1.96 * spread), float(results["efficiency"] + 1.96 * spread))
+
+    return results
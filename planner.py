@@ -0,0 +1,339 @@
+import io
+import sys
+import time
+import tempfile
+from contextlib import contextmanager, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+import file_io as fio
+from compact_graph import CompactGraph
+from profiling import phase
+
+
+# builders of the intermediate artifacts, each importing the analysis module it needs when it is called
+def _degrees(store):
+    return store.compact.degrees()
+
+
+def _adjacency(store):
+    return store.compact.adjacency()
+
+
+def _components(store):
+    from robustness_check import component_labels
+    return component_labels(store.compact.number_of_nodes(), store.compact.sources, store.compact.targets)
+
+
+def _triangles(store):
+    import cluster
+    return cluster.triangle_counts(store.get("adjacency"))
+
+
+def _clustering(store):
+    import cluster
+    return cluster.clustering_coefficients(store.graph, plot=True, compact=store.compact, triangles=store.get("triangles"))
+
+
+def _overlaps(store):
+    import neighborhood as nh
+    return nh.neighborhood_overlaps(store.graph, list(store.graph.edges()), plot=True, compact=store.compact)
+
+
+def _betweenness(store):
+    from betweenness import betweenness
+    return betweenness(store.compact, *store.options["betweenness"], cache=True)
+
+
+# each intermediate artifact, with the artifacts it is built from and the function that builds it from an Artifacts store
+ARTIFACTS = {
+    "degrees": ([], _degrees),
+    "adjacency": ([], _adjacency),
+    "components": ([], _components),
+    "triangles": (["adjacency"], _triangles),
+    "clustering": (["triangles"], _clustering),
+    "overlaps": (["adjacency"], _overlaps),
+    "betweenness": (["adjacency"], _betweenness)
+}
+
+
+def plan(args, options):
+    """Function that reads every requested analysis from the command line arguments up front and lists the intermediate artifacts they
+    need, with each artifact after the artifacts it is built from
+    Inputs: the command line arguments, dict of the parsed analysis options ("betweenness" holds the (samples, epsilon, workers) arguments
+    of betweenness() for --simulate_failures, or None if they are not valid, and "jobs" the number of analyses run at once)
+    Output: list of artifact names in the order they can be built"""
+
+    def value(flag):
+        position = args.index(flag) + 1
+        return args[position] if position < len(args) else None
+
+    requested = []
+    if "--robustness_check" in args or "--robustness_sweep" in args or "--simulate_failures" in args:
+        requested.append("components")
+    # with more than one job, the failure simulation runs in a worker process, which calculates the betweenness itself
+    if "--simulate_failures" in args and options.get("betweenness") is not None and options.get("jobs", 1) == 1:
+        requested.append("betweenness")
+    # --clustering all saves the shared coefficients into the graph, and --plot C draws them
+    if "--clustering" in args and (value("--clustering") == "all" or ("--plot" in args and value("--plot") == "C")):
+        requested.append("clustering")
+    if "--plot" in args and value("--plot") in ("C", "N"):
+        requested.append("degrees")
+    if "--plot" in args and value("--plot") == "N" and "--neighborhood" in args:
+        requested.append("overlaps")
+
+    # depth first over the dependencies, so every artifact comes after the artifacts it is built from
+    order = []
+
+    def visit(name):
+        if name in order:
+            return
+        for dependency in ARTIFACTS[name][0]:
+            visit(dependency)
+        order.append(name)
+
+    for name in requested:
+        visit(name)
+    return order
+
+
+class Artifacts:
+    """Memoized store of the intermediate artifacts of a run (degree vector, adjacency matrix, connected components, triangle counts,
+    clustering coefficients, neighborhood overlaps, betweenness), so every analysis that needs one shares a single computation. Records how
+    long each artifact and each analysis took. The NetworkX graph is built from the graph's arrays the first time it is asked for, so runs whose
+    analyses only use the CompactGraph never build it"""
+
+    def __init__(self, arrays, compact, options=None):
+        self.arrays = arrays
+        self._graph = None
+        self.compact = compact
+        self.options = options or {}
+        self.values = {}
+        self.artifact_timings = {}
+        self.analysis_timings = {}
+
+    @property
+    def graph(self):
+        """The NetworkX graph of the run, built on first use"""
+
+        if self._graph is None:
+            with phase("networkx_graph"):
+                self._graph = fio.graph_from_arrays(self.arrays)
+        return self._graph
+
+    def get(self, name):
+        """Gives an artifact, building it (and the artifacts it is built from) the first time it is asked for. The time of each artifact
+        excludes the time of its dependencies"""
+
+        if name not in self.values:
+            for dependency in ARTIFACTS[name][0]:
+                self.get(dependency)
+            start = time.perf_counter()
+            with phase(f"artifact {name}"):
+                self.values[name] = ARTIFACTS[name][1](self)
+            self.artifact_timings[name] = time.perf_counter() - start
+        return self.values[name]
+
+    def compute(self, names):
+        """Builds the planned artifacts in order. An artifact that fails is left as None, so the analyses that need it calculate what they
+        need themselves"""
+
+        for name in names:
+            # an artifact built from a failed artifact fails too
+            if any(dependency in self.values and self.values[dependency] is None for dependency in ARTIFACTS[name][0]):
+                self.values[name] = None
+                continue
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Calculating the shared {name} failed, so the analyses that need it will calculate it themselves. Provided error:", e, "\n---")
+                self.values[name] = None
+
+    def value(self, name):
+        """Gives an artifact if it was built, or None"""
+
+        return self.values.get(name)
+
+    @contextmanager
+    def timed(self, analysis):
+        """Context manager that records the wall time of an analysis"""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.analysis_timings[analysis] = self.analysis_timings.get(analysis, 0.0) + time.perf_counter() - start
+
+    def print_timings(self):
+        """Prints the time of every artifact and analysis of the run"""
+
+        print("TIMINGS")
+        for name, seconds in self.artifact_timings.items():
+            print(f"artifact {name}: {seconds:.3f} s")
+        for name, seconds in self.analysis_timings.items():
+            print(f"analysis {name}: {seconds:.3f} s")
+        print("---")
+
+
+class SharedGraph:
+    """Placeholder for the graph of the run in the arguments of an analysis, which Runner replaces with the NetworkX graph ("graph") or the
+    CompactGraph ("compact") of the process the analysis runs in"""
+
+    def __init__(self, kind):
+        self.kind = kind
+
+
+GRAPH = SharedGraph("graph")
+COMPACT = SharedGraph("compact")
+
+# the graph of a worker process, loaded once by _init_worker()
+_worker = {}
+
+
+class Runner:
+    """Runs the analyses of a run in the order they are requested. With more than one job, the analyses marked as parallel (the ones that
+    only read the graph) are dispatched to a process pool as soon as they are requested, while the others keep running in this process. The
+    workers memory-map the graph's arrays from disk instead of receiving a pickled copy, and everything printed (by the analyses and by
+    this process in between) is buffered and printed in the order it was requested, so the output is the same as a sequential run. Used as
+    a context manager, it calls finish() on the way out"""
+
+    def __init__(self, artifacts, arrays, jobs=1, directory=None):
+        self.artifacts = artifacts
+        self.jobs = jobs
+        self.pool = None
+        self.temporary = None
+        self.entries = []
+        self.results = {}
+        self._real = sys.stdout
+        self._stdout = None
+
+        if jobs > 1:
+            # memory-map the arrays of the .gml cache if the graph was loaded from it, otherwise write them to a temporary directory first
+            if directory is None:
+                self.temporary = tempfile.TemporaryDirectory()
+                directory = self.temporary.name
+                try:
+                    fio.write_arrays(arrays, directory)
+                except Exception as e:
+                    print("Sharing the graph with worker processes failed, so the analyses will run one at a time. Provided error:", e, "\n---")
+                    self.temporary.cleanup()
+                    return
+            self.pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(directory,))
+            self._stdout = redirect_stdout(_Segments(self.entries))
+            self._stdout.__enter__()
+
+    def run(self, name, function, *args, parallel=False, **kwargs):
+        """Runs an analysis, in a worker process if it is parallel and there is more than one job. The result is stored under the analysis
+        name in `results` once it is done"""
+
+        # keep the timings and results in the order the analyses were requested
+        self.artifacts.analysis_timings.setdefault(name, 0.0)
+        self.results.setdefault(name, None)
+
+        if self.pool is None or not parallel:
+            graphs = {"compact": self.artifacts.compact}
+            if _needs_graph(args, kwargs):
+                graphs["graph"] = self.artifacts.graph
+            with self.artifacts.timed(name), phase(f"analysis {name}"):
+                self.results[name] = function(*_resolve(args, graphs), **dict(zip(kwargs, _resolve(kwargs.values(), graphs))))
+            if self.pool is not None:
+                self._flush()
+            return
+
+        self.entries.append((name, self.pool.submit(_run_job, function, args, kwargs)))
+        self.entries.append([])
+        self._flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # finish even when an analysis in this process raised, so the output buffered before it is printed and the pool is shut down
+        self.finish()
+        return False
+
+    def finish(self):
+        """Waits for every dispatched analysis, prints the rest of the buffered output, and shuts the process pool down"""
+
+        if self.pool is None:
+            return
+        self._stdout.__exit__(None, None, None)
+        try:
+            self._flush(wait=True)
+        finally:
+            self.pool.shutdown()
+            self.pool = None
+            if self.temporary is not None:
+                self.temporary.cleanup()
+
+    def _flush(self, wait=False):
+        # print the buffered output in order, up to the first analysis that is still running
+        while self.entries:
+            entry = self.entries[0]
+            if isinstance(entry, list):
+                self._real.write("".join(entry))
+                entry.clear()
+                # the last segment is still being written to
+                if len(self.entries) == 1:
+                    break
+            else:
+                name, future = entry
+                if not wait and not future.done():
+                    break
+                output, self.results[name], seconds = future.result()
+                self.artifacts.analysis_timings[name] = self.artifacts.analysis_timings.get(name, 0.0) + seconds
+                self._real.write(output)
+            self.entries.pop(0)
+        self._real.flush()
+
+
+class _Segments:
+    """Stand-in for stdout that appends everything written to the last segment of the output entries"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.entries.append([])
+
+    def write(self, text):
+        self.entries[-1].append(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def _resolve(values, graphs):
+    """Helper function that replaces the SharedGraph placeholders in a list of arguments with the graphs they stand for"""
+
+    return [graphs[value.kind] if isinstance(value, SharedGraph) else value for value in values]
+
+
+def _needs_graph(args, kwargs):
+    """Helper function that tells if the arguments of an analysis hold the NetworkX graph placeholder"""
+
+    return any(isinstance(value, SharedGraph) and value.kind == "graph" for value in list(args) + list(kwargs.values()))
+
+
+def _init_worker(directory):
+    """Helper function that memory-maps the graph's arrays once in each worker process"""
+
+    _worker["arrays"] = fio.load_arrays(directory)
+    _worker["compact"] = CompactGraph(_worker["arrays"])
+
+
+def _run_job(function, args, kwargs):
+    """Helper function that runs an analysis in a worker process with its printed output buffered. The NetworkX graph is only built if the
+    analysis needs it
+    Inputs: analysis function, its positional and keyword arguments (with SharedGraph placeholders)
+    Output: (the printed output, the analysis result, wall time in seconds)"""
+
+    if _needs_graph(args, kwargs) and "graph" not in _worker:
+        _worker["graph"] = fio.graph_from_arrays(_worker["arrays"])
+
+    buffer = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(buffer):
+        try:
+            result = function(*_resolve(args, _worker), **dict(zip(kwargs, _resolve(kwargs.values(), _worker))))
+        except Exception as e:
+            print("Something went wrong in running the analysis in a worker process. Analysis terminated. Error message:", e, "\n---")
+            result = None
+    return buffer.getvalue(), result, time.perf_counter() - start
@@ -1,171 +1,349 @@
+import numpy as np
 import networkx as nx
 import plotly.graph_objects as go
-from cluster import clustering_coefficient
-from neighborhood import neighborhood_overlap
+from cluster import clustering_coefficients
+from neighborhood import neighborhood_overlaps
+from profiling import phase
+import level_of_detail as lod_groups
+import layout_cache
 import os
 import webbrowser
 
-def plot(mode, graph, clustering_coeff=None, n_overlap=None):
+# number of nodes plus edges above which the figure is drawn with WebGL (Scattergl), which stays responsive with far more points than SVG
+WEBGL_THRESHOLD = 5000
+
+# number of overlap ranges the edges are grouped by in mode `N`, each drawn as one trace with the width and color of its middle overlap
+OVERLAP_BINS = 10
+
+
+def plot(mode, graph, clustering_coeff=None, n_overlap=None, overlaps=None, lod=None, detail=None, cache=True, degrees=None):
     """
     Plots and visualizes the given graph in one of three modes: `C` (clustering coefficient), `N` (neighborhood overlap),
-    or `P` (graph attributes).
-    
+    or `P` (graph attributes). Graphs with more than LOD_THRESHOLD nodes plus edges are drawn aggregated into grid cells, unless a level of
+    detail is given.
+
     Parameters:
         - mode (str): the letter that specifies the plotting mode
         - graph (NetworkX graph): the graph to be visualized
-        - clustering_coeff (int): the clustering coefficient for a specified node
+        - clustering_coeff (float | dict): the clustering coefficient for a specified node, or the results of `clustering_coefficients()`
         - n_overlap (int): the neighborhood overlap between two specified nodes
+        - overlaps (np.ndarray): the neighborhood overlap of every edge aligned with `graph.edges()`, if it was already calculated
+        - lod (tuple): the level of detail, ("grid", number of cells per axis or None for GRID_CELLS) or ("communities", None) to aggregate
+          the nodes into groups, or ("full", None) to draw every node and edge (default = None, which aggregates into grid cells above LOD_THRESHOLD)
+        - detail (int): the id of one group to draw in full detail, in the same positions as the aggregated view (default = None)
+        - cache (bool): flag to read and write the layout cache of `layout_cache.py` for graphs without `pos` attributes (default = True)
+        - degrees (np.ndarray): the degree of every node aligned with `graph.nodes()`, if it was already calculated (default = None)
 
     Outputs:
         - html file: visualized graph in HTML format
     """
-    
+
+    if lod is None:
+        lod = ("grid", lod_groups.GRID_CELLS) if graph.number_of_nodes() + graph.number_of_edges() > lod_groups.LOD_THRESHOLD else ("full", None)
+    fig = figure(mode, graph, clustering_coeff, n_overlap, overlaps, lod=None if lod[0] == "full" else lod, detail=detail, cache=cache, degrees=degrees)
+    if fig is None:
+        return
+
+    with phase("write_html"):
+        file_path = os.path.abspath("graph.html")
+        fig.write_html(file_path, auto_open=False)
+        webbrowser.open("file://" + file_path)
+
+
+def figure(mode, graph, clustering_coeff=None, n_overlap=None, overlaps=None, pos=None, lod=None, detail=None, cache=True, degrees=None):
+    """
+    Builds the figure of `plot()`. The edges are drawn as a few batched traces (one per edge width and color, with the edges separated by
+    gaps) instead of one trace per edge, with their coordinates built as NumPy arrays, and graphs with more than WEBGL_THRESHOLD nodes plus
+    edges are drawn with WebGL. With a level of detail, the nodes are grouped and either the groups are drawn as super nodes and super edges,
+    or only the nodes of the `detail` group are drawn in full.
+
+    Parameters:
+        - the same as `plot()`, except that a `lod` of None draws every node and edge
+        - pos (dict): the position of every node (default = None, which uses the graph's `pos` attributes or the cached layout from
+          `layout_cache.graph_layout()`)
+
+    Returns:
+        - fig (plotly Figure): the figure of the graph, or None if the `detail` group does not exist
+    """
+
     G = graph
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    Scatter = go.Scattergl if G.number_of_nodes() + G.number_of_edges() > WEBGL_THRESHOLD else go.Scatter
 
     # Get node positions
-    pos = nx.get_node_attributes(G, 'pos')
+    pos = pos or nx.get_node_attributes(G, 'pos')
 
-    if not pos:
-        pos = nx.spring_layout(G, seed=42)
+    # graphs without positions reuse their layout from earlier runs, or warm-start it from a similar graph's
+    with phase("layout"):
+        if not pos:
+            pos, _ = layout_cache.graph_layout(G, cache)
 
-    node_x = [pos[n][0] for n in G.nodes()]
-    node_y = [pos[n][1] for n in G.nodes()]
+    xy = np.array([pos[n] for n in nodes], dtype=np.float64).reshape(-1, 2)
+    edges = list(G.edges())
+    sources = np.fromiter((index[u] for u, _ in edges), dtype=np.int64, count=len(edges))
+    targets = np.fromiter((index[v] for _, v in edges), dtype=np.int64, count=len(edges))
 
-    # Set default visual settings
-    node_size = [10] * G.number_of_nodes()
-    node_color = ["blue"] * G.number_of_nodes()
-    node_text = []
+    if lod is not None:
+        with phase("groups"):
+            groups = lod_groups.community_groups(G, nodes) if lod[0] == "communities" else lod_groups.grid_groups(xy, lod[1] or lod_groups.GRID_CELLS)
+        if detail is None:
+            with phase("aggregate"):
+                return _aggregated_figure(mode, G, nodes, xy, sources, targets, groups, clustering_coeff, n_overlap, overlaps)
 
-    edge_traces = []
+        # draw the group's nodes and the edges between them in full, where they are in the aggregated view. the clustering coefficients
+        # and overlaps are the ones of the whole graph
+        if not np.any(groups == detail):
+            print(f"Plotting was terminated because there is no group {detail} to show in detail.\n---")
+            return None
+        inside = groups == detail
+        if mode == "C" and clustering_coeff is not None and not isinstance(clustering_coeff, dict):
+            clustering_coeff = clustering_coefficients(G, plot=True)
+        if mode == "N" and n_overlap is not None:
+            overlaps = (neighborhood_overlaps(G, plot=True) if overlaps is None else np.asarray(overlaps))[inside[sources] & inside[targets]]
+        return figure(mode, G.subgraph([node for node, keep in zip(nodes, inside.tolist()) if keep]), clustering_coeff, n_overlap, overlaps, pos)
 
-    if mode == "C":
-    # Visualize clustering coefficient (node size = cc, color = degree)
-        if clustering_coeff is None:
-            raise ValueError("Clustering coefficient data required for mode 'C'.")
+    with phase("traces"):
+        # Set default visual settings
+        node_size = 10
+        node_color = "blue"
+        node_text = []
 
-        degree = dict(G.degree())
-
-        cc_values = {}
-        for n in G.nodes():
-            cc = clustering_coefficient(G, n, True) or 0.0
-            cc_values[n] = cc
-            node_size.append(cc * 40 + 10)
-
-        node_color = [
-            degree[n]
-            for n in G.nodes()
-        ]
-
-        node_text = [
-            f"Node: {n}<br>Degree: {degree[n]}<br>CC: {cc_values[n]:.3f}"
-            for n in G.nodes()
-        ]
-
-        # Uniform edges
-        edge_x, edge_y = [], []
-        for u, v in G.edges():
-            edge_x += [pos[u][0], pos[v][0], None]
-            edge_y += [pos[u][1], pos[v][1], None]
-
-        edge_traces.append(
-            go.Scatter(
-                x=edge_x,
-                y=edge_y,
-                mode="lines",
-                line=dict(width=1, color="gray"),
-                hoverinfo="none"
-            )
-        )
+        edge_traces = []
 
-    elif mode == "N":
-    # Visualize neighborhood overlap (edge thickness = NO, color = sum of degrees at end points)
-        if n_overlap is None:
-            raise ValueError("Neighborhood overlap data required for mode 'N'.")
+        if mode == "C":
+        # Visualize clustering coefficient (node size = cc, color = degree)
+            if clustering_coeff is None:
+                raise ValueError("Clustering coefficient data required for mode 'C'.")
 
-        degree = dict(G.degree())
+            degree = dict(zip(nodes, degrees.tolist())) if degrees is not None else dict(G.degree())
 
-        for u, v in G.edges():
-            overlap = neighborhood_overlap(G, u, v, True) or 0.0
-            width = overlap * 10 + 1
-            degree_sum = degree[u] + degree[v]
+            # reuse the coefficients if --clustering all already calculated them, otherwise calculate them all in one pass
+            if isinstance(clustering_coeff, dict):
+                cc_values = clustering_coeff["coefficients"]
+            else:
+                cc_values = clustering_coefficients(G, plot=True)["coefficients"]
 
-            # Add each edge one by one
+            node_size = np.array([cc_values[n] for n in nodes], dtype=np.float64) * 40 + 10
+
+            node_color = np.array([degree[n] for n in nodes])
+
+            node_text = [
+                f"Node: {n}<br>Degree: {degree[n]}<br>CC: {cc_values[n]:.3f}"
+                for n in nodes
+            ]
+
+            # Uniform edges
+            edge_x, edge_y = _edge_coordinates(xy, sources, targets)
             edge_traces.append(
-                go.Scatter(
-                    x=[pos[u][0], pos[v][0]],
-                    y=[pos[u][1], pos[v][1]],
+                Scatter(
+                    x=edge_x,
+                    y=edge_y,
                     mode="lines",
-                    line=dict(width=width, color=f"rgba(0,0,255,{overlap})"),
-                    hoverinfo="text",
-                    text=f"Overlap: {overlap:.3f}<br>Degree Sum: {degree_sum}"
+                    line=dict(width=1, color="gray"),
+                    hoverinfo="none"
                 )
             )
 
-        node_text = [
-            f"Node: {n}<br>Degree: {degree[n]}"
-            for n in G.nodes()
-        ]
+        elif mode == "N":
+        # Visualize neighborhood overlap (edge thickness = NO, color = sum of degrees at end points)
+            if n_overlap is None:
+                raise ValueError("Neighborhood overlap data required for mode 'N'.")
 
-    elif mode == "P":
-    # Plot the attributes (node color, edge signs)
-        for u, v in G.edges():
-            sign = G.edges[u, v].get("sign", "unknown")
-
-            if sign == "+":
-                color = "green"
-            elif sign == "-":
-                color = "red"
-            else:
-                color = "gray"
+            degree = dict(zip(nodes, degrees.tolist())) if degrees is not None else dict(G.degree())
 
-            # Add each edge one by one
-            edge_traces.append(
-                go.Scatter(
-                    x=[pos[u][0], pos[v][0]],
-                    y=[pos[u][1], pos[v][1]],
-                    mode="lines",
-                    line=dict(width=2, color=color),
-                    hoverinfo="text",
-                    text=f"Sign: {sign}"
+            # calculate the overlap of every edge in one pass, aligned with G.edges(), unless it was already calculated
+            if overlaps is None:
+                overlaps = neighborhood_overlaps(G, plot=True)
+            overlaps = np.asarray(overlaps, dtype=np.float64)
+
+            # one trace per overlap range, drawn with the width and color of the middle of the range
+            bins = np.minimum((overlaps * OVERLAP_BINS).astype(np.int64), OVERLAP_BINS - 1)
+            for b in np.unique(bins).tolist():
+                middle = (b + 0.5) / OVERLAP_BINS
+                edge_x, edge_y = _edge_coordinates(xy, sources[bins == b], targets[bins == b])
+                edge_traces.append(
+                    Scatter(
+                        x=edge_x,
+                        y=edge_y,
+                        mode="lines",
+                        line=dict(width=middle * 10 + 1, color=f"rgba(0,0,255,{middle:.2f})"),
+                        hoverinfo="none"
+                    )
+                )
+
+            # hovering over the middle of an edge shows its exact overlap. a trace of lines can only show one text per trace, so the middles
+            # are invisible markers. above the WebGL threshold they are left out, since their text makes the file much bigger
+            if Scatter is go.Scatter and len(edges) > 0:
+                degree_sum = np.array([degree[u] + degree[v] for u, v in edges])
+                middles = (xy[sources] + xy[targets]) / 2
+                edge_traces.append(
+                    Scatter(
+                        x=middles[:, 0],
+                        y=middles[:, 1],
+                        mode="markers",
+                        marker=dict(size=6, opacity=0),
+                        hoverinfo="text",
+                        text=[f"Overlap: {overlap:.3f}<br>Degree Sum: {total}" for overlap, total in zip(overlaps.tolist(), degree_sum.tolist())]
+                    )
+                )
+
+            node_text = [
+                f"Node: {n}<br>Degree: {degree[n]}"
+                for n in nodes
+            ]
+
+        elif mode == "P":
+        # Plot the attributes (node color, edge signs), with one trace per sign
+            signs = np.array([sign if sign in ("+", "-") else "unknown" for sign in (data.get("sign", "unknown") for _, _, data in G.edges(data=True))])
+            for sign, color in [("+", "green"), ("-", "red"), ("unknown", "gray")]:
+                if not np.any(signs == sign):
+                    continue
+                edge_x, edge_y = _edge_coordinates(xy, sources[signs == sign], targets[signs == sign])
+                edge_traces.append(
+                    Scatter(
+                        x=edge_x,
+                        y=edge_y,
+                        mode="lines",
+                        line=dict(width=2, color=color),
+                        hoverinfo="text",
+                        text=f"Sign: {sign}"
+                    )
                 )
+
+            node_color = [
+                G.nodes[n].get("color", "blue")
+                for n in nodes
+            ]
+
+            node_color = ["red" if color == "r" else "green" if color == "g" else color for color in node_color]
+
+            node_text = [
+                f"Node: {n}<br>Color: {G.nodes[n].get('color', 'blue')}"
+                for n in nodes
+            ]
+
+        else:
+            raise ValueError("Mode must be one of: C, N, P")
+
+        # Plot nodes
+        node_trace = Scatter(
+            x=xy[:, 0],
+            y=xy[:, 1],
+            mode="markers",
+            hoverinfo="text",
+            text=node_text,
+            marker=dict(
+                size=node_size,
+                color=node_color,
+                colorscale="YlGnBu" if mode == "C" else None,
+                showscale=(mode == "C"),
+                line_width=2
             )
+        )
+
+        # Generate graph
+        fig = go.Figure(
+            data=edge_traces + [node_trace],
+            layout=go.Layout(
+                title="Network Graph",
+                showlegend=False,
+                hovermode="closest",
+                xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+            )
+        )
+    return fig
 
-        node_color = [
-            G.nodes[n].get("color", "blue")
-            for n in G.nodes()
-        ]
 
-        node_color = ["red" if color == "r" else "green" if color == "g" else color for color in node_color]
+def _aggregated_figure(mode, G, nodes, xy, sources, targets, groups, clustering_coeff, n_overlap, overlaps):
+    """
+    Helper function that builds the figure of `plot()` with each group of nodes drawn as one super node at the center of its nodes, sized
+    by its number of nodes, and the edges between each pair of groups as one super edge, with a width growing with their number of edges.
+    The colors summarize the mode: the mean clustering coefficient of each group in mode `C`, the mean overlap of each super edge in mode `N`,
+    and the share of red nodes of each group and of negative edges of each super edge in mode `P`. The figure stays the same size however
+    big the graph is, and hovering over a super node shows the group id to draw in detail.
 
-        node_text = [
-            f"Node: {n}<br>Color: {G.nodes[n].get('color', 'blue')}"
-            for n in G.nodes()
-        ]
+    Parameters:
+        - mode (str): the letter that specifies the plotting mode
+        - G (NetworkX graph): the graph to be visualized
+        - nodes (list): the nodes in node index order
+        - xy (np.ndarray): the (x, y) position of every node index
+        - sources (np.ndarray): the source node index of every edge, aligned with `G.edges()`
+        - targets (np.ndarray): the target node index of every edge, aligned with `G.edges()`
+        - groups (np.ndarray): the group id of every node index
+        - clustering_coeff, n_overlap, overlaps: the same as `plot()`
+
+    Returns:
+        - fig (plotly Figure): the aggregated figure
+    """
 
+    node_values, edge_values = {}, {}
+    if mode == "C":
+        if clustering_coeff is None:
+            raise ValueError("Clustering coefficient data required for mode 'C'.")
+        cc_values = clustering_coeff["coefficients"] if isinstance(clustering_coeff, dict) else clustering_coefficients(G, plot=True)["coefficients"]
+        node_values["cc"] = [cc_values[n] for n in nodes]
+    elif mode == "N":
+        if n_overlap is None:
+            raise ValueError("Neighborhood overlap data required for mode 'N'.")
+        edge_values["overlap"] = neighborhood_overlaps(G, plot=True) if overlaps is None else overlaps
+    elif mode == "P":
+        node_values["red"] = [G.nodes[n].get("color") in ("r", "red") for n in nodes]
+        edge_values["negative"] = [data.get("sign") == "-" for _, _, data in G.edges(data=True)]
     else:
         raise ValueError("Mode must be one of: C, N, P")
 
-    # Plot nodes
+    aggregated = lod_groups.aggregate(xy, sources, targets, groups, node_values, edge_values)
+    centers, counts, edge_counts = aggregated["centers"], aggregated["counts"], aggregated["edge_counts"]
+
+    # one trace per range of edge counts (on a log scale), and in modes N and P per range of the super edges' mean value
+    widths = np.minimum(np.log2(np.maximum(edge_counts, 1)).astype(np.int64), 9)
+    shades = np.zeros(len(edge_counts), dtype=np.int64)
+    if mode == "N":
+        shades = np.minimum((aggregated["edge_means"]["overlap"] * OVERLAP_BINS).astype(np.int64), OVERLAP_BINS - 1)
+    elif mode == "P":
+        shades = np.minimum((aggregated["edge_means"]["negative"] * OVERLAP_BINS).astype(np.int64), OVERLAP_BINS - 1)
+
+    edge_traces = []
+    for width, shade in sorted(set(zip(widths.tolist(), shades.tolist()))):
+        batch = (widths == width) & (shades == shade)
+        middle = (shade + 0.5) / OVERLAP_BINS
+        color = {"C": "gray", "N": f"rgba(0,0,255,{middle:.2f})", "P": f"rgb({255 * middle:.0f},{255 * (1 - middle):.0f},0)"}[mode]
+        edge_x, edge_y = _edge_coordinates(centers, aggregated["sources"][batch], aggregated["targets"][batch])
+        edge_traces.append(go.Scatter(x=edge_x, y=edge_y, mode="lines", line=dict(width=width + 1, color=color), hoverinfo="none"))
+
+    node_text = [f"Group: {group}<br>Nodes: {count}<br>Edges inside: {internal}" for group, count, internal in
+                 zip(aggregated["ids"].tolist(), counts.tolist(), aggregated["internal_edges"].tolist())]
+    node_color = "blue"
+    if mode == "C":
+        node_color = aggregated["node_means"]["cc"]
+        node_text = [f"{text}<br>Mean CC: {cc:.3f}" for text, cc in zip(node_text, node_color.tolist())]
+    elif mode == "P":
+        node_color = aggregated["node_means"]["red"]
+        node_text = [f"{text}<br>Red nodes: {red:.0%}" for text, red in zip(node_text, node_color.tolist())]
+
     node_trace = go.Scatter(
-        x=node_x,
-        y=node_y,
+        x=centers[:, 0],
+        y=centers[:, 1],
         mode="markers",
         hoverinfo="text",
         text=node_text,
         marker=dict(
-            size=node_size,
+            size=lod_groups.super_node_sizes(counts),
             color=node_color,
-            colorscale="YlGnBu" if mode == "C" else None,
-            showscale=(mode == "C"),
+            colorscale="YlGnBu" if mode == "C" else "RdYlGn_r" if mode == "P" else None,
+            cmin=0 if mode in ("C", "P") else None,
+            cmax=1 if mode in ("C", "P") else None,
+            showscale=mode in ("C", "P"),
             line_width=2
         )
     )
 
-    # Generate graph
-    fig = go.Figure(
+    return go.Figure(
         data=edge_traces + [node_trace],
         layout=go.Layout(
-            title="Network Graph",
+            title=f"Network Graph ({len(counts)} groups of {len(nodes)} nodes" + (f", {aggregated['hidden_edges']} edges in the lightest super edges not drawn)" if aggregated["hidden_edges"] else ")"),
             showlegend=False,
             hovermode="closest",
             xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
@@ -173,6 +351,24 @@ def plot(mode, graph, clustering_coeff=None, n_overlap=None):
         )
     )
 
-    file_path = os.path.abspath("graph.html")
-    fig.write_html("file_path", auto_open=False)
-    webbrowser.open("file://" + file_path)
\ No newline at end of file
+
+def _edge_coordinates(xy, sources, targets):
+    """
+    Helper function that lays out the coordinates of a batch of edges for one line trace: the two end points of every edge followed by a
+    gap (NaN), which Plotly draws as separate lines.
+
+    Parameters:
+        - xy (np.ndarray): the (x, y) position of every node index
+        - sources (np.ndarray): the source node index of every edge
+        - targets (np.ndarray): the target node index of every edge
+
+    Returns:
+        - edge_x (np.ndarray): the x coordinates of the trace
+        - edge_y (np.ndarray): the y coordinates of the trace
+    """
+
+    coordinates = np.full((len(sources), 3, 2), np.nan)
+    coordinates[:, 0] = xy[sources]
+    coordinates[:, 1] = xy[targets]
+    coordinates = coordinates.reshape(-1, 2)
+    return coordinates[:, 0], coordinates[:, 1]
@@ -0,0 +1,122 @@
+import os
+import time
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+# the profiler of the run while --profile is recording, set by Profiler.start(). phase() does nothing while it is None
+_active = None
+
+
+@contextmanager
+def phase(name):
+    """Context manager that records one phase of a run (like building the supernodes in the balance check, or the layout of a plot) under the
+    stage it runs in, when the run is profiled with --profile. Does nothing otherwise, so the analyses can mark their phases at no cost"""
+
+    if _active is None:
+        yield
+        return
+    with _active.stage(name):
+        yield
+
+
+def stop():
+    """Stops the profiler that is recording, if there is one. A run that raises after --profile started its profiler leaves it recording,
+    so a process that runs more than one file (like a batch worker) stops it before the next one"""
+
+    if _active is not None:
+        _active.stop()
+
+
+class Profiler:
+    """Records the wall time, CPU time, and peak memory (with tracemalloc) of every stage of a run: parsing, each shared artifact, each
+    analysis, and the phases the analyses mark with phase() inside them, which are named after the stage they run in (like
+    "analysis verify_balanced_graph/supernodes"). A stage that runs more than once adds up its times and keeps its highest peak. The CPU time
+    is this process' only, so analyses that spread work across --workers processes show more wall time than CPU time. Optionally dumps a
+    cProfile of every top level stage into a directory, to be read with pstats or snakeviz"""
+
+    def __init__(self, cprofile_dir=None):
+        self.cprofile_dir = cprofile_dir
+        self.stages = {}
+        self.total = None
+        self._stack = []
+        self._start = None
+        # the peak memory of the run outside of every stage
+        self._root = {"peak": 0}
+
+    def start(self):
+        """Starts tracing memory allocations and makes phase() record into this profiler"""
+
+        global _active
+        if self.cprofile_dir is not None:
+            os.makedirs(self.cprofile_dir, exist_ok=True)
+        tracemalloc.start()
+        self._start = (time.perf_counter(), time.process_time())
+        _active = self
+
+    def stop(self):
+        """Stops recording and memory tracing, and records the totals of the run"""
+
+        global _active
+        _active = None
+        self.total = {
+            "wall_seconds": time.perf_counter() - self._start[0],
+            "cpu_seconds": time.process_time() - self._start[1],
+            "peak_memory_mb": max(self._root["peak"], tracemalloc.get_traced_memory()[1]) / 2 ** 20
+        }
+        tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager that records one stage, nested in the stage it is entered from"""
+
+        parent = self._stack[-1] if self._stack else self._root
+        path = f"{parent['path']}/{name}" if self._stack else name
+        record = self.stages.setdefault(path, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_memory_mb": 0.0})
+
+        # tracemalloc keeps a single peak, so hand the peak so far to the enclosing stage before resetting it for this one
+        current, peak = tracemalloc.get_traced_memory()
+        parent["peak"] = max(parent["peak"], peak)
+        tracemalloc.reset_peak()
+        frame = {"path": path, "memory": current, "peak": current}
+        self._stack.append(frame)
+
+        # cProfile can only record one profile at a time, so only the top level stages get one
+        profile = cProfile.Profile() if self.cprofile_dir is not None and len(self._stack) == 1 else None
+        if profile is not None:
+            profile.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if profile is not None:
+                profile.disable()
+            self._stack.pop()
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            parent["peak"] = max(parent["peak"], peak)
+
+            record["calls"] += 1
+            record["wall_seconds"] += wall
+            record["cpu_seconds"] += cpu
+            record["peak_memory_mb"] = max(record["peak_memory_mb"], (peak - frame["memory"]) / 2 ** 20)
+            if profile is not None:
+                suffix = f"_{record['calls']}" if record["calls"] > 1 else ""
+                profile.dump_stats(os.path.join(self.cprofile_dir, f"{path.replace(' ', '_')}{suffix}.prof"))
+
+    def report(self):
+        """Gives the profile of the run as a dict, formatted as {"total": {"wall_seconds", "cpu_seconds", "peak_memory_mb"},
+        "stages": {stage path: {"calls", "wall_seconds", "cpu_seconds", "peak_memory_mb"}}}, with the stages in the order they first ran"""
+
+        return {"total": self.total, "stages": self.stages}
+
+    def print_report(self):
+        """Prints the wall time, CPU time, and peak memory of every stage, with the phases indented under their stage"""
+
+        print("PROFILE: stage, wall s, cpu s, peak MB")
+        for path, record in self.stages.items():
+            indent = "  " * path.count("/")
+            print(f"{indent}{path.rsplit('/', 1)[-1]}: {record['wall_seconds']:.3f}, {record['cpu_seconds']:.3f}, {record['peak_memory_mb']:.1f}")
+        if self.total is not None:
+            print(f"total: {self.total['wall_seconds']:.3f}, {self.total['cpu_seconds']:.3f}, {self.total['peak_memory_mb']:.1f}")
+        print("---")
@@ -1,94 +1,360 @@
-import networkx as nx
-import random
+import numpy as np
+from scipy.sparse import coo_array
+from scipy.sparse.csgraph import connected_components
+from concurrent.futures import ProcessPoolExecutor
+from compact_graph import CompactGraph
+from profiling import phase
 
-def robustness_check(graph, k, simulations=100):
+
+def edge_index(graph):
     """
-    Performs multiple simulations of `k` random edge failures and reports: average number of connected components,
-    max/min component sizes, and whether original clusters persist.
+    Converts the graph once into integer edge arrays that every simulation can reuse without copying the graph. A CompactGraph already
+    holds them, so nothing is converted.
 
     Parameters:
-        - graph (NetworkX graph): the graph on which to perform the robustness check
-        - k (int): number of edge failures
-        - simulations (int): the number of simulations to be run (default = 100)
-    
+        - graph (NetworkX graph | CompactGraph): the graph to be converted
+
+    Returns:
+        - nodes (list): the nodes of the graph, where a node's position is its integer id
+        - sources (np.ndarray): integer id of the first end node of each edge
+        - targets (np.ndarray): integer id of the second end node of each edge, aligned with `sources`
+    """
+
+    if isinstance(graph, CompactGraph):
+        return graph.labels, graph.sources, graph.targets
+
+    nodes = list(graph.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+
+    sources = np.fromiter((index[u] for u, v in graph.edges()), dtype=np.int64, count=graph.number_of_edges())
+    targets = np.fromiter((index[v] for u, v in graph.edges()), dtype=np.int64, count=graph.number_of_edges())
+    return nodes, sources, targets
+
+
+def component_labels(num_nodes, sources, targets):
+    """
+    Labels every node with the id of its connected component.
+
+    Parameters:
+        - num_nodes (int): the number of nodes in the graph
+        - sources (np.ndarray): integer id of the first end node of each edge
+        - targets (np.ndarray): integer id of the second end node of each edge
+
     Returns:
-        - results (dict): the final results of the check
+        - num_components (int): the number of connected components
+        - labels (np.ndarray): the component id of each node
     """
 
-    G_original = graph
+    adjacency = coo_array((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(num_nodes, num_nodes))
+    return connected_components(adjacency, directed=False)
 
-    # Store original clusters
-    original_components = list(nx.connected_components(G_original))
 
-    component_counts = []
-    max_sizes = []
-    min_sizes = []
-    cluster_persistence_results = []
+def robustness_check(graph, k, simulations=100, workers=1, seed=None, components=None, quiet=False):
+    """
+    Performs multiple simulations of `k` random edge failures and reports: average number of connected components,
+    max/min component sizes, and whether original clusters persist.
 
-    edges = list(G_original.edges())
+    Parameters:
+        - graph (NetworkX graph | CompactGraph): the graph on which to perform the robustness check
+        - k (int): number of edge failures
+        - simulations (int): the number of simulations to be run (default = 100)
+        - workers (int): the number of processes the simulations are distributed across (default = 1)
+        - seed (int): seed for the random edge failures, where simulation `i` always uses the same failures for the same seed (default = None)
+        - components (tuple): the `component_labels()` result of the graph, if it was already calculated (default = None)
+        - quiet (bool): flag that skips printing the results (default = False)
 
-    # ensure k is an integer
+    Returns:
+        - results (dict): the final results of the check, including the per-simulation distributions under "trials"
+    """
+
+    # ensure k, simulations, and workers are integers
     try:
         k = int(k)
     except:
         print(f"{k} is not able to be converted into an integer, so removal of k edges is not possible. Simulating failures terminated.\n---")
         return
 
-    for _ in range(simulations):
-
-        # Copy graph so original remains unchanged
-        G = G_original.copy()
-
-        # Remove k random edges
-        removed_edges = random.sample(edges, min(k, len(edges)))
-        G.remove_edges_from(removed_edges)
+    try:
+        simulations = int(simulations)
+        workers = int(workers)
+    except:
+        print(f"{simulations} simulations and/or {workers} workers are not able to be converted into integers. Robustness check terminated.\n---")
+        return
 
-        # Compute new components
-        new_components = list(nx.connected_components(G))
+    if simulations < 1 or workers < 1:
+        print("The number of simulations and workers must be at least 1. Robustness check terminated.\n---")
+        return
 
-        component_counts.append(len(new_components))
+    # convert the graph once and store the original clusters as a component label per node
+    nodes, sources, targets = edge_index(graph)
+    _, original_labels = components if components is not None else component_labels(len(nodes), sources, targets)
 
-        sizes = [len(c) for c in new_components]
-        max_sizes.append(max(sizes))
-        min_sizes.append(min(sizes))
+    # give every simulation its own independent random stream, so the results don't depend on the number of workers
+    trial_seeds = np.random.SeedSequence(seed).spawn(simulations)
+    shared = (len(nodes), sources, targets, original_labels, k)
 
-        # Check cluster persistence
-        persists = clusters_persist(original_components, new_components)
-        cluster_persistence_results.append(persists)
+    with phase("simulations"):
+        if workers == 1:
+            trials = _run_trials(shared, trial_seeds)
+        else:
+            # split the simulations into one contiguous batch per worker
+            batches = [[trial_seeds[i] for i in batch] for batch in np.array_split(np.arange(simulations), workers) if len(batch) > 0]
+            with ProcessPoolExecutor(max_workers=len(batches)) as pool:
+                trials = _merge_trials(pool.map(_run_trials, [shared] * len(batches), batches))
 
     # Final statistics
     results = {
-        "average_num_components": sum(component_counts) / simulations,
-        "max_component_size": max(max_sizes),
-        "min_component_size": min(min_sizes),
-        "cluster_persistence_rate": sum(cluster_persistence_results) / simulations
+        "average_num_components": sum(trials["num_components"]) / simulations,
+        "max_component_size": max(trials["max_component_size"]),
+        "min_component_size": min(trials["min_component_size"]),
+        "cluster_persistence_rate": sum(trials["clusters_persist"]) / simulations
     }
 
-    print("ROBUSTNESS_CHECK")
-    for result in results:
-        print(f"{result}: {results[result]}")
-    print('---')
+    if not quiet:
+        print("ROBUSTNESS_CHECK")
+        for result in results:
+            print(f"{result}: {results[result]}")
+        print('---')
+
+    results["trials"] = trials
     return results
 
 
-def clusters_persist(original_components, new_components):
+def _run_trials(shared, trial_seeds):
+    """
+    Helper function that runs a batch of simulations, either in this process or in a worker process.
+
+    Parameters:
+        - shared (tuple): the number of nodes, edge arrays, original component labels, and k
+        - trial_seeds (list[SeedSequence]): one seed per simulation in the batch
+
+    Returns:
+        - trials (dict): the per-simulation results of the batch
+    """
+
+    num_nodes, sources, targets, original_labels, k = shared
+    k = min(k, len(sources))
+
+    trials = {"num_components": [], "max_component_size": [], "min_component_size": [], "clusters_persist": []}
+
+    for trial_seed in trial_seeds:
+        # Remove k random edges by masking them out instead of copying the graph
+        rng = np.random.default_rng(trial_seed)
+        surviving = np.ones(len(sources), dtype=bool)
+        surviving[rng.choice(len(sources), size=k, replace=False)] = False
+
+        # Compute new components
+        num_components, labels = component_labels(num_nodes, sources[surviving], targets[surviving])
+        sizes = np.bincount(labels)
+
+        trials["num_components"].append(int(num_components))
+        # a graph without nodes has no components, so both sizes are 0
+        trials["max_component_size"].append(int(sizes.max(initial=0)))
+        trials["min_component_size"].append(int(sizes.min(initial=num_nodes)))
+
+        # Check cluster persistence
+        trials["clusters_persist"].append(clusters_persist(original_labels, labels))
+
+    return trials
+
+
+def _merge_trials(batches):
+    """
+    Helper function that concatenates the per-simulation results of each batch, in order.
+
+    Parameters:
+        - batches (iterable[dict]): the results of each batch
+
+    Returns:
+        - trials (dict): the per-simulation results of all batches
+    """
+
+    trials = {"num_components": [], "max_component_size": [], "min_component_size": [], "clusters_persist": []}
+    for batch in batches:
+        for key in trials:
+            trials[key] += batch[key]
+    return trials
+
+
+def clusters_persist(original_labels, new_labels):
     """
     Helper function for checking if original clusters persist.
 
     Parameters:
-        - original_components (list[set]): the original components of the graph
-        - new_components (list[set]): the new components of the graph after a simulation has been run
+        - original_labels (np.ndarray): the component id of each node in the original graph
+        - new_labels (np.ndarray): the component id of each node after a simulation has been run
 
     Returns:
         - bool: `True` if the original components persist, `False` otherwise
     """
-    
-    for original in original_components:
-        found = False
-        for new in new_components:
-            if original.issubset(new):
-                found = True
-                break
-        if not found:
-            return False
-    return True
\ No newline at end of file
+
+    # an original cluster persists when all of its nodes share one new component id, i.e. its smallest and largest new ids match
+    num_original = int(original_labels.max()) + 1 if len(original_labels) > 0 else 0
+    lowest = np.full(num_original, np.iinfo(np.int64).max)
+    highest = np.full(num_original, -1)
+    np.minimum.at(lowest, original_labels, new_labels)
+    np.maximum.at(highest, original_labels, new_labels)
+    return bool(np.all(lowest == highest))
+
+
+def robustness_sweep(graph, simulations=100, workers=1, seed=None, output_file=None, components=None, quiet=False):
+    """
+    Computes the robustness curve for every number of edge failures k = 0..E at once. Each simulation picks a random order of edge failures,
+    then adds the edges back in reverse order with a union-find (Newman-Ziff), so the metrics for every k come from a single pass.
+
+    Parameters:
+        - graph (NetworkX graph | CompactGraph): the graph on which to perform the sweep
+        - simulations (int): the number of random failure orders to average over (default = 100)
+        - workers (int): the number of processes the simulations are distributed across (default = 1)
+        - seed (int): seed for the random failure orders (default = None)
+        - output_file (str): optional .csv or .npz file to save the curve to (default = None)
+        - components (tuple): the `component_labels()` result of the graph, if it was already calculated (default = None)
+        - quiet (bool): flag that skips printing the summary of the curve (default = False)
+
+    Returns:
+        - curve (dict): arrays indexed by k for "k", "average_num_components", "average_giant_component_size", and "cluster_persistence_rate"
+    """
+
+    try:
+        simulations = int(simulations)
+        workers = int(workers)
+    except:
+        print(f"{simulations} simulations and/or {workers} workers are not able to be converted into integers. Robustness sweep terminated.\n---")
+        return
+
+    if simulations < 1 or workers < 1:
+        print("The number of simulations and workers must be at least 1. Robustness sweep terminated.\n---")
+        return
+
+    if output_file is not None and not (output_file.endswith(".csv") or output_file.endswith(".npz")):
+        print(f"Output file type is not .csv or .npz, so robustness sweep terminated. Provided file: {output_file}\n---")
+        return
+
+    nodes, sources, targets = edge_index(graph)
+    _, original_labels = components if components is not None else component_labels(len(nodes), sources, targets)
+
+    trial_seeds = np.random.SeedSequence(seed).spawn(simulations)
+    shared = (len(nodes), sources, targets, original_labels)
+
+    with phase("sweeps"):
+        if workers == 1:
+            totals = _run_sweeps(shared, trial_seeds)
+        else:
+            batches = [[trial_seeds[i] for i in batch] for batch in np.array_split(np.arange(simulations), workers) if len(batch) > 0]
+            with ProcessPoolExecutor(max_workers=len(batches)) as pool:
+                totals = sum(pool.map(_run_sweeps, [shared] * len(batches), batches))
+
+    # average the summed metrics over the simulations
+    curve = {
+        "k": np.arange(len(sources) + 1),
+        "average_num_components": totals[0] / simulations,
+        "average_giant_component_size": totals[1] / simulations,
+        "cluster_persistence_rate": totals[2] / simulations
+    }
+
+    try:
+        with phase("save"):
+            if output_file is not None and output_file.endswith(".csv"):
+                np.savetxt(output_file, np.column_stack(list(curve.values())), delimiter=",", header=",".join(curve), comments="", fmt="%.6g")
+            elif output_file is not None:
+                np.savez(output_file, **curve)
+    except Exception as e:
+        print("Saving the robustness sweep terminated due to an error in creating the save file. Provided error:", e, "\n---")
+
+    if quiet:
+        return curve
+
+    # summarize the curve at a few points
+    print("ROBUSTNESS_SWEEP")
+    for k in sorted(set(np.linspace(0, len(sources), 5).astype(int).tolist())):
+        print(f"k = {k}: average_num_components: {curve['average_num_components'][k]:.2f}, average_giant_component_size: {curve['average_giant_component_size'][k]:.2f}, cluster_persistence_rate: {curve['cluster_persistence_rate'][k]:.2f}")
+    print('---')
+    return curve
+
+
+def _run_sweeps(shared, trial_seeds):
+    """
+    Helper function that runs a batch of Newman-Ziff sweeps, either in this process or in a worker process.
+
+    Parameters:
+        - shared (tuple): the number of nodes, edge arrays, and original component labels
+        - trial_seeds (list[SeedSequence]): one seed per simulation in the batch
+
+    Returns:
+        - totals (np.ndarray): rows of the number of components, giant component size, and cluster persistence, summed over the batch and indexed by k
+    """
+
+    num_nodes, sources, targets, original_labels = shared
+    num_edges = len(sources)
+    totals = np.zeros((3, num_edges + 1))
+
+    # the number of nodes in each original cluster is how many pieces it starts in when every edge has failed
+    original_pieces = np.bincount(original_labels, minlength=1).tolist() if num_nodes > 0 else []
+    original_labels = original_labels.tolist()
+
+    for trial_seed in trial_seeds:
+        # edges fail in this order, so they are added back in reverse order
+        order = np.random.default_rng(trial_seed).permutation(num_edges)
+        order_sources = sources[order].tolist()
+        order_targets = targets[order].tolist()
+
+        parent = list(range(num_nodes))
+        size = [1] * num_nodes
+        pieces = list(original_pieces)
+        broken = sum(1 for p in pieces if p > 1)
+        num_components = num_nodes
+        giant = 1 if num_nodes > 0 else 0
+
+        # metrics for k = E (every edge failed)
+        components_by_k = [0] * (num_edges + 1)
+        giant_by_k = [0] * (num_edges + 1)
+        persist_by_k = [0] * (num_edges + 1)
+        components_by_k[num_edges], giant_by_k[num_edges], persist_by_k[num_edges] = num_components, giant, broken == 0
+
+        for added in range(num_edges):
+            i = num_edges - 1 - added
+            root1, root2 = _find(parent, order_sources[i]), _find(parent, order_targets[i])
+
+            if root1 != root2:
+                # union by size
+                if size[root1] < size[root2]:
+                    root1, root2 = root2, root1
+                parent[root2] = root1
+                size[root1] += size[root2]
+                num_components -= 1
+                giant = max(giant, size[root1])
+
+                # both ends are always in the same original cluster, which is now in one less piece
+                cluster = original_labels[root1]
+                pieces[cluster] -= 1
+                if pieces[cluster] == 1:
+                    broken -= 1
+
+            # after adding this edge back, only the edges before it in the failure order are still failed
+            components_by_k[i], giant_by_k[i], persist_by_k[i] = num_components, giant, broken == 0
+
+        totals[0] += components_by_k
+        totals[1] += giant_by_k
+        totals[2] += persist_by_k
+
+    return totals
+
+
+def _find(parent, node):
+    """
+    Helper function that finds the root of a node in the union-find, compressing the path along the way.
+
+    Parameters:
+        - parent (list[int]): the parent of each node in the union-find
+        - node (int): the node to find the root of
+
+    Returns:
+        - int: the root of the node's set
+    """
+
+    root = node
+    while parent[root] != root:
+        root = parent[root]
+    while parent[node] != root:
+        parent[node], node = root, parent[node]
+    return root
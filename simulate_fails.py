@@ -1,12 +1,39 @@
 import networkx as nx
+import numpy as np
 import random
-import copy
+from path_metrics import path_metrics
+from betweenness import betweenness
+from compact_graph import CompactGraph
+from robustness_check import component_labels
+from profiling import phase
 
 
-def removal(graph, k):
+def edge_list(graph):
+    """Function that builds the edge index used to select failed edges, so it can be built once and reused across simulations
+    Input: user graph
+    Output: list of the graph's edges, where an edge's position is its index (multigraph edges include their key)"""
+
+    if graph.is_multigraph():
+        return list(graph.edges(keys=True))
+    return list(graph.edges())
+
+
+def failure_mask(num_edges, k, rng=None):
+    """Function that picks k distinct random edges to fail without rejection sampling
+    Inputs: number of edges in the edge index, value k that represents the number of edges to remove, optional random.Random to draw from
+    Output: boolean NumPy array over the edge index, True for the edges that survive"""
+
+    rng = rng or random
+    surviving = np.ones(num_edges, dtype=bool)
+    surviving[rng.sample(range(num_edges), min(k, num_edges))] = False
+    return surviving
+
+
+def removal(graph, k, edges=None):
     """Function that removes k random edges from user graph
-    Inputs: user graph, value k that represents the number of edges to remove
-    Output: deepcopy of user graph with k random edges removed"""
+    Inputs: user graph or its CompactGraph, value k that represents the number of edges to remove, optional edge index from edge_list() to reuse
+    Output: read-only view of user graph with k random edges hidden (a CompactGraph without them for a CompactGraph). No copy of the graph or
+    its attributes is made"""
 
     # ensure k is an integer
     try:
@@ -16,96 +43,125 @@ def removal(graph, k):
         return
     
     try:
-        # if k is larger than the number of edges, reduce k down to the number of edges (as impact will be the same) to prevent errors in the removal process below
-        if k > len(graph.edges()):
-            k = len(graph.edges())
-        
-        # create a deepcopy of the graph to modify
-        reduced_graph = copy.deepcopy(graph)
-
-        # create a list of k random numbers between 0 and the number of edges to represent which edges will be removed
-        random_edges = []
-        for i in range(k):
-            num = random.randint(0, len(graph.edges()) - 1)
-            while num in random_edges:
-                num = random.randint(0, len(graph.edges()) - 1)
-            random_edges.append(num)
-        
-        # place the edges into a list to easily associate them with random_edges
-        edges_init = list(enumerate(graph.edges()))
-        edges = [e for id, e in edges_init]
-
-        # remove the randomly selected edges
-        for edge in random_edges:
-            u, v = edges[edge]
-            reduced_graph.remove_edge(u, v)
-
-        # return the reduced graph
-        return reduced_graph
+        # a CompactGraph just drops the failed edges from its edge arrays
+        if isinstance(graph, CompactGraph):
+            return graph.restricted(failure_mask(graph.number_of_edges(), k))
+
+        if edges is None:
+            edges = edge_list(graph)
+
+        # select the failed edges through a mask over the edge index (if k is larger than the number of edges, every edge fails)
+        surviving = failure_mask(len(edges), k)
+        removed_edges = [edges[i] for i in np.flatnonzero(~surviving)]
+
+        # hide the removed edges behind a view of the graph instead of deleting them from a copy
+        return nx.restricted_view(graph, [], removed_edges)
     
     except Exception as e:
         print(f"Something went wrong in the removal of {k} edges in the failure simulation. Simulation of failure terminated. Error message:", e, "\n---")
         return
 
 
-def failures(graph, k):
+def number_of_components(graph):
+    """Function that counts the connected components of a graph
+    Input: user graph or its CompactGraph
+    Output: the number of connected components"""
+
+    if isinstance(graph, CompactGraph):
+        return component_labels(graph.number_of_nodes(), graph.sources, graph.targets)[0]
+    return nx.number_connected_components(graph)
+
+
+def failures(graph, k, path_samples=None, betweenness_samples=None, betweenness_epsilon=None, workers=1, components=None, quiet=False):
     """Function that determines how the removal of k random edges impacts shortest path, components, and betweenness
-    Inputs: user graph, value k that represents the number of edges to remove
-    Output: N/A, all print statements"""
+    Inputs: user graph or its CompactGraph, value k that represents the number of edges to remove, optional number of BFS sources to sample
+    to approximate the shortest path metrics (default is exact), optional number of pivots or error bound to approximate the betweenness
+    (default is exact), number of worker processes for the betweenness, optional number of connected components of the graph if it was
+    already calculated, bool to skip printing the results
+    Output: dict with each metric of the original graph and of the reduced graph (under "reduced_" + the metric's name), formatted as
+    {"removed_edges": int, "average_shortest_path": float, "diameter": int, "efficiency": float, "unreachable_pairs": int, "num_components": int,
+    "average_betweenness": float, "reduced_...": ...}, or None if the simulation failed. Also printed"""
 
     try:
         # remove k random edges from graph
-        reduced_graph = removal(graph, k)
-
-        print(f"ANALYSIS: impact of the removal of {k} edges on the graph's average shortest path, connected components, and betweenness.")
-        
-        # calculate shortest path before and after
-        ave_sp_graph = 0
-        ave_sp_reduced_graph = 0
-        for node in graph.nodes():
-            # calculate the length of the longest shortest path from each node to the end of the graph based on BFS traversal
-            ave_sp_graph += (len(list(enumerate(nx.bfs_layers(graph, node)))) - 1)
-            # the nodes stay the same in reduced_graph, so we can do this calculation in the for-loop too
-            ave_sp_reduced_graph += (len(list(enumerate(nx.bfs_layers(reduced_graph, node)))) - 1)
-
-        # average out all the shortest paths in each graph by dividing by the number of nodes
-        ave_sp_graph /= len(graph.nodes())
-        ave_sp_reduced_graph /= len(graph.nodes())
-
-        if ave_sp_graph > ave_sp_reduced_graph:
-            print(f"The average shortest path decreased by {(ave_sp_graph - ave_sp_reduced_graph):.2f}, from {ave_sp_graph:.2f} in the original graph to {ave_sp_reduced_graph:.2f} in the reduced graph.")
-        elif ave_sp_reduced_graph > ave_sp_graph:
-            print(f"The average shortest path increased by {(ave_sp_reduced_graph - ave_sp_graph):.2f}, from {ave_sp_graph:.2f} in the original graph to {ave_sp_reduced_graph:.2f} in the reduced graph.")
-            print(f"The average shortest path in the reduced graph is {ave_sp_reduced_graph:.2f}, which increased by {(ave_sp_reduced_graph - ave_sp_graph):.2f} from the average shortest path in the original graph of {ave_sp_graph:.2f}.")
-        else:
-            print(f"The average shortest path remained the same between the removal of {k} edges, staying at {ave_sp_graph:.2f}.")
+        with phase("removal"):
+            reduced_graph = removal(graph, k)
 
-        # calculate the number of disconnected components
-        connected_comp_graph = nx.number_connected_components(graph)
-        connected_comp_reduced_graph = nx.number_connected_components(reduced_graph)
+        # calculate the shortest path metrics before and after, once per graph. both graphs sample the same BFS sources so they are comparable
+        with phase("path_metrics"):
+            path_seed = random.randrange(2 ** 32)
+            paths_graph = path_metrics(graph, path_samples, path_seed)
+            paths_reduced_graph = path_metrics(reduced_graph, path_samples, path_seed)
 
-        if connected_comp_graph < connected_comp_reduced_graph:
-            print(f"The components disconnected, from {connected_comp_graph} components in the original graph to {connected_comp_reduced_graph} components in the reduced graph.")
-        else:
-            print(f"No components disconnected, staying at {connected_comp_graph} components after the removal of {k} edges.")
+        # calculate the number of disconnected components
+        with phase("components"):
+            connected_comp_graph = components if components is not None else number_of_components(graph)
+            connected_comp_reduced_graph = number_of_components(reduced_graph)
 
         # calculate the impact on betweenness centrality
-        # determine the betweenness for each node, then flatten into a list and average the values
-        betweenness_graph_init = nx.betweenness_centrality(graph, None, True)
-        betweenness_graph_vals = list(betweenness_graph_init.values())
-        betweenness_graph = sum(betweenness_graph_vals) / len(betweenness_graph_vals)
-
-        betweenness_reduced_graph_init = nx.betweenness_centrality(reduced_graph, None, True)
-        betweenness_reduced_graph_vals = list(betweenness_reduced_graph_init.values())
-        betweenness_reduced_graph = sum(betweenness_reduced_graph_vals) / len(betweenness_reduced_graph_vals)
-
-        if betweenness_graph > betweenness_reduced_graph:
-            print(f"The betweenness centrality decreased by {(betweenness_graph - betweenness_reduced_graph):.3f}, from {betweenness_graph:.3f} in the original graph to {betweenness_reduced_graph:.3f} in the reduced graph.\n---")
-        elif betweenness_reduced_graph > betweenness_graph:
-            print(f"The betweenness centrality increased by {(betweenness_reduced_graph - betweenness_graph):.3f}, from {betweenness_graph:.3f} in the original graph to {betweenness_reduced_graph:.3f} in the reduced graph.\n---")
-        else:
-            print(f"The betweenness centrality did not change after the removal of {k} edges, remaining at {betweenness_graph:.3f}.\n---")
-        
+        # determine the betweenness for each node, then flatten into a list and average the values. the original graph's result is cached, so repeated simulations only recompute the reduced graph
+        with phase("betweenness"):
+            betweenness_graph_init = betweenness(graph, betweenness_samples, betweenness_epsilon, workers, cache=True)
+            betweenness_graph_vals = list(betweenness_graph_init.values())
+            betweenness_graph = sum(betweenness_graph_vals) / len(betweenness_graph_vals)
+
+            betweenness_reduced_graph_init = betweenness(reduced_graph, betweenness_samples, betweenness_epsilon, workers)
+            betweenness_reduced_graph_vals = list(betweenness_reduced_graph_init.values())
+            betweenness_reduced_graph = sum(betweenness_reduced_graph_vals) / len(betweenness_reduced_graph_vals)
+
+        # k can be more than the number of edges, which are then all removed
+        results = {"removed_edges": min(int(k), graph.number_of_edges())}
+        for prefix, paths, num_components, average_betweenness in [("", paths_graph, connected_comp_graph, betweenness_graph),
+                                                                   ("reduced_", paths_reduced_graph, connected_comp_reduced_graph, betweenness_reduced_graph)]:
+            for metric in ["average_shortest_path", "diameter", "efficiency", "unreachable_pairs"]:
+                results[prefix + metric] = paths[metric]
+            results[prefix + "num_components"] = int(num_components)
+            results[prefix + "average_betweenness"] = float(average_betweenness)
+        if not quiet:
+            print_failures(results["removed_edges"], paths_graph, paths_reduced_graph, results)
+        return results
+
     except Exception as e:
         print("Something went wrong in the simulation of failure. Simulation of failure terminated. Error message:", e, "\n---")
         return
+
+
+def print_failures(k, paths_graph, paths_reduced_graph, results):
+    """Function that prints the impact of the removal of k edges
+    Inputs: value k, path_metrics() results of the original and reduced graph, results dict from failures()
+    Output: N/A - all print statements"""
+
+    print(f"ANALYSIS: impact of the removal of {k} edges on the graph's average shortest path, connected components, and betweenness.")
+
+    ave_sp_graph = results["average_shortest_path"]
+    ave_sp_reduced_graph = results["reduced_average_shortest_path"]
+    if not paths_graph["exact"]:
+        low, high = paths_graph["average_shortest_path_interval"] or (ave_sp_graph, ave_sp_graph)
+        low_reduced, high_reduced = paths_reduced_graph["average_shortest_path_interval"] or (ave_sp_reduced_graph, ave_sp_reduced_graph)
+        print(f"The shortest path metrics are approximated from {paths_graph['sources']} sampled BFS sources. 95% confidence intervals of the average shortest path: [{low:.2f}, {high:.2f}] in the original graph and [{low_reduced:.2f}, {high_reduced:.2f}] in the reduced graph.")
+
+    if ave_sp_graph > ave_sp_reduced_graph:
+        print(f"The average shortest path decreased by {(ave_sp_graph - ave_sp_reduced_graph):.2f}, from {ave_sp_graph:.2f} in the original graph to {ave_sp_reduced_graph:.2f} in the reduced graph.")
+    elif ave_sp_reduced_graph > ave_sp_graph:
+        print(f"The average shortest path increased by {(ave_sp_reduced_graph - ave_sp_graph):.2f}, from {ave_sp_graph:.2f} in the original graph to {ave_sp_reduced_graph:.2f} in the reduced graph.")
+    else:
+        print(f"The average shortest path remained the same between the removal of {k} edges, staying at {ave_sp_graph:.2f}.")
+
+    # unreachable pairs are left out of the average shortest path, so also report them along with the diameter and efficiency
+    print(f"The diameter went from {results['diameter']} to {results['reduced_diameter']}, the efficiency from {results['efficiency']:.3f} to {results['reduced_efficiency']:.3f}, and the unreachable node pairs from {results['unreachable_pairs']} to {results['reduced_unreachable_pairs']}.")
+
+    connected_comp_graph = results["num_components"]
+    connected_comp_reduced_graph = results["reduced_num_components"]
+    if connected_comp_graph < connected_comp_reduced_graph:
+        print(f"The components disconnected, from {connected_comp_graph} components in the original graph to {connected_comp_reduced_graph} components in the reduced graph.")
+    else:
+        print(f"No components disconnected, staying at {connected_comp_graph} components after the removal of {k} edges.")
+
+    betweenness_graph = results["average_betweenness"]
+    betweenness_reduced_graph = results["reduced_average_betweenness"]
+    if betweenness_graph > betweenness_reduced_graph:
+        print(f"The betweenness centrality decreased by {(betweenness_graph - betweenness_reduced_graph):.3f}, from {betweenness_graph:.3f} in the original graph to {betweenness_reduced_graph:.3f} in the reduced graph.\n---")
+    elif betweenness_reduced_graph > betweenness_graph:
+        print(f"The betweenness centrality increased by {(betweenness_reduced_graph - betweenness_graph):.3f}, from {betweenness_graph:.3f} in the original graph to {betweenness_reduced_graph:.3f} in the reduced graph.\n---")
+    else:
+        print(f"The betweenness centrality did not change after the removal of {k} edges, remaining at {betweenness_graph:.3f}.\n---")
@@ -0,0 +1,227 @@
+import numpy as np
+
+
+def read_events(csv_path):
+    """
+    Reads a temporal event log into integer arrays, grouped by timestamp once: events are stably sorted by timestamp (so the events of a
+    timestamp keep their order in the file), and the events of frame `f` are rows `offsets[f]:offsets[f+1]`.
+
+    Parameters:
+        - csv_path (str): the path of the csv file containing the history of graph changes in format (source, target, timestamp, action)
+
+    Returns:
+        - events (dict): arrays of the event log, formatted as {"labels": node label of each node id, "timestamps": the distinct timestamps in
+          order, "offsets": where the events of each timestamp start, "edges": the undirected edge id of each event, "adds": True for "add"
+          events and False for "remove" events, "edge_sources"/"edge_targets": the node ids of each edge id}. Events with any other action are
+          left out
+    """
+
+    # pandas is slow to import, so it is only imported when an event log is read
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    df = df[df["action"].isin(["add", "remove"])]
+    order = np.argsort(df["timestamp"].to_numpy(), kind="stable")
+
+    # map node labels to integer ids, then every undirected edge to an id from its (lower, higher) node ids
+    ids, labels = pd.factorize(np.concatenate((df["source"].to_numpy()[order], df["target"].to_numpy()[order])))
+    num_events = len(order)
+    sources, targets = ids[:num_events].astype(np.int64), ids[num_events:].astype(np.int64)
+    low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+    keys, edges = np.unique(low * max(len(labels), 1) + high, return_inverse=True)
+
+    timestamps, offsets = np.unique(df["timestamp"].to_numpy()[order], return_index=True)
+    return {
+        "labels": list(labels),
+        "timestamps": timestamps,
+        "offsets": np.append(offsets, num_events),
+        "edges": edges.ravel(),
+        "adds": (df["action"].to_numpy()[order] == "add"),
+        "edge_sources": keys // max(len(labels), 1),
+        "edge_targets": keys % max(len(labels), 1)
+    }
+
+
+def frame_deltas(events):
+    """
+    Turns the event log into the edges added and removed at each timestamp, all at once. Within a timestamp, the last event of an edge decides
+    whether it is present afterwards (the same as applying the events one by one, where removing a missing edge does nothing), and an edge
+    only counts as added or removed if that changes whether it is present.
+
+    Parameters:
+        - events (dict): the event log from `read_events()`
+
+    Returns:
+        - deltas (dict): {"frames": frame of each change, "edges": edge id of each change, "adds": True if the change adds the edge,
+          "offsets": where the changes of each frame start}, with the changes sorted by frame
+    """
+
+    num_frames = len(events["timestamps"])
+    frame_of = np.repeat(np.arange(num_frames), np.diff(events["offsets"]))
+    edges = events["edges"]
+
+    # keep the last event of every (frame, edge) pair
+    order = np.lexsort((np.arange(len(edges)), edges, frame_of))
+    frame_sorted, edge_sorted = frame_of[order], edges[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = (frame_sorted[1:] != frame_sorted[:-1]) | (edge_sorted[1:] != edge_sorted[:-1])
+    frames, changed_edges, states = frame_sorted[last], edge_sorted[last], events["adds"][order][last]
+
+    # compare every edge's state with its state after the previous frame it appeared in (every edge starts out missing)
+    by_edge = np.lexsort((frames, changed_edges))
+    previous = np.zeros(len(by_edge), dtype=bool)
+    same_edge = changed_edges[by_edge][1:] == changed_edges[by_edge][:-1]
+    previous[1:][same_edge] = states[by_edge][:-1][same_edge]
+    changes = np.empty(len(by_edge), dtype=bool)
+    changes[by_edge] = states[by_edge] != previous
+
+    frames, changed_edges, states = frames[changes], changed_edges[changes], states[changes]
+    return {
+        "frames": frames,
+        "edges": changed_edges,
+        "adds": states,
+        "offsets": np.searchsorted(frames, np.arange(num_frames + 1))
+    }
+
+
+def component_counts(num_nodes, num_frames, deltas, edge_sources, edge_targets):
+    """
+    Counts the connected components after every frame with offline dynamic connectivity. Every edge is present over intervals of frames,
+    which are spread over a segment tree on the frames; a depth first walk of the tree unites the edges of each tree node in a union-find
+    (union by size, no path compression) and undoes them on the way back up, so every frame is counted without rebuilding its graph and the
+    total work is O(changes * log(frames) * log(nodes)).
+
+    Parameters:
+        - num_nodes (int): the number of nodes, which are all present in every frame
+        - num_frames (int): the number of frames
+        - deltas (dict): the changes of every frame from `frame_deltas()`
+        - edge_sources (np.ndarray): the lower node id of every edge id
+        - edge_targets (np.ndarray): the higher node id of every edge id
+
+    Returns:
+        - counts (np.ndarray): the number of connected components after each frame
+    """
+
+    # every add starts an interval and the next remove of the same edge (or the end) closes it
+    by_edge = np.lexsort((deltas["frames"], deltas["edges"]))
+    frames, edges, adds = deltas["frames"][by_edge], deltas["edges"][by_edge], deltas["adds"][by_edge]
+    starts = np.flatnonzero(adds)
+    closed = (starts + 1 < len(edges)) & (edges[np.minimum(starts + 1, len(edges) - 1)] == edges[starts])
+    ends = np.where(closed, frames[np.minimum(starts + 1, len(edges) - 1)], num_frames)
+
+    size = 1
+    while size < num_frames:
+        size *= 2
+    buckets = [[] for _ in range(2 * size)]
+    for low, high, edge in zip((frames[starts] + size).tolist(), (ends + size).tolist(), edges[starts].tolist()):
+        while low < high:
+            if low & 1:
+                buckets[low].append(edge)
+                low += 1
+            if high & 1:
+                high -= 1
+                buckets[high].append(edge)
+            low >>= 1
+            high >>= 1
+
+    edge_sources, edge_targets = edge_sources.tolist(), edge_targets.tolist()
+    parent = list(range(num_nodes))
+    set_size = [1] * num_nodes
+    history = []
+    counts = np.empty(num_frames, dtype=np.int64)
+
+    def find(node):
+        while parent[node] != node:
+            node = parent[node]
+        return node
+
+    # walk the tree depth first. a negative entry marks leaving a tree node, which undoes its unions
+    stack = [1]
+    while stack:
+        tree_node = stack.pop()
+        if tree_node < 0:
+            mark = -tree_node
+            while len(history) > mark - 1:
+                child = history.pop()
+                set_size[parent[child]] -= set_size[child]
+                parent[child] = child
+            continue
+
+        stack.append(-(len(history) + 1))
+        for edge in buckets[tree_node]:
+            root1, root2 = find(edge_sources[edge]), find(edge_targets[edge])
+            if root1 != root2:
+                if set_size[root1] < set_size[root2]:
+                    root1, root2 = root2, root1
+                parent[root2] = root1
+                set_size[root1] += set_size[root2]
+                history.append(root2)
+
+        if tree_node >= size:
+            if tree_node - size < num_frames:
+                counts[tree_node - size] = num_nodes - len(history)
+        else:
+            stack.append(2 * tree_node + 1)
+            stack.append(2 * tree_node)
+    return counts
+
+
+def snapshots(events, metrics=True):
+    """
+    Replays the event log one timestamp at a time as a generator, so a consumer can stream through the frames instead of holding all of them.
+    Each frame applies its changes from `frame_deltas()` as a batch, and keeps the degree of every node and the degree histogram up to date
+    with only the nodes the batch touches. The component counts of every frame come from `component_counts()` up front.
+
+    Parameters:
+        - events (dict): the event log from `read_events()`
+        - metrics (bool): flag that also counts the components and keeps the degree histogram of every frame (default = True)
+
+    Returns:
+        - snapshots (generator[dict]): one dict per timestamp, formatted as {"frame": int, "timestamp": the timestamp, "added": edge ids added,
+          "removed": edge ids removed, "present": bool array over the edge ids, True for the edges in the graph, "degrees": the degree of every
+          node id, "num_edges": int, "num_components": int or None, "degree_histogram": number of nodes with each degree or None}. "present",
+          "degrees", and "degree_histogram" are updated in place by the next frame, so copy them to keep them
+    """
+
+    num_nodes = len(events["labels"])
+    num_frames = len(events["timestamps"])
+    deltas = frame_deltas(events)
+    counts = component_counts(num_nodes, num_frames, deltas, events["edge_sources"], events["edge_targets"]) if metrics else None
+
+    present = np.zeros(len(events["edge_sources"]), dtype=bool)
+    degrees = np.zeros(num_nodes, dtype=np.int64)
+    histogram = np.zeros(2, dtype=np.int64)
+    histogram[0] = num_nodes
+    num_edges = 0
+
+    for frame in range(num_frames):
+        changes = slice(deltas["offsets"][frame], deltas["offsets"][frame + 1])
+        edges, adds = deltas["edges"][changes], deltas["adds"][changes]
+        added, removed = edges[adds], edges[~adds]
+        present[added] = True
+        present[removed] = False
+        num_edges += len(added) - len(removed)
+
+        # a self loop adds 2 to the degree of its node, the same as in NetworkX
+        endpoints = np.concatenate((events["edge_sources"][edges], events["edge_targets"][edges]))
+        touched = np.unique(endpoints)
+        if metrics and len(touched) > 0:
+            np.subtract.at(histogram, degrees[touched], 1)
+        np.add.at(degrees, endpoints, np.tile(np.where(adds, 1, -1), 2))
+        if metrics and len(touched) > 0:
+            highest = int(degrees[touched].max())
+            if highest >= len(histogram):
+                histogram = np.concatenate((histogram, np.zeros(max(highest + 1, 2 * len(histogram)) - len(histogram), dtype=np.int64)))
+            np.add.at(histogram, degrees[touched], 1)
+
+        yield {
+            "frame": frame,
+            "timestamp": events["timestamps"][frame],
+            "added": added,
+            "removed": removed,
+            "present": present,
+            "degrees": degrees,
+            "num_edges": num_edges,
+            "num_components": int(counts[frame]) if metrics else None,
+            "degree_histogram": histogram[:np.flatnonzero(histogram)[-1] + 1] if metrics and num_nodes > 0 else None
+        }
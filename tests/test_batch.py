@@ -0,0 +1,18 @@
+import tracemalloc
+import batch
+import profiling
+
+
+def test_failed_profiled_file_stops_the_profiler(tmp_path):
+    row = batch.analyze_file(str(tmp_path / "missing.gml"), ["--profile", str(tmp_path / "profile.json")])
+    assert row["status"] == "error"
+    assert profiling._active is None
+    assert not tracemalloc.is_tracing()
+
+
+def test_file_report_row(tmp_path):
+    path = tmp_path / "graph.csv"
+    path.write_text("source,target,sign\na,b,+\nb,c,-\n")
+    row = batch.analyze_file(str(path), ["--verify_balanced_graph"])
+    assert row["status"] == "ok"
+    assert row["results"]["verify_balanced_graph"]["balanced"] is True
@@ -0,0 +1,100 @@
+import random
+import networkx as nx
+import numpy as np
+import pytest
+import balanced_graph as bal
+from betweenness import betweenness
+from cluster import adjacency_csr, clustering_coefficients
+from compact_graph import CompactGraph
+from neighborhood import neighborhood_overlaps
+from path_metrics import path_metrics
+from robustness_check import edge_index
+
+
+def random_signed_graph(seed):
+    """A small random graph with random '+'/'-' signs, or with the signs of two factions (which is always balanced) for every other seed"""
+
+    rng = random.Random(seed)
+    graph = nx.gnm_random_graph(rng.randint(1, 30), rng.randint(0, 60), seed=seed)
+    faction = {node: rng.random() < 0.5 for node in graph}
+    for u, v in graph.edges():
+        if seed % 2:
+            graph.edges[u, v]["sign"] = rng.choice("+-")
+        else:
+            graph.edges[u, v]["sign"] = "+" if faction[u] == faction[v] else "-"
+    return graph
+
+
+def check_witness(graph, results):
+    """Checks that the witness of an unbalanced graph is a negative edge inside a supernode, or an odd cycle of supernodes joined by
+    negative edges"""
+
+    supernode = {node: i for i, nodes in enumerate(results["supernodes"]) for node in nodes}
+    if results["witness_edge"] is not None:
+        u, v = results["witness_edge"]
+        assert graph.edges[u, v]["sign"] == "-" and supernode[u] == supernode[v]
+    else:
+        cycle = results["witness_cycle"]
+        assert len(cycle) % 2 == 1
+        negative = {frozenset((supernode[u], supernode[v])) for u, v, sign in graph.edges(data="sign") if sign == "-"}
+        assert all(frozenset((cycle[i], cycle[(i + 1) % len(cycle)])) in negative for i in range(len(cycle)))
+
+
+@pytest.mark.parametrize("seed", range(400))
+def test_balance_engines_agree(seed):
+    graph = random_signed_graph(seed)
+    expected = bal.balance_engine(graph)
+    results = bal.balance_engine(CompactGraph.from_networkx(graph))
+
+    assert results["balanced"] == expected["balanced"]
+    assert {frozenset(nodes) for nodes in results["supernodes"]} == {frozenset(nodes) for nodes in expected["supernodes"]}
+    if seed % 2 == 0:
+        assert results["balanced"]
+    if not results["balanced"]:
+        check_witness(graph, expected)
+        check_witness(graph, results)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_structure_analyses_agree(seed):
+    graph = random_signed_graph(seed)
+    compact = CompactGraph.from_networkx(graph)
+    nodes = list(graph)
+
+    matrix, index = adjacency_csr(graph)
+    compact_matrix, compact_index = adjacency_csr(compact)
+    order = [index[node] for node in nodes]
+    compact_order = [compact_index[node] for node in nodes]
+    assert (matrix[order][:, order] != compact_matrix[compact_order][:, compact_order]).nnz == 0
+
+    labels, sources, targets = edge_index(compact)
+    assert sorted(frozenset((labels[u], labels[v])) for u, v in zip(sources.tolist(), targets.tolist())) == \
+        sorted(frozenset(edge) for edge in graph.edges())
+
+    expected = betweenness(graph)
+    results = betweenness(compact)
+    assert np.allclose([results[node] for node in nodes], [expected[node] for node in nodes])
+
+    expected = path_metrics(graph)
+    results = path_metrics(compact)
+    for metric in ("average_shortest_path", "efficiency", "diameter", "unreachable_pairs"):
+        assert results[metric] == pytest.approx(expected[metric])
+
+    if nodes:
+        expected = clustering_coefficients(graph, plot=True)
+        results = clustering_coefficients(graph, plot=True, compact=compact)
+        assert results["coefficients"] == pytest.approx(expected["coefficients"])
+
+    pairs = list(graph.edges())
+    assert np.allclose(neighborhood_overlaps(graph, pairs, plot=True), neighborhood_overlaps(graph, pairs, plot=True, compact=compact))
+
+
+def test_signs_and_round_trip():
+    graph = random_signed_graph(1)
+    compact = CompactGraph.from_networkx(graph)
+    signs = dict(zip(zip(compact.sources.tolist(), compact.targets.tolist()), compact.signs().tolist()))
+    labels = list(compact.labels)
+    for u, v, sign in graph.edges(data="sign"):
+        key = (labels.index(u), labels.index(v))
+        assert signs.get(key, signs.get(key[::-1])) == (1 if sign == "+" else -1)
+    assert nx.utils.graphs_equal(compact.to_networkx(), graph)
@@ -0,0 +1,54 @@
+import os
+import networkx as nx
+import file_io as fio
+from compact_graph import CompactGraph
+
+
+def write_gml(path, colors):
+    """Writes a path graph with one node per entry of colors, leaving out the color of the nodes whose entry is None"""
+
+    graph = nx.path_graph(len(colors))
+    for node, color in enumerate(colors):
+        if color is not None:
+            graph.nodes[node]["color"] = color
+    nx.write_gml(graph, path)
+
+
+def test_cache_matches_the_gml_file(tmp_path):
+    path = str(tmp_path / "graph.gml")
+    write_gml(path, ["red", None, "blue"])
+
+    fio.parse_arrays(path)
+    cached = fio.parse_arrays(path)
+    assert "version" in cached["meta"]
+    assert nx.utils.graphs_equal(fio.graph_from_arrays(cached), nx.read_gml(path))
+
+
+def test_rewritten_gml_does_not_keep_stale_arrays(tmp_path):
+    path = str(tmp_path / "graph.gml")
+    write_gml(path, [None, None, "red", None, None])
+    fio.parse_arrays(path)
+    assert os.path.exists(os.path.join(fio.cache_path(path), "node_color_mask.npy"))
+
+    # every node has a color now, so the column has no missing value mask
+    write_gml(path, ["red", "blue", "red", "blue", "red", "blue", "red", "blue"])
+    fio.parse_arrays(path)
+    cached = fio.parse_arrays(path)
+
+    assert "version" in cached["meta"]
+    assert "node_color_mask" not in cached
+    assert not os.path.exists(os.path.join(fio.cache_path(path), "node_color_mask.npy"))
+    assert nx.utils.graphs_equal(fio.graph_from_arrays(cached), nx.read_gml(path))
+    codes, categories = CompactGraph(cached).codes("color")
+    assert [categories[code] for code in codes] == ["red", "blue"] * 4
+
+
+def test_rewritten_gml_with_the_same_node_count(tmp_path):
+    path = str(tmp_path / "graph.gml")
+    write_gml(path, ["red", None, None, None])
+    fio.parse_arrays(path)
+
+    write_gml(path, ["blue", "red", "blue", "red"])
+    fio.parse_arrays(path)
+    cached = fio.parse_arrays(path)
+    assert dict(fio.graph_from_arrays(cached).nodes(data="color")) == dict(nx.read_gml(path).nodes(data="color"))
@@ -0,0 +1,40 @@
+import re
+import networkx as nx
+import pytest
+import file_io as fio
+from gml_stream import read_gml_arrays, write_gml_arrays
+
+
+def test_read_matches_networkx(tmp_path):
+    path = str(tmp_path / "graph.gml")
+    graph = nx.relabel_nodes(nx.karate_club_graph(), str)
+    nx.set_edge_attributes(graph, {edge: "+" if i % 3 else "-" for i, edge in enumerate(graph.edges())}, "sign")
+    nx.write_gml(graph, path)
+    assert nx.utils.graphs_equal(fio.graph_from_arrays(read_gml_arrays(path)), nx.read_gml(path))
+
+
+def test_mixed_type_attributes_round_trip(tmp_path):
+    path = str(tmp_path / "graph.gml")
+    graph = nx.path_graph(6)
+    for node, value in zip(graph, [1, 2.5, [1.0, 2.0], [3.0, 4.0], [5.0, 6.0, 7.0], "text"]):
+        graph.nodes[node]["value"] = value
+    nx.write_gml(graph, path)
+    assert dict(fio.graph_from_arrays(read_gml_arrays(path)).nodes(data="value")) == dict(nx.read_gml(path).nodes(data="value"))
+
+
+def test_write_matches_networkx(tmp_path):
+    graph = nx.relabel_nodes(nx.karate_club_graph(), str)
+    nx.write_gml(graph, str(tmp_path / "expected.gml"))
+    write_gml_arrays(fio.graph_to_arrays(graph), str(tmp_path / "written.gml"))
+    assert (tmp_path / "written.gml").read_text() == (tmp_path / "expected.gml").read_text()
+
+
+@pytest.mark.parametrize("directed", [False, True])
+def test_duplicate_edges_are_rejected_like_networkx(tmp_path, directed):
+    path = tmp_path / "graph.gml"
+    path.write_text("graph [\n" + ("  directed 1\n" if directed else "") + "  node [ id 0 label \"a\" ]\n  node [ id 1 label \"b\" ]\n"
+                    "  edge [ source 0 target 1 ]\n  edge [ source 1 target 0 ]\n  edge [ source 0 target 1 ]\n]\n")
+    with pytest.raises(nx.NetworkXError) as expected:
+        nx.read_gml(str(path))
+    with pytest.raises(ValueError, match=re.escape(str(expected.value))):
+        read_gml_arrays(str(path))
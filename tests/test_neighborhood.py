@@ -0,0 +1,27 @@
+import networkx as nx
+import numpy as np
+from compact_graph import CompactGraph
+from neighborhood import neighborhood_overlaps
+
+
+def test_overlaps_are_saved_into_every_edge():
+    graph = nx.karate_club_graph()
+    overlaps = neighborhood_overlaps(graph)
+    assert np.allclose(overlaps, [graph.edges[edge]["neighborhood_overlap"] for edge in graph.edges()])
+
+
+def test_overlaps_are_saved_into_parallel_multigraph_edges():
+    graph = nx.MultiGraph([(0, 1), (0, 1), (1, 2), (0, 2), (2, 3)])
+    for compact in (None, CompactGraph.from_networkx(graph)):
+        overlaps = neighborhood_overlaps(graph, compact=compact)
+        assert overlaps is not None
+        saved = nx.get_edge_attributes(graph, "neighborhood_overlap")
+        assert len(saved) == graph.number_of_edges()
+        assert saved[(0, 1, 0)] == saved[(0, 1, 1)] == 1.0
+        assert saved[(2, 3, 0)] == 0.0
+
+
+def test_graph_without_edges_has_no_overlaps():
+    graph = nx.empty_graph(3)
+    for compact in (None, CompactGraph.from_networkx(graph)):
+        assert len(neighborhood_overlaps(graph, compact=compact)) == 0
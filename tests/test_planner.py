@@ -0,0 +1,27 @@
+import networkx as nx
+import numpy as np
+import file_io as fio
+import planner
+from compact_graph import CompactGraph
+
+
+def test_plan_lists_dependencies_first():
+    order = planner.plan(["graph_analysis.py", "graph.gml", "--clustering", "all", "--plot", "C"], {"jobs": 1})
+    assert order.index("adjacency") < order.index("triangles") < order.index("clustering")
+    assert "degrees" in order
+
+
+def test_degree_artifact_matches_networkx():
+    graph = nx.MultiGraph([(0, 1), (0, 1), (1, 2), (2, 2)])
+    arrays = fio.graph_to_arrays(graph)
+    artifacts = planner.Artifacts(arrays, CompactGraph(arrays))
+    assert artifacts.get("degrees").tolist() == [degree for _, degree in graph.degree()]
+
+
+def test_clustering_artifact_matches_networkx():
+    graph = nx.karate_club_graph()
+    arrays = fio.graph_to_arrays(graph)
+    artifacts = planner.Artifacts(arrays, CompactGraph(arrays))
+    coefficients = artifacts.get("clustering")["coefficients"]
+    expected = nx.clustering(graph)
+    assert np.allclose([coefficients[node] for node in graph], [expected[node] for node in graph])
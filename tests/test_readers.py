@@ -0,0 +1,77 @@
+import pytest
+import pandas as pd
+import file_io as fio
+from compact_graph import CompactGraph
+
+EDGES = pd.DataFrame({"source": ["a", "b", "c", "a"], "target": ["b", "c", "d", "d"], "sign": [1, -1, 1, -1]})
+EXPECTED_SIGNS = [1, -1, 1, -1]
+
+
+def edge_signs(arrays):
+    """The sign of every edge of the table, in row order"""
+
+    compact = CompactGraph(arrays)
+    signs = dict(zip(zip(compact.sources.tolist(), compact.targets.tolist()), compact.signs().tolist()))
+    labels = list(compact.labels)
+    return [signs[(labels.index(u), labels.index(v))] for u, v in zip(EDGES["source"], EDGES["target"])]
+
+
+def test_numeric_signs_in_csv(tmp_path):
+    path = tmp_path / "graph.csv"
+    EDGES.to_csv(path, index=False)
+    assert edge_signs(fio.parse_arrays(str(path))) == EXPECTED_SIGNS
+
+
+def test_numeric_signs_in_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "graph.parquet"
+    EDGES.to_parquet(path, index=False)
+    assert edge_signs(fio.parse_arrays(str(path))) == EXPECTED_SIGNS
+
+
+def test_numeric_signs_in_edgelist(tmp_path):
+    path = tmp_path / "graph.edgelist"
+    EDGES.to_csv(path, sep=" ", header=False, index=False)
+    assert edge_signs(fio.parse_arrays(str(path))) == EXPECTED_SIGNS
+
+
+def test_text_signs_match_numeric_signs(tmp_path):
+    path = tmp_path / "graph.csv"
+    EDGES.assign(sign=EDGES["sign"].map({1: "+", -1: "-"})).to_csv(path, index=False)
+    assert edge_signs(fio.parse_arrays(str(path))) == EXPECTED_SIGNS
+
+
+def test_missing_numeric_sign_stays_missing(tmp_path):
+    path = tmp_path / "graph.csv"
+    EDGES.assign(sign=[1, None, 1, -1]).to_csv(path, index=False)
+    assert edge_signs(fio.parse_arrays(str(path))) == [1, 0, 1, -1]
+
+
+@pytest.mark.parametrize("extension", [".csv", ".edgelist"])
+def test_zero_sign_is_an_error(tmp_path, extension):
+    path = tmp_path / f"graph{extension}"
+    edges = EDGES.assign(sign=[1, 0, 1, -1])
+    if extension == ".csv":
+        edges.to_csv(path, index=False)
+    else:
+        edges.to_csv(path, sep=" ", header=False, index=False)
+    with pytest.raises(Exception, match="sign of 0"):
+        fio.parse_arrays(str(path))
+
+
+def test_float_column_with_missing_values_stays_float(tmp_path):
+    path = tmp_path / "graph.csv"
+    EDGES.assign(weight=[1.0, None, 2.0, 3.0]).to_csv(path, index=False)
+    arrays = fio.parse_arrays(str(path))
+    assert arrays["meta"]["edge_columns"]["weight"] == "float"
+    graph = fio.graph_from_arrays(arrays)
+    assert graph.edges["a", "b"]["weight"] == 1.0 and isinstance(graph.edges["a", "b"]["weight"], float)
+    assert "weight" not in graph.edges["b", "c"]
+
+
+def test_float_and_bool_columns_keep_their_types(tmp_path):
+    path = tmp_path / "graph.csv"
+    EDGES.assign(weight=[1.0, 2.0, 2.0, 1.0], flag=[True, False, True, False]).to_csv(path, index=False)
+    graph = fio.graph_from_arrays(fio.parse_arrays(str(path)))
+    assert graph.edges["a", "b"] == {"sign": "+", "weight": 1.0, "flag": True}
+    assert type(graph.edges["a", "b"]["weight"]) is float and type(graph.edges["a", "b"]["flag"]) is bool
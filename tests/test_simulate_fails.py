@@ -0,0 +1,16 @@
+import networkx as nx
+from compact_graph import CompactGraph
+from simulate_fails import failures
+
+
+def test_removed_edges_is_capped_at_the_edge_count():
+    graph = nx.path_graph(5)
+    for version in (graph, CompactGraph.from_networkx(graph)):
+        results = failures(version, 10, quiet=True)
+        assert results["removed_edges"] == 4
+        assert results["reduced_num_components"] == 5
+
+
+def test_removed_edges_is_k_when_there_are_enough_edges():
+    results = failures(nx.cycle_graph(6), 2, quiet=True)
+    assert results["removed_edges"] == 2
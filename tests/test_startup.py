@@ -0,0 +1,25 @@
+import os
+import pytest
+from benchmark import STARTUP_BUDGET, STARTUP_RUNS, import_times
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def in_repository(monkeypatch):
+    # the runs name graph_analysis.py and test_files/ relative to the repository
+    monkeypatch.chdir(REPOSITORY)
+
+
+@pytest.mark.parametrize("name", list(STARTUP_RUNS))
+def test_run_does_not_import_slow_modules(name):
+    args, forbidden = STARTUP_RUNS[name]
+    times, _ = import_times(args)
+    assert "networkx" in times
+    assert [module for module in forbidden if module in times] == []
+
+
+def test_import_time_is_within_budget():
+    # the cumulative import time -X importtime gives for graph_analysis itself, which leaves out the interpreter's startup
+    times, _ = import_times(["-c", "import graph_analysis"])
+    assert times["graph_analysis"] < STARTUP_BUDGET
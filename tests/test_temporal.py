@@ -0,0 +1,38 @@
+import random
+import networkx as nx
+import pandas as pd
+import pytest
+import temporal
+
+
+def random_event_log(path, seed):
+    """Writes a random event log where every event adds an edge that is missing or removes one that is present, a few events per timestamp"""
+
+    rng = random.Random(seed)
+    present = set()
+    rows = []
+    for timestamp in range(40):
+        for _ in range(rng.randint(1, 4)):
+            u, v = sorted(rng.sample(range(12), 2))
+            rows.append((u, v, timestamp, "remove" if (u, v) in present else "add"))
+            present ^= {(u, v)}
+    pd.DataFrame(rows, columns=["source", "target", "timestamp", "action"]).to_csv(path, index=False)
+    return rows
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_snapshots_match_networkx_replay(tmp_path, seed):
+    path = tmp_path / "events.csv"
+    rows = random_event_log(path, seed)
+    events = temporal.read_events(str(path))
+
+    graph = nx.Graph()
+    graph.add_nodes_from(events["labels"])
+    for snapshot in temporal.snapshots(events):
+        for u, v, timestamp, action in rows:
+            if timestamp == snapshot["timestamp"]:
+                (graph.add_edge if action == "add" else graph.remove_edge)(u, v)
+        assert snapshot["num_edges"] == graph.number_of_edges()
+        assert snapshot["num_components"] == nx.number_connected_components(graph)
+        assert snapshot["degrees"].tolist() == [graph.degree(label) for label in events["labels"]]
+        assert snapshot["degree_histogram"].tolist() == nx.degree_histogram(graph)